@@ -0,0 +1,69 @@
+#
+# Measures how fast a chunked (protocol v2) search command reads its input:
+# SearchCommand._read_chunk on the binary stream, reading each chunk into one
+# reused buffer, against text reads of the same chunks as before. Chunk lengths
+# are byte counts, which text reads take as characters, so the text path is
+# given character lengths here for it to read the chunks correctly at all.
+#
+#     python bench_chunk_reader.py [rows per chunk]
+#
+
+import csv
+import io
+import json
+import sys
+import time
+
+from splunklib.searchcommands.internals import CsvDialect
+from splunklib.searchcommands.search_command import SearchCommand
+from splunklib.six.moves import StringIO
+
+CHUNKS = 10
+
+def chunks(rows, lengths_in_bytes):
+    body = u"a,b,c,d,e\r\n" + u"".join(u'%d,"héllo wörld %d",日本語テキスト,"multi\nline €",%f\r\n' % (i, i, i * 1.5)
+                                      for i in range(rows))
+    metadata = json.dumps({"action": "execute", "finished": False})
+    encoded = body.encode("utf-8")
+    length = len(encoded) if lengths_in_bytes else len(body)
+    header = (u"chunked 1.0,%d,%d\n" % (len(metadata), length)).encode("utf-8")
+    return (header + metadata.encode("utf-8") + encoded) * CHUNKS
+
+def text_read_chunk(ifile, buffer):
+    # _read_chunk as it was: text reads of the metadata and body.
+    header = ifile.readline()
+    if not header:
+        return None
+    metadata_length, body_length = map(int, SearchCommand._header.match(header).groups())
+    ifile.read(metadata_length)
+    return None, ifile.read(body_length)
+
+def measure(name, read_chunk, data, binary, parse):
+    best = None
+    for _ in range(3):
+        ifile = io.BytesIO(data) if binary else io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline="")
+        buffer = bytearray()
+        rows = 0
+        start = time.time()
+        while True:
+            chunk = read_chunk(ifile, buffer)
+            if chunk is None:
+                break
+            if parse:
+                rows += sum(1 for row in csv.reader(StringIO(chunk[1]), dialect=CsvDialect))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    rate = "%9.0f rows/s" % (rows / best) if parse else ""
+    print("%-34s %6.3f s %7.0f MB/s %s" % (name, best, len(data) / best / 1e6, rate))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    text, binary = chunks(rows, False), chunks(rows, True)
+    print("%d chunks of %d rows, %.1f MB" % (CHUNKS, rows, len(binary) / 1e6))
+    measure("text reads", text_read_chunk, text, False, False)
+    measure("binary readinto", SearchCommand._read_chunk, binary, True, False)
+    measure("text reads + csv rows", text_read_chunk, text, False, True)
+    measure("binary readinto + csv rows", SearchCommand._read_chunk, binary, True, True)
+
+if __name__ == "__main__":
+    main()
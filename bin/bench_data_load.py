@@ -0,0 +1,98 @@
+#
+# Measures how fast splunklib.data turns an Atom feed of saved searches into
+# records, and the memory it takes: load(text).feed.entry, which builds the
+# whole tree first, against load_entries(stream), which loads one entry at a
+# time, with and without a fields filter.
+#
+#     python bench_data_load.py [entries]
+#
+
+import io
+import sys
+import time
+import tracemalloc
+
+from splunklib import data
+
+HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:s="http://dev.splunk.com/ns/rest" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+  <title>savedsearch</title>
+  <id>https://localhost:8089/services/saved/searches</id>
+  <updated>2026-10-18T10:00:00+00:00</updated>
+  <opensearch:totalResults>%d</opensearch:totalResults>
+  <opensearch:itemsPerPage>30</opensearch:itemsPerPage>
+  <opensearch:startIndex>0</opensearch:startIndex>
+  <s:messages/>
+"""
+
+ENTRY = """  <entry>
+    <title>Search %(i)d</title>
+    <id>https://localhost:8089/servicesNS/nobody/search/saved/searches/Search%%20%(i)d</id>
+    <updated>2026-10-18T10:00:00+00:00</updated>
+    <link href="/servicesNS/nobody/search/saved/searches/Search%%20%(i)d" rel="alternate"/>
+    <author><name>admin</name></author>
+    <link href="/servicesNS/nobody/search/saved/searches/Search%%20%(i)d" rel="list"/>
+    <link href="/servicesNS/nobody/search/saved/searches/Search%%20%(i)d" rel="edit"/>
+    <content type="text/xml">
+      <s:dict>
+        <s:key name="search">index=main sourcetype=x%(i)d | stats count by host</s:key>
+        <s:key name="cron_schedule">*/5 * * * *</s:key>
+        <s:key name="disabled">0</s:key>
+        %(settings)s
+        <s:key name="eai:acl">
+          <s:dict>
+            <s:key name="app">search</s:key>
+            <s:key name="owner">admin</s:key>
+            <s:key name="perms">
+              <s:dict>
+                <s:key name="read"><s:list><s:item>*</s:item></s:list></s:key>
+                <s:key name="write"><s:list><s:item>admin</s:item><s:item>power</s:item></s:list></s:key>
+              </s:dict>
+            </s:key>
+            <s:key name="sharing">app</s:key>
+          </s:dict>
+        </s:key>
+      </s:dict>
+    </content>
+  </entry>
+"""
+
+SETTINGS = "".join('<s:key name="action.setting%d">value %d</s:key>' % (k, k) for k in range(30))
+
+def feed(count):
+    entries = "".join(ENTRY % {"i": i, "settings": SETTINGS} for i in range(count))
+    return (HEAD % count + entries + "</feed>\n").encode("utf-8")
+
+def measure(name, load, raw, count):
+    best = None
+    for _ in range(3):
+        start = time.time()
+        loaded = load(raw)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del loaded
+    tracemalloc.start()
+    loaded = load(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert len(loaded) == count
+    del loaded
+    print("%-36s %6.2f s %8.0f entries/s  %6.1f MB peak" % (name, best, count / best, peak / 1e6))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    raw = feed(count)
+    print("%d entries, %.1f MB of XML" % (count, len(raw) / 1e6))
+
+    # The entries are counted rather than kept, as a caller iterating a
+    # collection would, so that only the parser's own memory shows.
+    measure("load(text).feed.entry", lambda raw: [True for entry in data.load(raw.decode("utf-8")).feed.entry],
+            raw, count)
+    measure("load_entries(stream)", lambda raw: [True for entry in data.load_entries(io.BytesIO(raw))],
+            raw, count)
+    measure("load_entries(stream, fields=[...])",
+            lambda raw: [True for entry in data.load_entries(io.BytesIO(raw), fields=["search", "disabled"])],
+            raw, count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#
+# Measures how many events per second a modular input writes to stdout:
+# with the ElementTree serialization EventWriter used before, with the
+# direct serialization of Event.to_xml_string, and with buffered writes.
+#
+#     python bench_event_writers.py [events]
+#
+
+import io
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from splunklib.modularinput import Event, EventWriter
+
+class DevNull(io.TextIOBase):
+    # Stands in for the stdout pipe to splunkd; counts writes, like flushes cost syscalls.
+    writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return len(text)
+
+    def flush(self):
+        self.writes += 1
+
+def element_write_event(out, event):
+    # EventWriter.write_event as it was: an ElementTree element per event, flushed.
+    element = ET.Element("event")
+    if event.stanza is not None:
+        element.set("stanza", event.stanza)
+    element.set("unbroken", str(int(event.unbroken)))
+    if event.time is not None:
+        ET.SubElement(element, "time").text = str(event.time)
+    for node, value in (("source", event.source), ("sourcetype", event.sourceType),
+                        ("index", event.index), ("host", event.host), ("data", event.data)):
+        if value is not None:
+            ET.SubElement(element, node).text = value
+    if event.done:
+        ET.SubElement(element, "done")
+    out.write(ET.tostring(element).decode("ascii"))
+    out.flush()
+
+def measure(name, write_all, events):
+    best = None
+    for _ in range(3):
+        out = DevNull()
+        start = time.time()
+        write_all(out)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print("%-30s %9.0f events/s  %d writes" % (name, len(events) / best, out.writes))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    events = [Event(data="%d user=u%d action=login status=ok bytes=%d" % (i, i % 97, i * 7),
+                    stanza="bench://input", time="%.3f" % (1372187084 + i), host="host-%d" % (i % 13),
+                    index="main", source="bench", sourcetype="bench:event") for i in range(count)]
+
+    def elementtree(out):
+        for event in events:
+            element_write_event(out, event)
+
+    def unbuffered(out):
+        writer = EventWriter(output=out)
+        for event in events:
+            writer.write_event(event)
+        writer.close()
+
+    def buffered(out):
+        writer = EventWriter(output=out, buffer_size=65536)
+        for event in events:
+            writer.write_event(event)
+        writer.close()
+
+    measure("ElementTree, flush per event", elementtree, events)
+    measure("to_xml_string, unbuffered", unbuffered, events)
+    measure("to_xml_string, 64KB buffer", buffered, events)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#
+# Measures how many rows per second splunk.Intersplunk.readResultsIter reads
+# from generated search results, with a multivalue column every tenth field,
+# on a wide input (many fields) and a tall one (many rows). csv.DictReader on
+# the same text is shown as the floor for building one dict per row.
+#
+#     python bench_intersplunk.py [scale]
+#
+
+import csv
+import io
+import sys
+import time
+
+from splunk import Intersplunk
+
+def results(fields, rows, mv_every=10):
+    header = []
+    for field in range(fields):
+        header.append("f%d" % field)
+        if field % mv_every == 0:
+            header.append("__mv_f%d" % field)
+    out = io.StringIO()
+    out.write("\n" + ",".join(header) + "\n")
+    for row in range(rows):
+        values = []
+        for field in range(fields):
+            values.append("v%d_%d" % (row, field))
+            if field % mv_every == 0:
+                values.append("$a$;$b$$c$" if row % 2 else ("" if row % 3 else "$one$"))
+        out.write(",".join(values) + "\n")
+    return out.getvalue()
+
+def measure(name, read, text):
+    best = None
+    for _ in range(3):
+        start = time.time()
+        rows = sum(1 for row in read(io.StringIO(text)))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print("%-40s %8d rows %9.0f rows/s" % (name, rows, rows / best))
+
+def dict_reader(stream):
+    stream.readline() # the blank line before the header
+    return csv.DictReader(stream)
+
+def main():
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    for name, fields, rows in (("wide", 250, int(4000 * scale)), ("tall", 10, int(200000 * scale))):
+        text = results(fields, rows)
+        measure("%s, readResultsIter" % name, Intersplunk.readResultsIter, text)
+        measure("%s, csv.DictReader" % name, dict_reader, text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#
+# Measures how long a chunked (protocol v2) streaming command takes to run
+# through a replay of its input, with the pipeline setting off and on. The
+# replay is the gzipped input recording the Recorder writes for record=t; one
+# of 40 chunks of 20000 rows is recorded when none is given. The command runs in
+# a child process, fed and drained at a fixed rate as splunkd's pipes would be,
+# and its output is checked to be the same either way.
+#
+#     python bench_pipeline.py [recording.input.gz or -] [MB/s] [seconds slept per chunk]
+#
+# A recording is found under $SPLUNK_HOME/var/run/splunklib.searchcommands/recordings.
+#
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+from splunklib.searchcommands import Configuration, StreamingCommand
+from splunklib.searchcommands.internals import Recorder
+
+BLOCK = 65536
+CHUNKS = 40
+ROWS = 20000
+
+def stream(self, records):
+    sleep = float(os.environ.get("BENCH_SLEEP", 0))
+    if sleep:
+        time.sleep(sleep)  # stands in for a blocking call made for each chunk
+    for record in records:
+        record["upper"] = record["text"].upper()
+        record["length"] = len(record["text"])
+        yield record
+
+@Configuration()
+class SerialCommand(StreamingCommand):
+    stream = stream
+
+@Configuration(pipeline=2)
+class PipelinedCommand(StreamingCommand):
+    stream = stream
+
+def chunk(metadata, body=b""):
+    metadata = json.dumps(metadata).encode("utf-8")
+    return b"chunked 1.0,%d,%d\n" % (len(metadata), len(body)) + metadata + body
+
+def record(path):
+    # Records generated input as the command would when run with record=t.
+    searchinfo = {
+        "args": [], "raw_args": [], "earliest_time": "0", "latest_time": "0", "search": "| bench",
+        "dispatch_dir": tempfile.gettempdir(), "session_key": "session-key", "splunkd_uri": "https://127.0.0.1:8089",
+        "app": "search", "owner": "admin", "sid": "1234", "splunk_version": "8.2.0", "username": "admin",
+        "command": "bench", "maxresultrows": 50000}
+    data = chunk({"action": "getinfo", "preview": False, "searchinfo": searchinfo})
+    for i in range(CHUNKS):
+        body = u"_raw,text\r\n" + u"".join(u"event %d,wört %d\r\n" % (row, row) for row in range(ROWS))
+        data += chunk({"action": "execute", "finished": i == CHUNKS - 1}, body.encode("utf-8"))
+    recorder = Recorder(path, BytesReader(data))
+    while recorder.read(BLOCK):
+        pass
+    return path + ".gz"
+
+def load(path):
+    # The Recorder flushes a recording after each read but never closes it, so it has no gzip trailer.
+    with open(path, "rb") as f:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read())
+
+class BytesReader(object):
+
+    def __init__(self, data):
+        self._data, self._offset = data, 0
+
+    def read(self, size):
+        value = self._data[self._offset:self._offset + size]
+        self._offset += len(value)
+        return value
+
+def throttled_copy(read, write, rate):
+    # Copies at a fixed rate, without catching up after being blocked, like a producer of fixed speed.
+    while True:
+        data = read(BLOCK)
+        if not data:
+            return
+        time.sleep(len(data) / rate)
+        write(data)
+
+def run(name, replay, rate):
+    output = []
+
+    def feed():
+        source = iter([replay[i:i + BLOCK] for i in range(0, len(replay), BLOCK)])
+        throttled_copy(lambda size: next(source, b""), child.stdin.write, rate)
+        child.stdin.close()
+
+    def drain():
+        throttled_copy(child.stdout.read1, output.append, rate)
+
+    child = subprocess.Popen([sys.executable, __file__, "--run", name], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    threads = [threading.Thread(target=feed), threading.Thread(target=drain)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    child.wait()
+    return time.time() - start, b"".join(output)
+
+def measure(name, replay, rate):
+    best, digest = None, None
+    for _ in range(3):
+        elapsed, output = run(name, replay, rate)
+        best = elapsed if best is None else min(best, elapsed)
+        digest = hashlib.md5(output).hexdigest()
+    print("%-10s %6.2f s %6.1f MB/s  output %s" % (name, best, len(replay) / best / 1e6, digest))
+    return digest
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        command = SerialCommand if sys.argv[2] == "serial" else PipelinedCommand
+        command().process([sys.argv[0]], sys.stdin, sys.stdout)
+        return
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    rate = float(sys.argv[2]) * 1e6 if len(sys.argv) > 2 else 4e6
+    os.environ["BENCH_SLEEP"] = sys.argv[3] if len(sys.argv) > 3 else "0"
+
+    if path is None or path == "-":
+        path = record(os.path.join(tempfile.mkdtemp(), "bench.input"))
+    replay = load(path)
+
+    print("%s, %.1f MB at %.1f MB/s, %s s slept per chunk" % (path, len(replay) / 1e6, rate / 1e6,
+                                                              os.environ["BENCH_SLEEP"]))
+    serial = measure("serial", replay, rate)
+    pipelined = measure("pipelined", replay, rate)
+    assert serial == pipelined, "pipelined output differs"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#
+# Measures how many search results per second the splunklib.results readers
+# parse from memory: ResultsReader on output_mode=xml, JSONResultsReader on the
+# newline-delimited objects of output_mode=json, and CSVResultsReader on
+# output_mode=csv. The XML reader is far slower, so it reads a tenth as many
+# rows.
+#
+#     python bench_results_readers.py [rows]
+#
+
+import csv
+import io
+import json
+import sys
+import time
+
+from splunklib.results import CSVResultsReader, JSONResultsReader, ResultsReader
+
+FIELDS = ["_time", "host", "source", "sourcetype", "_raw", "count"]
+
+def row(i):
+    return {"_time": "2026-10-18T10:00:%02d.000+00:00" % (i % 60), "host": "web-%02d" % (i % 16),
+            "source": "/var/log/app.log", "sourcetype": "app",
+            "_raw": "GET /index.html status=200 bytes=%d user=u%d" % (i * 7, i), "count": str(i)}
+
+def xml_results(count):
+    parts = ["<?xml version='1.0' encoding='UTF-8'?>\n<results preview='0'>\n<meta><fieldOrder>" +
+             "".join("<field>%s</field>" % field for field in FIELDS) + "</fieldOrder></meta>\n"]
+    for i in range(count):
+        values = row(i)
+        parts.append("<result offset='%d'>" % i + "".join("<field k='%s'><value><text>%s</text></value></field>"
+                                                           % (field, values[field]) for field in FIELDS) + "</result>\n")
+    parts.append("</results>\n")
+    return "".join(parts).encode("utf-8")
+
+def json_results(count):
+    return "".join(json.dumps({"preview": False, "offset": i, "result": row(i)}) + "\n"
+                   for i in range(count)).encode("utf-8")
+
+def csv_results(count):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    for i in range(count):
+        values = row(i)
+        writer.writerow([values[field] for field in FIELDS])
+    return out.getvalue().encode("utf-8")
+
+def measure(name, reader, data, count):
+    best = None
+    for _ in range(3):
+        start = time.time()
+        read = sum(1 for result in reader(io.BytesIO(data)))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert read == count
+    print("%-20s %8d rows %7.1f MB %9.0f rows/s" % (name, count, len(data) / 1e6, count / best))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    measure("ResultsReader", ResultsReader, xml_results(count // 10), count // 10)
+    measure("JSONResultsReader", JSONResultsReader, json_results(count), count)
+    measure("CSVResultsReader", CSVResultsReader, csv_results(count), count)
+
+if __name__ == "__main__":
+    main()
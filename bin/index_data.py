@@ -4,69 +4,292 @@ import splunk.Intersplunk
 import base64
 
 from base64 import b64encode
-import json
 import time
 import sys
 import os
+import logging
+import threading
+import queue
 import splunklib.client as client
+from index_data_sinks import SINKS, encode_event
+from index_data_spool import Spool
+
+logger = logging.getLogger("index_data")
 
 class Actions:
     def __init__(self,):
         # initialize configurations 
         # better if this can be moved to a configuration file 
+        self.s_scheme="https"
         self.s_host="localhost"
         self.s_port="8089"
         self.index="custom_search_index_data_idx"
         self.sourcetype="custom_json"
+        self.token=None # session key of the user running the search
+        self.added_fields=["Greetings","timestamp","is_indexed"] # fields index_results adds to every result
+        # batching: results are sent as newline-delimited JSON, one payload per batch
+        # "submit" sends each batch as it fills up, "async" queues batches for background
+        # workers and "single" sends one result at a time
+        self.batch_mode="submit"
+        self.batch_max_count=500
+        self.batch_max_bytes=1048576
+        # sink: where batches go, "simple" posts them to receivers/simple, "stream" writes them
+        # to a single Index.attach socket and "hec" posts them to the HTTP Event Collector
+        self.sink_name="simple"
+        self.sink=None
+        self.hec_url="https://localhost:8088"
+        self.hec_token=None
+        self.hec_gzip=True
+        # content coding for receivers/simple batches ("gzip" or "deflate"), None sends them as is
+        self.compression=None
+        # async mode: at most queue_size batches wait for the workers, further batches
+        # block the search pipeline until a worker takes one
+        self.workers=4
+        self.queue_size=8
+        self.indexer=None
+        self.indexed_count=0 # results confirmed by splunkd
+        self.failed_count=0
+        # batches that fail are kept in an on-disk spool and sent again by later runs or by
+        # index_data_replay.py; while the spool backs off, new batches go straight to it
+        self.spool_enabled=True
+        self.spool_dir=os.path.join(os.environ.get("SPLUNK_HOME", os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                    "var", "run", "splunk", "custom_search_index_data", "spool")
+        self.spool=None
+        # seconds a run spends sending spooled batches before it exits, kept short so a search
+        # does not wait on the backlog of earlier ones; 0 leaves them all to index_data_replay.py
+        self.replay_budget=1
+        self.spooled_count=0
+        # connection context: one Service and Index handle shared by every push,
+        # the index is looked up again after refresh_interval seconds (0 keeps it forever)
+        self.service=None
+        self.session_key=None
+        self.target=None
+        self.target_loaded=0
+        self.refresh_interval=300
+        self.rest_calls_saved=0
+        self.pool_size=4
+        self.lock=threading.Lock() # guards the connection context and counters shared with the async workers
+
+    def configure(self,options): # override batching defaults with the command's key=value arguments
+        self.batch_mode=options.get("batch_mode",self.batch_mode)
+        if self.batch_mode not in ("submit","async","single"):
+            raise ValueError(f'batch_mode must be one of submit, async or single, not "{self.batch_mode}"')
+        self.sink_name=options.get("sink",self.sink_name)
+        if self.sink_name not in SINKS:
+            raise ValueError(f'sink must be one of {", ".join(SINKS)}, not "{self.sink_name}"')
+        self.hec_url=options.get("hec_url",self.hec_url)
+        self.hec_token=options.get("hec_token",self.hec_token)
+        self.hec_gzip=str(options.get("hec_gzip",self.hec_gzip)).lower() in ("1","t","true","y","yes")
+        self.compression=options.get("compression",self.compression)
+        if self.compression in ("", "none"):
+            self.compression=None
+        if self.compression not in (None,"gzip","deflate"):
+            raise ValueError(f'compression must be one of gzip, deflate or none, not "{self.compression}"')
+        self.batch_max_count=int(options.get("batch_size",self.batch_max_count))
+        self.batch_max_bytes=int(options.get("batch_bytes",self.batch_max_bytes))
+        if self.batch_max_count < 1 or self.batch_max_bytes < 1:
+            raise ValueError("batch_size and batch_bytes must be positive")
+        self.refresh_interval=float(options.get("refresh_interval",self.refresh_interval))
+        self.workers=int(options.get("workers",self.workers))
+        self.queue_size=int(options.get("queue_size",self.queue_size))
+        if self.workers < 1 or self.queue_size < 1:
+            raise ValueError("workers and queue_size must be positive")
+        self.pool_size=max(self.pool_size,self.workers) # one keep-alive connection per worker
+        self.sink=SINKS[self.sink_name](self)
+        self.spool_enabled=str(options.get("spool",self.spool_enabled)).lower() in ("1","t","true","y","yes")
+        self.replay_budget=float(options.get("replay_budget",self.replay_budget))
+        if self.spool_enabled:
+            self.spool=Spool(os.path.join(self.spool_dir, self.sink.spool_name))
 
     def splunk_connect(self,sessionKey):
         # create splunk service connection over http
         try:
             service = client.connect(
+                scheme=self.s_scheme,
                 host=self.s_host,
                 port=self.s_port,
-                token=sessionKey
+                token=sessionKey,
+                pool_size=self.pool_size # keep-alive connections shared by every request of this run
             )
             return service
 
         except Exception as error:
             print(error)
 
-    def splunk_push(self,index, sourcetype,sessionKey,data): # this function saves data to the provided argument "index" when invoked
-        service = self.splunk_connect(sessionKey)
-        target = service.indexes[index]
-        sourcetype=sourcetype
+    def get_target(self,index,sessionKey): # returns the cached index handle, connecting and looking it up only when needed
+        with self.lock:
+            now = time.time()
+            if self.target is not None and self.target.name == index and self.session_key == sessionKey \
+                    and (not self.refresh_interval or now - self.target_loaded < self.refresh_interval):
+                self.rest_calls_saved += 1 # the GET on the indexes collection we did not have to make
+                return self.target
+
+            if self.service is None or self.session_key != sessionKey:
+                self.service = self.splunk_connect(sessionKey)
+                self.session_key = sessionKey
+            self.target = self.service.indexes[index]
+            self.target_loaded = now
+            return self.target
+
+    def invalidate(self): # forget the connection context, the next push reconnects and looks the index up again
+        with self.lock:
+            self.service = None
+            self.session_key = None
+            self.target = None
+
+    def splunk_push_batch(self,lines): # saves a batch of serialized results as one payload through the sink
+        if self.spool is not None and self.spool.backing_off():
+            # a send failed recently, keep the batch for later rather than wait on splunkd again
+            return self.spool_batch(lines, "Indexing is backing off after a failed send")
 
         try:
-            target.submit(str(json.dumps(dict(data))), sourcetype=sourcetype) # triggers submission and indexing of data
+            self.sink.send(lines) # triggers submission and indexing of data
+            with self.lock:
+                self.indexed_count += len(lines)
             return True
         except Exception as error:
+            self.sink.reset()
+            self.invalidate()
+            if self.spool is not None:
+                try:
+                    self.spool.failed()
+                except Exception as spool_error: # the batch is still spooled, only the backoff is not saved
+                    logger.warning("spool backoff not saved: %s", spool_error)
+                return self.spool_batch(lines, error)
+            with self.lock:
+                self.failed_count += len(lines)
             return f'Event not indexed. {error}'
 
+    def spool_batch(self,lines,reason):
+        try:
+            self.spool.append(lines)
+        except Exception as error: # e.g. the disk is full, the batch is lost
+            with self.lock:
+                self.failed_count += len(lines)
+            return f'Event not indexed. {reason}. Not spooled: {error}'
+        with self.lock:
+            self.spooled_count += len(lines)
+        return f'Event not indexed. {reason}. Spooled for retry.'
+
+    def push_batch(self,lines): # indexes a batch of serialized results and returns their is_indexed status
+        if self.batch_mode == "async":
+            if self.indexer is None:
+                self.indexer = BackgroundIndexer(self)
+            self.indexer.put(lines) # waits while the queue is full
+            return "queued"
+        return self.splunk_push_batch(lines)
+
+    def finish(self): # waits for queued batches and releases the connections of this run
+        if self.indexer is not None:
+            self.indexer.close()
+            self.indexer = None
+        if self.spool is not None:
+            self.spool.close()
+            if self.replay_budget > 0:
+                replayed = self.spool.replay(self.sink.send, self.replay_budget)
+                if replayed:
+                    logger.info("%d spooled batches indexed", replayed)
+        self.sink.close()
+        logger.info("%d results indexed, %d spooled, %d failed", self.indexed_count, self.spooled_count, self.failed_count)
+        logger.info("index lookups served from the connection context: %d REST calls saved", self.rest_calls_saved)
+
+    def flush(self,batch): # sends the pending batch and records its status on every result in it
+        if not batch:
+            return
+        post = self.push_batch([line for result, line in batch])
+        for result, line in batch:
+            result['is_indexed'] = str(post)
+
+    def transform(self,result): # applied to every result before it is indexed
+        # you can modify and add more fields here that will be added to the data when indexed
+        # (list new fields in self.added_fields so they are also returned to the search)
+        result['Greetings'] = "Hello World!"
+        result['timestamp'] = time.time()
+        return result
+
+    def serialize(self,result): # the text the sink sends for one result
+        return self.sink.format(result, encode_event(result))
+
+    def index_results(self,results): # yields every result once it has been indexed, holding at most one batch in memory
+        batch = [] # (result, serialized result) pairs waiting to be sent
+        batch_bytes = 0
+        for result in results:
+            
+            self.transform(result)
+            # all changes to 'result' dict after this will not be indexed
+            line = self.serialize(result) # ascii-only, so len() is the payload size in bytes
+            if self.batch_mode == "single":
+                # save data to index / index data
+                self.flush([(result, line)])
+                yield result
+                continue
+
+            if batch and (len(batch) >= self.batch_max_count or batch_bytes + len(line) + 1 > self.batch_max_bytes):
+                self.flush(batch)
+                for sent, line_sent in batch:
+                    yield sent
+                batch = []
+                batch_bytes = 0
+            batch.append((result, line))
+            batch_bytes += len(line) + 1
+            # result['sessionKey'] = self.token
+        self.flush(batch)
+        for sent, line_sent in batch:
+            yield sent
+        self.finish()
 
     def add_record(self):
         try:
-            results, dummyresults, settings = splunk.Intersplunk.getOrganizedResults()
+            # results are read, indexed and written back one batch at a time
+            results, dummyresults, settings = splunk.Intersplunk.getOrganizedResultsIter()
             self.token = settings.get("sessionKey", None) # capture session key from user's auth details
-            for result in results:
-                
-                # you can modify and add more fields here that will be added to the data when indexed
-                result['Greetings'] = "Hello World!"
-                result['timestamp'] = time.time()
-                # save data to index / index data
-                post = self.splunk_push(self.index,self.sourcetype,self.token,result)
-                # all changes to 'result' dict after this will not be indexed
-                result['is_indexed'] = str(post)
-                # result['sessionKey'] = self.token
+            keywords, options = splunk.Intersplunk.getKeywordsAndOptions()
+            self.configure(options)
+            fields = results.header + [field for field in self.added_fields if field not in results.header]
             
             # return the results from the search in search page
-            splunk.Intersplunk.outputResults(results)
+            splunk.Intersplunk.outputResultsIter(self.index_results(results), fields)
                 
                 
         except Exception as e2:
-            splunk.Intersplunk.generateErrorResults("Error '%s'. %s" % (e2))
+            splunk.Intersplunk.generateErrorResults("Error '%s'." % e2)
+
+class BackgroundIndexer:
+    # sends batches queued by Actions.push_batch on worker threads, so network latency
+    # overlaps with reading and writing results; delivery is counted on the Actions
+    def __init__(self,actions):
+        self.actions = actions
+        self.queue = queue.Queue(maxsize=actions.queue_size)
+        self.threads = [threading.Thread(target=self.work, daemon=True) for i in range(actions.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self,lines):
+        self.queue.put(lines)
+
+    def work(self):
+        actions = self.actions
+        while True:
+            lines = self.queue.get()
+            if lines is None:
+                return
+            try:
+                post = actions.splunk_push_batch(lines)
+            except Exception as error: # a dead worker would leave put() and close() waiting on a full queue
+                with actions.lock:
+                    actions.failed_count += len(lines)
+                post = f'Event not indexed. {error}'
+            if post is not True:
+                logger.warning("%d results not indexed: %s", len(lines), post)
+
+    def close(self): # lets the workers drain the queue, then stops them
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
 
 def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO) # stderr ends up in search.log
     e = Actions()
     e.add_record()
 
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# coding=utf-8
+#
+# Chunked (search command protocol v2) version of the indexdata command, registered as indexdatachunked so that
+# existing searches keep running indexdata under protocol v1. Splunk keeps one process running for the whole search
+# and hands it the results a chunk at a time, so the connection context set up by index_data.Actions is reused for
+# every chunk.
+
+import sys
+import time
+
+from splunklib.searchcommands import dispatch, StreamingCommand, Configuration, Option, SearchMetric, validators
+
+from index_data import Actions
+
+
+@Configuration()
+class IndexDataCommand(StreamingCommand):
+    """ Saves search results to an index and passes them through with an ``is_indexed`` status.
+
+    ##Syntax
+
+    .. code-block::
+        indexdatachunked [sink=(simple|stream|hec)] [batch_mode=(submit|async)] [workers=<count>] [queue_size=<count>]
+            [hec_url=<url>] [hec_token=<token>] [hec_gzip=<bool>] [compression=(gzip|deflate|none)]
+            [spool=<bool>] [replay_budget=<seconds>] [refresh_interval=<seconds>]
+
+    ##Description
+
+    The results of each chunk are indexed with one bulk write: a single receivers/simple request, a write to an
+    ``Index.attach`` socket that stays open for the whole search, or a single HTTP Event Collector request. With
+    ``batch_mode=async`` the chunk is queued for background workers and passed on right away with an ``is_indexed``
+    status of ``queued``. Chunks that cannot be indexed are kept in an on-disk spool and sent again by later searches.
+    Throughput is reported in the search inspector as the ``indexdata.submit`` metric.
+
+    ##Example
+
+    .. code-block::
+        index=_internal | head 1000 | indexdatachunked sink=stream
+
+    """
+    batch_mode = Option(
+        doc='''
+        **Syntax:** **batch_mode=***(submit|async)*
+        **Description:** Whether each chunk is indexed before it is passed on. Default: submit''',
+        default='submit', validate=validators.Set('submit', 'async'))
+
+    sink = Option(
+        doc='''
+        **Syntax:** **sink=***(simple|stream|hec)*
+        **Description:** Where each chunk is written: receivers/simple, receivers/stream or the HTTP Event Collector.
+        Default: simple''',
+        default='simple', validate=validators.Set('simple', 'stream', 'hec'))
+
+    hec_url = Option(
+        doc='''
+        **Syntax:** **hec_url=***<url>*
+        **Description:** Base URL of the HTTP Event Collector. Default: https://localhost:8088''',
+        default='https://localhost:8088')
+
+    hec_token = Option(
+        doc='''
+        **Syntax:** **hec_token=***<token>*
+        **Description:** HTTP Event Collector token, required when sink=hec''')
+
+    hec_gzip = Option(
+        doc='''
+        **Syntax:** **hec_gzip=***<bool>*
+        **Description:** Whether HTTP Event Collector requests are gzip-compressed. Default: true''',
+        default=True, validate=validators.Boolean())
+
+    compression = Option(
+        doc='''
+        **Syntax:** **compression=***(gzip|deflate|none)*
+        **Description:** Content coding of receivers/simple requests. Default: none''',
+        default='none', validate=validators.Set('gzip', 'deflate', 'none'))
+
+    spool = Option(
+        doc='''
+        **Syntax:** **spool=***<bool>*
+        **Description:** Whether chunks that fail to index are spooled to disk for a later retry. Default: true''',
+        default=True, validate=validators.Boolean())
+
+    replay_budget = Option(
+        doc='''
+        **Syntax:** **replay_budget=***<seconds>*
+        **Description:** Seconds spent sending spooled chunks at the end of the search, 0 leaves them to the replay input. Default: 1''',
+        default=1, validate=validators.Integer(0))
+
+    workers = Option(
+        doc='''
+        **Syntax:** **workers=***<count>*
+        **Description:** Number of background workers in async mode. Default: 4''',
+        default=4, validate=validators.Integer(1))
+
+    queue_size = Option(
+        doc='''
+        **Syntax:** **queue_size=***<count>*
+        **Description:** Chunks waiting for a worker before the search is held back in async mode. Default: 8''',
+        default=8, validate=validators.Integer(1))
+
+    refresh_interval = Option(
+        doc='''
+        **Syntax:** **refresh_interval=***<seconds>*
+        **Description:** Seconds before the index is looked up again, 0 never looks it up again. Default: 300''',
+        default=300, validate=validators.Integer(0))
+
+    def prepare(self):
+        self.actions = Actions()
+        self.actions.configure({
+            'batch_mode': self.batch_mode, 'refresh_interval': self.refresh_interval, 'workers': self.workers,
+            'queue_size': self.queue_size, 'sink': self.sink, 'hec_url': self.hec_url, 'hec_token': self.hec_token,
+            'hec_gzip': self.hec_gzip, 'compression': self.compression, 'spool': self.spool,
+            'replay_budget': self.replay_budget})
+        self.actions.token = self.metadata.searchinfo.session_key
+        self.pending = []  # (record, serialized record) pairs of the current chunk
+        self.metric = SearchMetric(0.0, 0, 0, 0)
+
+    def stream(self, records):
+        for record in records:
+            self.actions.transform(record)
+            # all changes to 'record' after this will not be indexed
+            self.pending.append((record, self.actions.serialize(record)))
+        for record in self.submit_pending():
+            yield record
+        self.actions.finish()
+
+    def flush(self):
+        # Called once a chunk has been read, before its output is sent back: the chunk's records are held in pending,
+        # so they are indexed and written here rather than carried over into the next chunk.
+        self._record_writer.write_records(self.submit_pending())
+        StreamingCommand.flush(self)
+
+    def submit_pending(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return []
+
+        start = time.time()
+        post = self.actions.push_batch([line for record, line in batch])
+        elapsed = time.time() - start
+
+        for record, line in batch:
+            record['is_indexed'] = str(post)
+
+        metric = self.metric
+        self.metric = SearchMetric(
+            metric.elapsed_seconds + elapsed, metric.invocation_count + 1, metric.input_count + len(batch),
+            self.actions.indexed_count)
+        self.write_metric('indexdata.submit', self.metric)
+        self.logger.debug('Submitted %d records in %.3f seconds: %s', len(batch), elapsed, post)
+        return [record for record, line in batch]
+
+
+dispatch(IndexDataCommand, sys.argv, sys.stdin, sys.stdout, __name__)
@@ -0,0 +1,19 @@
+# sends the batches indexdata spooled while splunkd could not take them; meant to run as the
+# scripted input in inputs.conf, with passAuth handing the session key over on stdin
+import logging
+import sys
+from index_data import Actions
+
+logger = logging.getLogger("index_data")
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO) # stderr ends up in splunkd.log
+    actions = Actions()
+    actions.configure({}) # HEC batches need the HEC token, so only the receivers spool is replayed here
+    actions.token = sys.stdin.readline().strip()
+    replayed = actions.spool.replay(actions.sink.send)
+    logger.info("%d spooled batches indexed", replayed)
+    actions.sink.close()
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,113 @@
+import json
+import socket
+import threading
+
+from abc import ABC, abstractmethod
+from collections import UserDict
+from json.encoder import encode_basestring_ascii
+
+import splunklib.binding as binding
+
+def _default(o):
+    if isinstance(o, UserDict):
+        return o.data # splunk.util.OrderedDict keeps its items in insertion order in a plain dict
+    raise TypeError(repr(o) + ' is not JSON serializable')
+
+try:
+    from _json import make_encoder
+except ImportError:
+    _iterencode = json.JSONEncoder(separators=(',', ':'), default=_default).iterencode
+else:
+    # the C encoder RecordWriter uses, built once and shared by every batch
+    _iterencode = make_encoder({}, _default, encode_basestring_ascii, None, ':', ',', False, False, True)
+    del make_encoder
+
+def encode_event(value): # compact ascii-only JSON; results are encoded in place and multivalue fields as lists
+    return ''.join(_iterencode(value, 0))
+
+class Sink(ABC):
+    # where Actions sends its batches; a batch is a list of lines built by format()
+    spool_name = "receivers" # sinks sharing a spool_name can replay each other's batches
+
+    def __init__(self,actions):
+        self.actions = actions
+
+    def format(self,result,line): # the text sent for one result, line is the result serialized as JSON
+        return line
+
+    @abstractmethod
+    def send(self,lines): # raises when the batch was not accepted
+        pass
+
+    def reset(self): # called after a failed send, before the next one
+        pass
+
+    def close(self):
+        pass
+
+class SimpleSink(Sink):
+    # one receivers/simple POST per batch through Index.submit
+    def send(self,lines):
+        actions = self.actions
+        target = actions.get_target(actions.index, actions.token)
+        target.submit("\n".join(lines) + "\n", sourcetype=actions.sourcetype, compression=actions.compression)
+
+class StreamSink(Sink):
+    # every batch written to one receivers/stream socket opened by Index.attach
+    def __init__(self,actions):
+        Sink.__init__(self,actions)
+        self.stream = None
+        self.lock = threading.Lock() # async workers share the socket
+
+    def send(self,lines):
+        actions = self.actions
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        with self.lock:
+            if self.stream is None:
+                self.stream = actions.get_target(actions.index, actions.token).attach(sourcetype=actions.sourcetype)
+            self.stream.sendall(payload)
+
+    def reset(self):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None:
+                try:
+                    self.stream.shutdown(socket.SHUT_RDWR)
+                    self.stream.close()
+                except Exception:
+                    pass
+                self.stream = None
+
+class HecSink(Sink):
+    # batches posted to the HTTP Event Collector /services/collector/event endpoint over
+    # keep-alive connections, each result wrapped with its own time, index and sourcetype
+    spool_name = "hec"
+
+    def __init__(self,actions):
+        Sink.__init__(self,actions)
+        if not actions.hec_token:
+            raise ValueError("hec_token is required to index through the HTTP Event Collector")
+        self.url = actions.hec_url.rstrip("/") + "/services/collector/event"
+        self.headers = [("Authorization", "Splunk %s" % actions.hec_token), ("Content-Type", "application/json")]
+        self.http = binding.HttpLib(verify=False, pool_size=actions.pool_size)
+        self.index = encode_event(actions.index)
+        self.sourcetype = encode_event(actions.sourcetype)
+
+    def format(self,result,line):
+        return '{"time":%s,"index":%s,"sourcetype":%s,"event":%s}' % (
+            encode_event(result.get('timestamp')), self.index, self.sourcetype, line)
+
+    def send(self,lines):
+        compression = "gzip" if self.actions.hec_gzip else None
+        response = self.http.post(self.url, list(self.headers), compression=compression,
+                                  body="\n".join(lines)) # raises HTTPError unless HEC accepted the batch
+        response.body.read()
+
+    def close(self):
+        handler = self.http.handler
+        if hasattr(handler, "pool"):
+            handler.pool.clear()
+
+SINKS = {"simple": SimpleSink, "stream": StreamSink, "hec": HecSink}
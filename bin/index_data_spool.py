@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+
+class Spool:
+    # append-only store for batches that could not be indexed; every batch is one JSON line
+    # in a segment file. Segments are written as <name>.open, fsync'd every fsync_every
+    # batches and renamed to <name>.spool once they reach max_segment_bytes or the spool is
+    # closed. Only .spool segments (and .open or .replay ones abandoned for stale_after
+    # seconds) are replayed, oldest first.
+    def __init__(self,path,max_segment_bytes=67108864,fsync_every=16,backoff_min=5,backoff_max=3600,stale_after=3600):
+        self.path = path
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_every = fsync_every
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.stale_after = stale_after
+        self.lock = threading.Lock()
+        self.segment = None # (name, file) of the segment this process appends to
+        self.unsynced = 0
+        self.state_file = os.path.join(path, "state.json")
+        self.state = None # (mtime, state) of state.json as last read or written by this process
+        os.makedirs(path, exist_ok=True)
+
+    def append(self,lines):
+        record = (json.dumps(lines) + "\n").encode('utf-8')
+        with self.lock:
+            if self.segment is None:
+                name = "%020d-%d" % (int(time.time() * 1000000), os.getpid())
+                self.segment = (name, open(os.path.join(self.path, name + ".open"), "ab"))
+            name, f = self.segment
+            f.write(record)
+            self.unsynced += 1
+            if self.unsynced >= self.fsync_every:
+                self.sync()
+            if f.tell() >= self.max_segment_bytes:
+                self.rotate()
+
+    def sync(self): # called with the lock held
+        name, f = self.segment
+        f.flush()
+        os.fsync(f.fileno())
+        self.unsynced = 0
+
+    def rotate(self): # called with the lock held
+        if self.segment is None:
+            return
+        self.sync()
+        name, f = self.segment
+        f.close()
+        os.rename(os.path.join(self.path, name + ".open"), os.path.join(self.path, name + ".spool"))
+        self.segment = None
+
+    def close(self):
+        with self.lock:
+            self.rotate()
+
+    def backing_off(self): # True while failed sends are waiting for their next attempt
+        return time.time() < self.load_state()["next_attempt"]
+
+    def failed(self): # schedules the next attempt with exponential backoff
+        with self.lock:
+            state = self.load_state()
+            state["attempts"] += 1
+            delay = min(self.backoff_min * 2 ** (state["attempts"] - 1), self.backoff_max)
+            state["next_attempt"] = time.time() + delay
+            self.save_state(state)
+
+    def succeeded(self):
+        with self.lock:
+            if self.load_state()["attempts"]:
+                self.save_state({"attempts": 0, "next_attempt": 0})
+
+    def load_state(self): # state.json is only read again once another process has replaced it
+        try:
+            mtime = os.stat(self.state_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self.state is None or self.state[0] != mtime:
+            state = {"attempts": 0, "next_attempt": 0}
+            if mtime is not None:
+                try:
+                    with open(self.state_file) as f:
+                        state = json.load(f)
+                except (IOError, ValueError):
+                    pass
+            self.state = (mtime, state)
+        return dict(self.state[1])
+
+    def save_state(self,state):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+        self.state = (os.stat(self.state_file).st_mtime_ns, dict(state))
+
+    def segments(self): # names of the segments ready to be replayed, oldest first
+        now = time.time()
+        ready = []
+        for entry in sorted(os.listdir(self.path)):
+            full = os.path.join(self.path, entry)
+            if entry.endswith(".spool"):
+                ready.append(entry)
+            elif entry.endswith((".open", ".replay")) and now - os.path.getmtime(full) > self.stale_after \
+                    and (self.segment is None or entry != self.segment[0] + ".open"):
+                ready.append(entry)
+        return ready
+
+    def replay(self,send,budget=None): # sends spooled batches until one fails or budget seconds pass
+        self.close()
+        if self.backing_off():
+            return 0
+        deadline = None if budget is None else time.time() + budget
+        sent = 0
+        for entry in self.segments():
+            claimed = os.path.join(self.path, entry + ".replay")
+            try:
+                os.rename(os.path.join(self.path, entry), claimed) # another process may have claimed it first
+            except OSError:
+                continue
+            with open(claimed, "rb") as f:
+                records = f.readlines()
+            for i, record in enumerate(records):
+                try:
+                    lines = json.loads(record)
+                except ValueError:
+                    continue # a batch cut short by a crash
+                if deadline is not None and time.time() > deadline:
+                    self.put_back(entry, records[i:], claimed)
+                    return sent
+                try:
+                    send(lines)
+                except Exception:
+                    self.failed()
+                    self.put_back(entry, records[i:], claimed)
+                    return sent
+                sent += 1
+            os.remove(claimed)
+        if sent:
+            self.succeeded()
+        return sent
+
+    def put_back(self,entry,records,claimed): # keeps the unsent batches of a segment in its place in the order
+        name = entry.split(".", 1)[0]
+        tmp = os.path.join(self.path, name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.writelines(records)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, name + ".spool"))
+        os.remove(claimed)
@@ -14,7 +14,6 @@ from builtins import zip
 from builtins import range
 import csv 
 import sys 
-import copy
 import re
 if sys.version_info >= (3, 0):
     from io import (BytesIO, TextIOWrapper, StringIO)
@@ -116,41 +115,45 @@ For multivalues, values are wrapped in '$' and separated using ';'
 Literal '$' values are represented with'$$'
 '''
 def getEncodedMV(vals):
-    s = ""
-    for val in vals:
-        val = val.replace('$', '$$')
-        if len(s):
-            s += ';'
-        s += '$' + val + '$'
-    return s
+    return ';'.join(['$' + val.replace('$', '$$') + '$' for val in vals])
 
 
 def decodeMV(s, vals):
-    if len(s) == 0:
+    decoded = splitMV(s)
+    if decoded is None:
         return False
+    vals.extend(decoded)
+    return True
 
-    tok = ""
-    inval = False
 
-    i = 0
-    while i < len(s):
-        if not inval:
-            if s[i] == '$':
-                inval = True
-            elif s[i] != ';':
-                return False
-        else:
-            if s[i] == '$' and i+1 < len(s) and s[i+1] == '$':
-                tok += '$'
-                i += 1
-            elif s[i] == '$':
-                inval = False
-                vals.append(tok)
-                tok = ""
-            else:
-                tok += s[i]
-        i += 1
-    return True
+# A value and the ';' separators before it; a '$' followed by another '$' is
+# an escaped '$', not the end of the value.
+_mv_value = re.compile(r';*\$((?:[^$]|\$\$)*)\$(?!\$)')
+# What may follow the last value: separators and a value cut short, which is dropped.
+_mv_tail = re.compile(r';*(?:\$(?:[^$]|\$\$)*)?\Z')
+
+def splitMV(s):
+    '''
+    Returns the list of values of an encoded multivalue, or None if 's' is
+    empty or not an encoded multivalue. Same rules as decodeMV().
+    '''
+    if len(s) == 0:
+        return None
+    if s[0] == '$' and s[-1] == '$' and '$$' not in s:
+        # no escaped '$', so every '$' delimits a value
+        vals = s[1:-1].split('$;$')
+        if s.count('$') == 2 * len(vals):
+            return vals
+    vals = []
+    pos = 0
+    match = _mv_value.match(s)
+    while match is not None:
+        vals.append(match.group(1).replace('$$', '$'))
+        pos = match.end()
+        match = _mv_value.match(s, pos)
+    if _mv_tail.match(s, pos) is None:
+        return None
+    return vals
 
 
 def addMessage(messages, msg, key):
@@ -165,10 +168,17 @@ def addWarnMessage(messages, msg):
 def addErrorMessage(messages, msg):
     addMessage(messages, msg, "error_message")
 
-def outputResults(results, messages = None, fields = None, mvdelim = '\n', outputfile = None):
+def outputResults(results, messages = None, fields = None, mvdelim = '\n', outputfile = None, window = None):
     '''
     Outputs the contents of a result set to STDOUT in Interplunk
     format, for consumption by the next search processor.
+
+    'results' may be any iterable, and each result is written as soon as
+    the header is known. With 'fields' that is right away. Without them the
+    header is every field of the results, in order of appearance. All of the
+    results are read to find those fields, unless 'window' is given. In
+    that case only the first 'window' results are read for the header, and
+    fields that only appear after them are not written.
     '''
 
     if outputfile is None:
@@ -188,64 +198,112 @@ def outputResults(results, messages = None, fields = None, mvdelim = '\n', outpu
     if results == None:
         return
 
-    s = set()
-    l = []
-
-    '''
-    Check each entry to see if it is a list (multivalued). If so, set
-    the multivalued key to the proper encoding Replace the list with a
-    newline separated string of the values
-    '''
-    for i in range(len(results)):
-        for key in list(results[i].keys()): # We wrapped the call to keys() in a list() for py3's dictionary changed size during iteration.
-            if(isinstance(results[i][key], list)):
-                results[i]['__mv_' + key] = getEncodedMV(results[i][key])
-                results[i][key] = mvdelim.join(results[i][key])
-        for k in list(results[i].keys()): # We wrapped the call to keys() in a list() for py3's dictionary changed size during iteration.
-            if not k in s:
-               s.add(k)
-               l.append(k)
-        #s.update(results[i].keys())
-
+    results = iter(results)
+    buffered = []
     if fields is None:
-        h = l
-    else:
-        h = fields
+        # the header is the union of the fields of the buffered results, in order
+        s = set()
+        fields = []
+        for result in results:
+            encodeMVFields(result, mvdelim)
+            buffered.append(result)
+            for k in result:
+                if k not in s:
+                    s.add(k)
+                    fields.append(k)
+            if window is not None and len(buffered) >= window:
+                break
 
     if sys.version_info >= (3, 0):
-        outputfile = TextIOWrapper(outputfile, encoding = 'utf-8', write_through = True)
-    dw = csv.DictWriter(outputfile, h, extrasaction='ignore')
-    dw.writerow(dict(zip(h, h)))
-    dw.writerows(results)
+        outputfile = TextIOWrapper(outputfile, encoding = 'utf-8')
+    writerow = csv.writer(outputfile).writerow
+    writerow(fields)
+    for result in buffered:
+        get = result.get
+        writerow([get(field, '') for field in fields])
+    for result in results:
+        encodeMVFields(result, mvdelim)
+        get = result.get
+        writerow([get(field, '') for field in fields])
     if sys.version_info >= (3, 0):
         outputfile.detach() # Don't close the underlying file
 
 
-def outputStreamResults(results, version = "4.3", header = None, mvdelim = '\n', outputfile = None):
+def encodeMVFields(result, mvdelim = '\n'):
+    '''
+    Replaces each multivalued (list) field of a result with its values
+    joined by 'mvdelim', and sets its '__mv_' field to their encoding.
+    '''
+    mv_keys = [key for key, val in result.items() if isinstance(val, list)]
+    for key in mv_keys:
+        vals = result[key]
+        result['__mv_' + key] = getEncodedMV(vals)
+        result[key] = mvdelim.join(vals)
+
+
+def outputResultsIter(results, fields, mvdelim = '\n', outputfile = None):
+    '''
+    Streaming counterpart of outputResults(): writes each result of an
+    iterable as soon as it is produced, so the result set never has to be
+    held in memory. The header is written first, so the output fields must
+    be given up front; multivalued fields are written to their '__mv_'
+    column when it is one of the fields.
+    '''
+
+    outputResults(results, None, fields, mvdelim, outputfile)
+
+
+def outputStreamResults(results, version = "4.3", header = None, mvdelim = '\n', outputfile = None, chunk_size = None):
+    '''
+    Writes a result set as a "splunk <version>,<header length>,<body
+    length>" framed chunk. With 'chunk_size', 'results' may be any iterable
+    and is written as a series of chunks of at most 'chunk_size' results.
+    Each chunk has its own header of the fields it holds. The optional
+    'header' results are only sent with the first chunk.
+    '''
 
     if outputfile is None:
         outputfile = default_stdout_stream()
 
-    header_io = BytesIO()
-    header_str = b""
-    if header is not None:
-        outputResults(header, None, None, mvdelim, header_io)
-        header_str = header_io.getvalue()
-        header_io.close()
-
-    body_io = BytesIO()
-    body_str = b""
-    outputResults(results, None, None, mvdelim, body_io)
-    body_str = body_io.getvalue()
-    body_io.close()
+    if chunk_size is None:
+        chunks = [results]
+    else:
+        chunks = _chunks(results, chunk_size)
 
     if sys.version_info >= (3, 0):
         version = version.encode()
-    outputfile.write(b"splunk %s,%d,%d\n" % (version, len(header_str), len(body_str)))
-    if len(header_str) > 0:
-        outputfile.write(header_str)
-    if len(body_str) > 0:
-        outputfile.write(body_str)
+
+    for body in chunks:
+        header_io = BytesIO()
+        header_str = b""
+        if header is not None:
+            outputResults(header, None, None, mvdelim, header_io)
+            header_str = header_io.getvalue()
+            header_io.close()
+            header = None
+
+        body_io = BytesIO()
+        body_str = b""
+        outputResults(body, None, None, mvdelim, body_io)
+        body_str = body_io.getvalue()
+        body_io.close()
+
+        outputfile.write(b"splunk %s,%d,%d\n" % (version, len(header_str), len(body_str)))
+        if len(header_str) > 0:
+            outputfile.write(header_str)
+        if len(body_str) > 0:
+            outputfile.write(body_str)
+
+
+def _chunks(results, chunk_size):
+    chunk = []
+    for result in results:
+        chunk.append(result)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 def generateErrorResults(errorStr):
     '''
@@ -272,14 +330,23 @@ def readResults(input_buf = None, settings = None, has_header = True):
     representation of the contained events.
     '''
 
+    return list(readResultsIter(input_buf, settings, has_header))
+
+
+def readResultsIter(input_buf = None, settings = None, has_header = True):
+    '''
+    Streaming counterpart of readResults(): reads the settings header and
+    the CSV field header right away, then returns a ResultsIterator that
+    parses one event per step, so the whole result set is never held in
+    memory.
+    '''
+
     if input_buf == None:
         if sys.version_info >= (3, 0):
             input_buf = TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
         else:
             input_buf = sys.stdin
 
-    results = []
-
     if settings == None:
         settings = {} # dummy
 
@@ -304,43 +371,54 @@ def readResults(input_buf = None, settings = None, has_header = True):
             val  = urllib_parse.unquote(line[colon+1:])
             settings[attr] = val
 
-    csvr = csv.reader(input_buf)
-    header = []
-    first = True
-    mv_fields = []
-    for line in csvr:
-        if first:
-            header = line
-            first = False
-            # Check which fields are multivalued (for a field 'foo', '__mv_foo' also exists)
-            if MV_ENABLED:
-                for field in header:
-                    if "__mv_" + field in header:
-                        mv_fields.append(field)
-            continue
+    return ResultsIterator(input_buf)
 
-        # need to maintain field order
-        import splunk.util as util
-        result = util.OrderedDict()
-        i = 0
-        for val in line:
-            result[header[i]] = val
-            i = i+1
-
-        for key in mv_fields:
-            mv_key = "__mv_" + key
-            if key in result and mv_key in result:
+
+# The type of each event read: dicts keep their insertion order from
+# Python 3.7 on.
+if sys.version_info >= (3, 7):
+    Result = dict
+else:
+    from collections import OrderedDict as Result
+
+
+class ResultsIterator(object):
+    '''
+    Iterates over the events of an Intersplunk CSV body one row at a time.
+    The field header, including any '__mv_' columns, is available as
+    'header' before the first event is read.
+    '''
+
+    def __init__(self, input_buf):
+        self._csvr = csv.reader(input_buf)
+        self.header = next(self._csvr, [])
+        # Check which fields are multivalued (for a field 'foo', '__mv_foo' also exists)
+        self.mv_fields = []
+        if MV_ENABLED:
+            for field in self.header:
+                if "__mv_" + field in self.header:
+                    self.mv_fields.append(field)
+        self._mv_keys = [(key, "__mv_" + key) for key in self.mv_fields]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # need to maintain field order; a short line only sets its leading fields
+        result = Result(zip(self.header, next(self._csvr)))
+
+        for key, mv_key in self._mv_keys:
+            encoded = result.get(mv_key)
+            if encoded and key in result:
                 # Expand the value of __mv_[key] to a list, store it in key, and delete __mv_[key]
-                vals = []
-                if decodeMV(result[mv_key], vals):
-                    result[key] = copy.deepcopy(vals)
-                    if len(result[key]) == 1:
-                        result[key] = result[key][0]
+                vals = splitMV(encoded)
+                if vals is not None:
+                    result[key] = vals[0] if len(vals) == 1 else vals
                     del result[mv_key]
 
-        results.append(result)
+        return result
 
-    return results
+    next = __next__ # python 2
 
 
 def getOrganizedResults(input_str = None):
@@ -363,6 +441,20 @@ def getOrganizedResults(input_str = None):
     return results, dummyresults, settings
 
 
+def getOrganizedResultsIter(input_str = None):
+    '''
+    Same as getOrganizedResults(), except that "results" is a
+    ResultsIterator (see readResultsIter()) rather than a list.
+    '''
+
+    settings = {}
+    dummyresults = []
+
+    results = readResultsIter(input_str, settings)
+
+    return results, dummyresults, settings
+
+
 def rawresultsToString(results):
     '''
     Extracts the raw event data from a result set and returns all of
@@ -589,6 +681,77 @@ breeder,fictional
         generatedOutput = generatedOutput.replace(b'\r\n', b'\n')
         if MV_ENABLED:
             self.assertEqual(generatedOutput.decode('UTF-8'), expectedOutputFields)
+
+    def testStreamingReadWrite(self):
+        '''
+        The iterator based reader and writer produce the same output as
+        readResults() and outputResults().
+        '''
+
+        input = u'''
+constant,_raw,mval,__mv_mval
+gardener,first,ignored,$dollar$$bill$;$bar$
+gardener,second,single,$one$
+gardener,third,,
+'''
+        fields = ['constant', '_raw', 'mval', '__mv_mval', 'scrabble']
+
+        expected = BytesIO()
+        results = readResults(StringIO(input))
+        for event in results:
+            event['scrabble'] = 'dictionary'
+        outputResults(results, fields=fields, outputfile=expected)
+
+        results = readResultsIter(StringIO(input))
+        self.assertEqual(results.header, ['constant', '_raw', 'mval', '__mv_mval'])
+
+        def addField(events):
+            for event in events:
+                event['scrabble'] = 'dictionary'
+                yield event
+
+        generated = BytesIO()
+        outputResultsIter(addField(results), fields, outputfile=generated)
+        self.assertEqual(generated.getvalue(), expected.getvalue())
+
+    def testOutputWindowAndChunks(self):
+        '''
+        Without fields the header is read from the first 'window' results,
+        and chunked stream output has a header per chunk.
+        '''
+
+        def events():
+            yield {'a': '1'}
+            yield {'b': ['x', 'y$']}
+            yield {'c': '3'}
+
+        generated = BytesIO()
+        outputResults(events(), window=2, outputfile=generated)
+        self.assertEqual(generated.getvalue().replace(b'\r\n', b'\n'),
+                         b'a,b,__mv_b\n1,,\n,"x\ny$",$x$;$y$$$\n,,\n')
+
+        generated = BytesIO()
+        outputStreamResults(events(), chunk_size=2, outputfile=generated)
+        self.assertEqual(generated.getvalue().replace(b'\r\n', b'\n'),
+                         b'splunk 4.3,0,36\na,b,__mv_b\n1,,\n,"x\ny$",$x$;$y$$$\n'
+                         b'splunk 4.3,0,6\nc\n3\n')
+
+    def testDecodeMV(self):
+        '''
+        Multivalues decode with escaped '$', ';' inside values and cut short
+        values, and anything else is left undecoded.
+        '''
+
+        self.assertEqual(splitMV('$a$;$b$'), ['a', 'b'])
+        self.assertEqual(splitMV('$dollar$$bill$;$a;b$'), ['dollar$bill', 'a;b'])
+        self.assertEqual(splitMV(';$a$;;$b'), ['a'])
+        self.assertEqual(splitMV('$$$$'), ['$'])
+        self.assertEqual(splitMV('$a$x'), None)
+        self.assertEqual(splitMV(''), None)
+
+        vals = []
+        self.assertTrue(decodeMV('$one$', vals))
+        self.assertEqual(vals, ['one'])
             
             
 if __name__ == '__main__':
@@ -19,6 +19,7 @@ import splunk.util as util
 import splunk.rest.format
 import splunk.entity as entity
 import json
+from splunklib.polling import JOB_STATUS_FIELDS, fetch_concurrently, get_retry_interval, wait_for_jobs
 
 logger = logging.getLogger('splunk.search')
 
@@ -413,20 +414,71 @@ def waitForJob(searchjob, maxtime=-1):
     Wait up to maxtime seconds for searchjob to finish.  If maxtime is
     negative (default), waits forever.  Returns true, if job finished.
     All real-time searches will return immediately.
+
+    Polls fetch only the isDone and dispatchState properties, at an interval
+    eased from STATUS_FETCH_MIN_INTERVAL to STATUS_FETCH_MAX_INTERVAL.
     """
 
-    pause = 0.2
-    lapsed = 0.0
-    while not searchjob.isDone:
-        if searchjob.isRealTimeSearch:
-            break
-        time.sleep(pause)
-        lapsed += pause
-        if maxtime >= 0 and lapsed > maxtime:
-            break
+    if searchjob.isDone or searchjob.isRealTimeSearch:
+        return searchjob.isDone
+    done = wait_for_jobs(lambda sids: _getJobStatuses([searchjob]), [searchjob.id],
+                         None if maxtime < 0 else maxtime, STATUS_FETCH_MIN_INTERVAL,
+                         STATUS_FETCH_MAX_INTERVAL, STATUS_FETCH_EASING_DURATION)
+    if not done:
+        return False # timed out, or the job was cancelled or expired
     return searchjob.isDone
 
 
+def waitForJobs(searchjobs, maxtime=-1):
+    """
+    Wait up to maxtime seconds for every job in searchjobs to finish, polling
+    the state of the jobs not done yet.  If maxtime is negative (default),
+    waits forever.  Real-time searches are not waited for, and neither are
+    jobs that are cancelled or expire while waited for.  Returns true, if all
+    jobs finished.
+    """
+
+    pending = dict((job.id, job) for job in searchjobs if not job.isDone and not job.isRealTimeSearch)
+    if not pending:
+        return True
+    done = wait_for_jobs(lambda sids: _getJobStatuses([pending[sid] for sid in sids]), list(pending),
+                         None if maxtime < 0 else maxtime, STATUS_FETCH_MIN_INTERVAL,
+                         STATUS_FETCH_MAX_INTERVAL, STATUS_FETCH_EASING_DURATION)
+    return len(done) == len(pending)
+
+
+def _getJobStatuses(searchjobs):
+    '''
+    Returns a dict mapping the id of each job in searchjobs to its isDone and
+    dispatchState properties, leaving out the jobs splunkd no longer has. The
+    jobs are fetched concurrently.
+    '''
+
+    def fetch(searchjob):
+        try:
+            return searchjob.id, _getJobStatus(searchjob), True
+        except splunk.ResourceNotFound:
+            return searchjob.id, None, False
+
+    return dict((sid, status) for sid, status, found in fetch_concurrently(fetch, searchjobs) if found)
+
+
+def _getJobStatus(searchjob):
+    '''
+    Returns the isDone and dispatchState properties of searchjob, or None
+    while splunkd has no status for it yet.
+    '''
+
+    uri = entity.buildEndpoint(JOBS_ENDPOINT_ENTITY_PATH, searchjob.id)
+    if searchjob.hostPath:
+        uri = searchjob.hostPath + uri
+    serverResponse, serverContent = rest.simpleRequest(uri, sessionKey=searchjob.sessionKey, raiseAllErrors=True,
+        getargs={'output_mode': 'json', 'f': JOB_STATUS_FIELDS})
+    if serverResponse.status == 204:
+        return None
+    return json.loads(serverContent)['entry'][0]['content']
+
+
 # /////////////////////////////////////////////////////////////////////////////
 #  Search objects
 # /////////////////////////////////////////////////////////////////////////////
@@ -2134,28 +2186,8 @@ class JobLite(object):
 # Supplemental methods
 # ////////////////////////////////////////////////////////////////////////////
 
-def getRetryInterval(elapsed_time, min_interval, max_interval, clamp_time):
-    '''
-    Returns a wait time (sec) based on the current time elapsed, as mapped
-    onto a cubic easing function.
-
-    elapsed_time: number of seconds that have elapsed since the first
-        call to getRetryInterval()
-
-    min_interval: minimum return value of this method; also the interval
-        returned when elapsed_time = 0
-
-    max_interval: maximum return value of this method; also the interval
-        returned when elapsed_time >= clamp_time
-
-    clamp_time: total duration over which to calculate a wait time; while
-        elapsed_time < clamp_time, the return value will be less than
-        max_interval; when elapsed_time >= clamp_time, the return value will
-        always be max_interval
-    '''
-
-    if elapsed_time >= clamp_time: return float(max_interval)
-    return min(max_interval * pow(elapsed_time/float(clamp_time), 3) + min_interval, max_interval)
+# The cubic easing now lives in splunklib.polling, shared with the SDK's job waiting.
+getRetryInterval = get_retry_interval
 
 
 def normalizeJobPropertyValue(key, value):
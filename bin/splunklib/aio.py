@@ -0,0 +1,615 @@
+# Copyright 2011-2015 Splunk, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"): you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The **splunklib.aio** module provides an :mod:`asyncio` variant of the
+binding layer, and async versions of the most used client operations.
+
+:class:`AsyncContext` builds URLs, namespaces and authentication headers
+exactly like :class:`splunklib.binding.Context`, but its :meth:`get`,
+:meth:`post`, :meth:`delete` and :meth:`request` methods are coroutines. The
+requests go through :func:`async_handler`, which keeps persistent connections
+in an :class:`AsyncConnectionPool`, so many requests can be in flight from one
+thread. :class:`AsyncService` adds search jobs and event submission on top::
+
+    import asyncio
+    import splunklib.aio as aio
+
+    async def main():
+        service = await aio.connect(host="localhost", username="admin", password="changeme")
+        job = await service.jobs.create("search index=_internal | head 10")
+        await job.wait()
+        async for result in job.results():
+            print(result)
+        await service.index("main").submit("hello world", sourcetype="greeting")
+        await service.close()
+
+    asyncio.run(main())
+
+The module requires Python 3.7 or later. The synchronous API is unchanged.
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+import json
+import logging
+import ssl
+import time
+from io import BytesIO
+from xml.etree.ElementTree import XML
+
+from .binding import (AuthenticationError, Context, HTTPError, HttpLib, UrlEncoded, _NoAuthenticationToken,
+                      _parse_cookies, _spliturl, DEFAULT_COMPRESSION_THRESHOLD, _IDEMPOTENT_METHODS)
+from .client import PATH_JOBS, PATH_RECEIVERS_SIMPLE
+from .data import record
+from .polling import JOB_STATUS_FIELDS, MAX_INTERVAL, MIN_INTERVAL, retry_intervals
+from .results import JSONResultsReader
+
+__all__ = [
+    "AsyncConnectionPool",
+    "AsyncContext",
+    "AsyncIndex",
+    "AsyncJob",
+    "AsyncJobs",
+    "AsyncResponseReader",
+    "AsyncService",
+    "async_handler",
+    "connect"
+]
+
+
+class AsyncConnectionPool(object):
+    """A bounded pool of persistent connections for :func:`async_handler`.
+
+    The async counterpart of :class:`splunklib.binding.ConnectionPool`: idle
+    ``(reader, writer)`` stream pairs are kept per ``(scheme, host, port)``
+    key, at most *max_size* of them per key, for at most *idle_timeout*
+    seconds.
+
+    :param ssl_context: The ``ssl.SSLContext`` used for https connections.
+    :param max_size: The maximum number of idle connections kept per key.
+    :type max_size: ``integer``
+    :param idle_timeout: The number of seconds an idle connection is kept.
+    :type idle_timeout: ``integer`` or ``float``
+    :param timeout: The number of seconds allowed to open a connection (optional).
+    :type timeout: ``integer`` or ``float``
+    """
+    def __init__(self, ssl_context, max_size=10, idle_timeout=60, timeout=None):
+        self.ssl_context = ssl_context
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = {}
+
+    async def checkout(self, key):
+        """Returns an idle connection for *key*, or a new one if none is left.
+
+        :return: A tuple of the reader, the writer and a ``Boolean`` that is
+            ``True`` when the connection was reused.
+        """
+        idle = self._idle.get(key, [])
+        now = time.time()
+        while idle:
+            reader, writer, released = idle.pop()
+            if now - released > self.idle_timeout or writer.is_closing() or reader.at_eof():
+                writer.close()
+                continue
+            return reader, writer, True
+        reader, writer = await self._connect(key)
+        return reader, writer, False
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        if scheme not in ("http", "https"):
+            raise ValueError("unsupported scheme: %s" % scheme)
+        opening = asyncio.open_connection(host, port, ssl=self.ssl_context if scheme == "https" else None)
+        return await asyncio.wait_for(opening, self.timeout)
+
+    def checkin(self, key, reader, writer):
+        """Returns a connection to the pool, closing it if the pool for *key*
+        is already full."""
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_size:
+            idle.append((reader, writer, time.time()))
+        else:
+            writer.close()
+
+    def clear(self):
+        """Closes every idle connection in the pool."""
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for reader, writer, released in connections:
+                writer.close()
+
+
+class AsyncResponseReader(object):
+    """The body of a response returned by :func:`async_handler`.
+
+    The body is read with the :meth:`read` coroutine, or iterated over with
+    ``async for``, which yields the body in blocks as they arrive. Once the
+    body has been read to the end, the connection goes back to the pool if the
+    server agreed to keep it alive.
+    """
+    def __init__(self, reader, length=None, chunked=False, release=None):
+        self._reader = reader
+        self._remaining = length  # bytes left in the body, or in the current chunk when chunked
+        self._chunked = chunked
+        self._release = release
+        self._done = length == 0 and not chunked
+        if self._done:
+            self._finish(True)
+
+    @property
+    def empty(self):
+        """Indicates whether the body has been read to the end."""
+        return self._done
+
+    def _finish(self, reusable):
+        self._done = True
+        release, self._release = self._release, None
+        if release is not None:
+            release(reusable)
+
+    async def _read_block(self, size):
+        # Reads at most size bytes (any amount if size is None) of the body.
+        if self._done:
+            return b""
+        if self._chunked:
+            if not self._remaining:
+                line = await self._reader.readline()
+                self._remaining = int(line.split(b";", 1)[0].strip() or b"0", 16)
+                if self._remaining == 0:
+                    while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    self._finish(True)
+                    return b""
+            n = self._remaining if size is None else min(size, self._remaining)
+            data = await self._reader.read(n)
+            if not data:
+                self._finish(False)
+                return b""
+            self._remaining -= len(data)
+            if self._remaining == 0:
+                await self._reader.readline()  # the CRLF closing the chunk
+            return data
+        if self._remaining is None:
+            data = await self._reader.read(65536 if size is None else size)
+            if not data:
+                self._finish(False)
+            return data
+        data = await self._reader.read(self._remaining if size is None else min(size, self._remaining))
+        if not data:
+            self._finish(False)
+            return b""
+        self._remaining -= len(data)
+        if self._remaining == 0:
+            self._finish(True)
+        return data
+
+    async def read(self, size=None):
+        """Reads at most *size* bytes of the body, or all of what is left of it
+        when *size* is ``None``."""
+        if size is not None:
+            return await self._read_block(size)
+        blocks = []
+        while not self._done:
+            blocks.append(await self._read_block(None))
+        return b"".join(blocks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self._read_block(65536)
+        if not data:
+            raise StopAsyncIteration
+        return data
+
+    async def lines(self):
+        """Yields the lines of the body, line endings removed, as they arrive."""
+        pending = b""
+        async for block in self:
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line
+        if pending:
+            yield pending
+
+    def close(self):
+        """Closes the body, dropping its connection unless it was read to the end."""
+        if not self._done:
+            self._finish(False)
+
+
+async def _read_head(reader):
+    # Reads the status line and headers of a response.
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    version, status, reason = (lines[0].split(" ", 2) + [""])[:3]
+    headers = []
+    for line in lines[1:]:
+        if line:
+            key, _, value = line.partition(":")
+            headers.append((key.strip().lower(), value.strip()))
+    return version, int(status), reason, headers
+
+
+def async_handler(key_file=None, cert_file=None, timeout=None, verify=False, pool_size=10, idle_timeout=60):
+    """This function returns an async HTTP request handler for
+    :class:`AsyncContext`.
+
+    The handler is a coroutine function taking the same ``(url, message)``
+    arguments as :func:`splunklib.binding.handler`, and returning the same
+    response dictionary with an :class:`AsyncResponseReader` as its body.
+    Connections are kept alive in an :class:`AsyncConnectionPool`, available
+    as the ``pool`` attribute of the returned function. A reused connection
+    that turns out to have been closed by the server is replaced by a new one.
+    As with :func:`splunklib.binding.pooled_handler`, a ``GET``, ``HEAD`` or
+    ``DELETE`` request is then sent again once; other requests raise the
+    error, because the server may already have acted on them.
+
+    :param `key_file`: A path to a PEM formatted file containing your private key (optional).
+    :type key_file: ``string``
+    :param `cert_file`: A path to a PEM formatted file containing a certificate chain file (optional).
+    :type cert_file: ``string``
+    :param `timeout`: The time-out, in seconds, to connect and to receive the
+        response headers (optional).
+    :type timeout: ``integer`` or "None"
+    :param `verify`: Set to False to disable SSL verification on https connections.
+    :type verify: ``Boolean``
+    :param `pool_size`: The maximum number of idle connections kept per host.
+    :type pool_size: ``integer``
+    :param `idle_timeout`: The number of seconds an idle connection is kept.
+    :type idle_timeout: ``integer`` or ``float``
+    """
+    ssl_context = ssl.create_default_context() if verify else ssl._create_unverified_context()
+    if cert_file is not None:
+        ssl_context.load_cert_chain(cert_file, key_file)
+    pool = AsyncConnectionPool(ssl_context, max_size=pool_size, idle_timeout=idle_timeout, timeout=timeout)
+
+    async def send(key, method, data):
+        reader, writer, reused = await pool.checkout(key)
+        while True:
+            try:
+                writer.write(data)
+                await writer.drain()
+                return reader, writer, await asyncio.wait_for(_read_head(reader), timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if not reused or method.upper() not in _IDEMPOTENT_METHODS:
+                    raise
+                (reader, writer), reused = await pool._connect(key), False
+            except BaseException:
+                writer.close()
+                raise
+
+    async def request(url, message, **kwargs):
+        scheme, host, port, path = _spliturl(url)
+        body = message.get("body", b"")
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        head = {
+            "Content-Length": str(len(body)),
+            "Host": host,
+            "User-Agent": "splunk-sdk-python/1.6.13",
+            "Accept": "*/*",
+            "Connection": "Keep-Alive",
+        } # defaults
+        for key, value in message["headers"]:
+            head[key] = value
+        method = message.get("method", "GET")
+        data = "%s %s HTTP/1.1\r\n%s\r\n" % (
+            method, path, "".join("%s: %s\r\n" % item for item in head.items()))
+
+        pool_key = (scheme, host, int(port))
+        reader, writer, (version, status, reason, headers) = await send(pool_key, method, data.encode('latin-1') + body)
+        fields = dict(headers)
+        keep_alive = "close" not in fields.get("connection", "").lower() and version != "HTTP/1.0"
+
+        def release(reusable):
+            if reusable and keep_alive:
+                pool.checkin(pool_key, reader, writer)
+            else:
+                writer.close()
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = AsyncResponseReader(reader, 0, release=release)
+        elif "chunked" in fields.get("transfer-encoding", "").lower():
+            body = AsyncResponseReader(reader, chunked=True, release=release)
+        elif "content-length" in fields:
+            body = AsyncResponseReader(reader, int(fields["content-length"]), release=release)
+        else:
+            keep_alive = False
+            body = AsyncResponseReader(reader, release=release)
+
+        return {
+            "status": status,
+            "reason": reason,
+            "headers": headers,
+            "body": body,
+        }
+
+    request.pool = pool
+    return request
+
+
+class AsyncHttpLib(HttpLib):
+    """The :class:`splunklib.binding.HttpLib` methods, as coroutines.
+
+    :meth:`get`, :meth:`post` and :meth:`delete` are inherited and build the
+    same request messages; they return the coroutine of :meth:`request`.
+    """
+    def __init__(self, custom_handler=None, verify=False, key_file=None, cert_file=None, pool_size=None,
+                 compression_threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        if custom_handler is None:
+            custom_handler = async_handler(verify=verify, key_file=key_file, cert_file=cert_file,
+                                           pool_size=pool_size or 10)
+        HttpLib.__init__(self, custom_handler, verify, compression_threshold=compression_threshold)
+
+    async def request(self, url, message, **kwargs):
+        """Issues an HTTP request to a URL.
+
+        :returns: A dictionary describing the response (see
+            :class:`splunklib.binding.HttpLib` for its structure).
+        :rtype: ``dict``
+        """
+        response = record(await self.handler(url, message, **kwargs))
+        if 400 <= response.status:
+            # HTTPError reads the body synchronously
+            response.body = BytesIO(await response.body.read())
+            raise HTTPError(response)
+        for key, value in response.headers:
+            if key.lower() == "set-cookie":
+                _parse_cookies(value, self._cookies)
+        return response
+
+
+class AsyncContext(Context):
+    """An :class:`splunklib.binding.Context` whose requests are coroutines.
+
+    It takes the same arguments as ``Context``; *handler*, when given, must be
+    an async handler such as the one returned by :func:`async_handler`.
+    Authentication, namespaces and ``autologin`` work as they do with
+    ``Context``.
+    """
+    http_class = AsyncHttpLib
+
+    async def _authenticated(self, send):
+        # The async counterpart of binding._authentication: send() returns
+        # the coroutine of one request.
+        if self.token is _NoAuthenticationToken and not self.has_cookies() \
+                and self.autologin and self.username and self.password:
+            await self.login()
+        try:
+            return await send()
+        except HTTPError as he:
+            if he.status != 401:
+                raise
+            if not self.autologin:
+                raise AuthenticationError("Request failed: Session is not logged in.", he)
+        try:
+            await self.login()
+            return await send()
+        except HTTPError as he:
+            if he.status == 401:
+                raise AuthenticationError("Autologin failed.", he)
+            raise
+
+    async def delete(self, path_segment, owner=None, app=None, sharing=None, **query):
+        """Performs a DELETE operation, see :meth:`splunklib.binding.Context.delete`."""
+        path = self.authority + self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
+        logging.debug("DELETE request to %s (body: %s)", path, repr(query))
+        return await self._authenticated(lambda: self.http.delete(path, self._auth_headers, **query))
+
+    async def get(self, path_segment, owner=None, app=None, headers=None, sharing=None, **query):
+        """Performs a GET operation, see :meth:`splunklib.binding.Context.get`."""
+        path = self.authority + self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
+        logging.debug("GET request to %s (body: %s)", path, repr(query))
+        return await self._authenticated(lambda: self.http.get(
+            path, (headers or []) + self.additional_headers + self._auth_headers, **query))
+
+    async def post(self, path_segment, owner=None, app=None, sharing=None, headers=None, compression=None, **query):
+        """Performs a POST operation, see :meth:`splunklib.binding.Context.post`."""
+        path = self.authority + self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
+        logging.debug("POST request to %s (body: %s)", path, repr(query))
+        return await self._authenticated(lambda: self.http.post(
+            path, (headers or []) + self.additional_headers + self._auth_headers,
+            compression=compression, **query))
+
+    async def request(self, path_segment, method="GET", headers=None, body="",
+                      owner=None, app=None, sharing=None):
+        """Issues an arbitrary HTTP request, see :meth:`splunklib.binding.Context.request`."""
+        path = self.authority + self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
+        logging.debug("%s request to %s (body: %s)", method, path, repr(body))
+        return await self._authenticated(lambda: self.http.request(
+            path, {'method': method, 'headers': (headers or []) + self.additional_headers + self._auth_headers,
+                   'body': body}))
+
+    async def login(self):
+        """Logs into the Splunk instance, see :meth:`splunklib.binding.Context.login`."""
+        if (self.has_cookies() or self.token is not _NoAuthenticationToken) and \
+                not self.username and not self.password:
+            return self
+        if (self.basic and self.username and self.password) or self.bearerToken:
+            return self
+        try:
+            response = await self.http.post(
+                self.authority + self._abspath("/services/auth/login"),
+                username=self.username,
+                password=self.password,
+                headers=self.additional_headers,
+                cookie="1")
+            session = XML(await response.body.read()).findtext("./sessionKey")
+            self.token = "Splunk %s" % session
+            return self
+        except HTTPError as he:
+            if he.status == 401:
+                raise AuthenticationError("Login failed.", he)
+            raise
+
+    async def close(self):
+        """Closes the idle connections of this context."""
+        pool = getattr(self.http.handler, "pool", None)
+        if pool is not None:
+            pool.clear()
+
+
+class AsyncJob(object):
+    """A search job, identified by its *sid*, with async versions of the
+    :class:`splunklib.client.Job` operations that are polled the most."""
+    def __init__(self, service, sid):
+        self.service = service
+        self.sid = sid
+        self.path = PATH_JOBS + UrlEncoded(sid, encode_slash=True)
+        self.content = {}
+
+    async def refresh(self, *fields):
+        """Reads the job's properties into ``content``, restricted to *fields*
+        when given, and returns them."""
+        query = {"output_mode": "json"}
+        if fields:
+            query["f"] = list(fields)
+        response = await self.service.get(self.path, **query)
+        if response.status == 204:
+            self.content = {}  # not ready yet
+        else:
+            self.content = json.loads(await response.body.read())["entry"][0]["content"]
+        return self.content
+
+    async def is_done(self):
+        """Indicates whether this job finished running."""
+        content = await self.refresh(*JOB_STATUS_FIELDS)
+        return content.get("isDone") in (True, "1", 1)
+
+    async def wait(self, timeout=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        """Waits for the job to finish, polling its state with the eased
+        interval of :func:`splunklib.polling.wait_for_jobs`.
+
+        :return: ``True`` if the job is done, ``False`` if *timeout* passed first.
+        """
+        intervals = retry_intervals(timeout, min_interval, max_interval)
+        while not await self.is_done():
+            interval = next(intervals, None)
+            if interval is None:
+                return False
+            await asyncio.sleep(interval)
+        return True
+
+    async def results(self, pagesize=10000, **query_params):
+        """Yields the results of this finished job as dicts, a page of
+        *pagesize* results at a time, as :meth:`splunklib.client.Job.iter_results`
+        does. Messages are left out."""
+        offset = int(query_params.pop('offset', 0))
+        count = int(query_params.pop('count', 0)) or None
+        query_params['output_mode'] = 'json'
+        query_params['segmentation'] = query_params.get('segmentation', 'none')
+        while count is None or count > 0:
+            size = pagesize if count is None else min(pagesize, count)
+            response = await self.service.get(self.path + "/results", offset=offset, count=size, **query_params)
+            page = [result for result in JSONResultsReader(BytesIO(await response.body.read()))
+                    if isinstance(result, dict)]
+            for result in page:
+                yield result
+            if len(page) < size:
+                return
+            offset += size
+            if count is not None:
+                count -= size
+
+    async def cancel(self):
+        """Stops the job and deletes its results."""
+        try:
+            response = await self.service.post(self.path + "/control", action="cancel")
+            await response.body.read()
+        except HTTPError as he:
+            if he.status != 404:  # already gone
+                raise
+        return self
+
+
+class AsyncJobs(object):
+    """Async versions of the :class:`splunklib.client.Jobs` operations."""
+    def __init__(self, service):
+        self.service = service
+
+    async def create(self, query, **kwargs):
+        """Creates a search job, see :meth:`splunklib.client.Jobs.create`.
+
+        :return: The :class:`AsyncJob`.
+        """
+        if kwargs.get("exec_mode", None) == "oneshot":
+            raise TypeError("Cannot specify exec_mode=oneshot; use the oneshot method instead.")
+        response = await self.service.post(PATH_JOBS, search=query, output_mode="json", **kwargs)
+        return AsyncJob(self.service, json.loads(await response.body.read())["sid"])
+
+    async def export(self, query, **params):
+        """Runs an export search and yields its results as dicts and
+        :class:`splunklib.results.Message` objects as they arrive, see
+        :meth:`splunklib.client.Jobs.export`."""
+        if "exec_mode" in params:
+            raise TypeError("Cannot specify an exec_mode to export.")
+        params['segmentation'] = params.get('segmentation', 'none')
+        params['output_mode'] = 'json'
+        response = await self.service.post(PATH_JOBS + "export", search=query, **params)
+        try:
+            async for line in response.body.lines():
+                for item in JSONResultsReader(BytesIO(line)):
+                    yield item
+        finally:
+            response.body.close()
+
+
+class AsyncIndex(object):
+    """Async event submission to the index *name*."""
+    def __init__(self, service, name):
+        self.service = service
+        self.name = name
+
+    async def submit(self, event, host=None, source=None, sourcetype=None, compression=None):
+        """Submits events to the index, see :meth:`splunklib.client.Index.submit`.
+        Several newline-separated events can be sent in one *event*.
+
+        :return: The :class:`AsyncIndex`.
+        """
+        args = {'index': self.name}
+        if host is not None: args['host'] = host
+        if source is not None: args['source'] = source
+        if sourcetype is not None: args['sourcetype'] = sourcetype
+        response = await self.service.post(PATH_RECEIVERS_SIMPLE, body=event, compression=compression, **args)
+        await response.body.read()
+        return self
+
+
+class AsyncService(AsyncContext):
+    """An :class:`AsyncContext` with the async job and index operations."""
+    def __init__(self, **kwargs):
+        AsyncContext.__init__(self, **kwargs)
+        self.jobs = AsyncJobs(self)
+
+    def job(self, sid):
+        """Returns the :class:`AsyncJob` for an existing *sid*."""
+        return AsyncJob(self, sid)
+
+    def index(self, name):
+        """Returns the :class:`AsyncIndex` for the index *name*."""
+        return AsyncIndex(self, name)
+
+
+async def connect(**kwargs):
+    """Returns a logged in :class:`AsyncService`; takes the same arguments
+    as :func:`splunklib.client.connect`."""
+    service = AsyncService(**kwargs)
+    await service.login()
+    return service
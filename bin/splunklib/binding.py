@@ -26,11 +26,15 @@ If you want a friendlier interface to the Splunk REST API, use the
 
 from __future__ import absolute_import
 
+import gzip
 import io
 import logging
 import socket
 import ssl
 import sys
+import threading
+import time
+import zlib
 from base64 import b64encode
 from contextlib import contextmanager
 from datetime import datetime
@@ -55,7 +59,8 @@ __all__ = [
     "connect",
     "Context",
     "handler",
-    "HTTPError"
+    "HTTPError",
+    "pooled_handler"
 ]
 
 # If you change these, update the docstring
@@ -64,6 +69,10 @@ DEFAULT_HOST = "localhost"
 DEFAULT_PORT = "8089"
 DEFAULT_SCHEME = "https"
 
+# Request bodies smaller than this are sent uncompressed even when compression
+# is requested, since the gzip/deflate framing would outweigh the savings.
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+
 def _log_duration(f):
     @wraps(f)
     def new_f(*args, **kwargs):
@@ -455,6 +464,13 @@ class Context(object):
     :param headers: List of extra HTTP headers to send (optional).
     :type headers: ``list`` of 2-tuples.
     :param handler: The HTTP request handler (optional).
+    :param pool_size: When set, requests go through a :func:`pooled_handler`
+        that keeps up to this many persistent connections per host open
+        between requests (optional, ignored if *handler* is given).
+    :type pool_size: ``integer``
+    :param compression_threshold: The smallest POST body, in bytes, that is
+        compressed when a request asks for compression (optional).
+    :type compression_threshold: ``integer``
     :returns: A ``Context`` instance.
 
     **Example**::
@@ -469,9 +485,17 @@ class Context(object):
         # Or if you already have a valid cookie
         c = binding.Context(cookie="splunkd_8089=...")
     """
+    # The class of the HttpLib sending the requests; subclasses, such as
+    # splunklib.aio.AsyncContext, may send them differently.
+    http_class = None
+
     def __init__(self, handler=None, **kwargs):
-        self.http = HttpLib(handler, kwargs.get("verify", False), key_file=kwargs.get("key_file"),
-                            cert_file=kwargs.get("cert_file"))  # Default to False for backward compat
+        http_class = self.http_class or HttpLib
+        self.http = http_class(handler, kwargs.get("verify", False), key_file=kwargs.get("key_file"),
+                               cert_file=kwargs.get("cert_file"),
+                               pool_size=kwargs.get("pool_size"),
+                               compression_threshold=kwargs.get("compression_threshold",
+                                                                DEFAULT_COMPRESSION_THRESHOLD))  # Default to False for backward compat
         self.token = kwargs.get("token", _NoAuthenticationToken)
         if self.token is None: # In case someone explicitly passes token=None
             self.token = _NoAuthenticationToken
@@ -688,7 +712,7 @@ class Context(object):
 
     @_authentication
     @_log_duration
-    def post(self, path_segment, owner=None, app=None, sharing=None, headers=None, **query):
+    def post(self, path_segment, owner=None, app=None, sharing=None, headers=None, compression=None, **query):
         """Performs a POST operation from the REST path segment with the given
         namespace and query.
 
@@ -722,6 +746,10 @@ class Context(object):
         :type sharing: ``string``
         :param headers: List of extra HTTP headers to send (optional).
         :type headers: ``list`` of 2-tuples.
+        :param compression: Compress the ``body`` argument with this content
+            coding when it is at least ``compression_threshold`` bytes long
+            (optional).
+        :type compression: "gzip" or "deflate"
         :param query: All other keyword arguments, which are used as query
             parameters.
         :type query: ``string``
@@ -756,7 +784,7 @@ class Context(object):
         path = self.authority + self._abspath(path_segment, owner=owner, app=app, sharing=sharing)
         logging.debug("POST request to %s (body: %s)", path, repr(query))
         all_headers = headers + self.additional_headers + self._auth_headers
-        response = self.http.post(path, all_headers, **query)
+        response = self.http.post(path, all_headers, compression=compression, **query)
         return response
 
     @_authentication
@@ -1077,6 +1105,25 @@ def _encode(**kwargs):
             items.append((key, value))
     return urllib.parse.urlencode(items)
 
+# Compress a request body with the given content coding, adding the matching
+# Content-Encoding header. Bodies below the threshold are returned unchanged.
+def _compress(body, compression, threshold, headers):
+    if isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    if len(body) < threshold:
+        return body
+    if compression == "gzip":
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+            f.write(body)
+        body = buf.getvalue()
+    elif compression == "deflate":
+        body = zlib.compress(body)
+    else:
+        raise ValueError("unsupported compression: %s" % compression)
+    headers.append(("Content-Encoding", compression))
+    return body
+
 # Crack the given url into (scheme, host, port, path)
 def _spliturl(url):
     parsed_url = urllib.parse.urlparse(url)
@@ -1131,12 +1178,20 @@ class HttpLib(object):
     to get a handler function.
 
     If using the default handler, SSL verification can be disabled by passing verify=False.
+    Passing a *pool_size* replaces the default handler with a :func:`pooled_handler`
+    that keeps connections open between requests. POST bodies of at least
+    *compression_threshold* bytes are compressed when :meth:`post` is asked to.
     """
-    def __init__(self, custom_handler=None, verify=False, key_file=None, cert_file=None):
-        if custom_handler is None:
+    def __init__(self, custom_handler=None, verify=False, key_file=None, cert_file=None, pool_size=None,
+                 compression_threshold=DEFAULT_COMPRESSION_THRESHOLD):
+        if custom_handler is None and pool_size:
+            self.handler = pooled_handler(verify=verify, key_file=key_file, cert_file=cert_file,
+                                          pool_size=pool_size)
+        elif custom_handler is None:
             self.handler = handler(verify=verify, key_file=key_file, cert_file=cert_file)
         else:
             self.handler = custom_handler
+        self.compression_threshold = compression_threshold
         self._cookies = {}
 
     def delete(self, url, headers=None, **kwargs):
@@ -1193,7 +1248,7 @@ class HttpLib(object):
             url = url + UrlEncoded('?' + _encode(**kwargs), skip_encode=True)
         return self.request(url, { 'method': "GET", 'headers': headers })
 
-    def post(self, url, headers=None, **kwargs):
+    def post(self, url, headers=None, compression=None, **kwargs):
         """Sends a POST request to a URL.
 
         :param url: The URL.
@@ -1207,6 +1262,10 @@ class HttpLib(object):
             ``body`` keyword argument, all the keyword arguments are encoded
             into the body of the request in the format ``x-www-form-urlencoded``.
         :type kwargs: ``dict``
+        :param compression: The content coding used for a ``body`` of at least
+            ``compression_threshold`` bytes (optional). The body is sent with a
+            matching ``Content-Encoding`` header.
+        :type compression: "gzip" or "deflate"
         :returns: A dictionary describing the response (see :class:`HttpLib` for
             its structure).
         :rtype: ``dict``
@@ -1225,6 +1284,8 @@ class HttpLib(object):
             body = kwargs.pop('body')
             if len(kwargs) > 0:
                 url = url + UrlEncoded('?' + _encode(**kwargs), skip_encode=True)
+            if compression is not None:
+                body = _compress(body, compression, self.compression_threshold, headers)
         else:
             body = _encode(**kwargs).encode('utf-8')
         message = {
@@ -1301,14 +1362,17 @@ class ResponseReader(io.RawIOBase):
         :param size: The number of characters to retrieve.
         :type size: ``integer``
         """
-        c = self.read(size)
-        self._buffer = self._buffer + c
-        return c
+        if len(self._buffer) < size:
+            # Only the missing bytes are read, so repeated peeks do not copy
+            # the buffer over and over.
+            self._buffer += self._response.read(size - len(self._buffer))
+        return self._buffer[:size]
 
     def close(self):
         """Closes this response."""
         if self._connection:
             self._connection.close()
+            self._connection = None
         self._response.close()
 
     def read(self, size = None):
@@ -1320,12 +1384,26 @@ class ResponseReader(io.RawIOBase):
 
         """
         r = self._buffer
-        self._buffer = b''
-        if size is not None:
-            size -= len(r)
-        r = r + self._response.read(size)
+        if r:
+            if size is not None and size <= len(r):
+                self._buffer = r[size:]
+                return r[:size]
+            self._buffer = b''
+            if size is not None:
+                size -= len(r)
+            r = r + self._response.read(size)
+        else:
+            r = self._response.read(size)
+        self._release()
         return r
 
+    def _release(self):
+        if self._connection is not None and getattr(self._response, "isclosed", lambda: False)():
+            # The body has been read to the end, so the connection can be
+            # released (or handed back to its pool) right away.
+            self._connection.close()
+            self._connection = None
+
     def readable(self):
         """ Indicates that the response reader is readable."""
         return True
@@ -1337,13 +1415,39 @@ class ResponseReader(io.RawIOBase):
         :type byte_array: ``bytearray`` or ``memoryview``
 
         """
-        max_size = len(byte_array)
-        data = self.read(max_size)
-        bytes_read = len(data)
-        byte_array[:bytes_read] = data
+        if self._buffer or not hasattr(self._response, "readinto"):
+            max_size = len(byte_array)
+            data = self.read(max_size)
+            bytes_read = len(data)
+            byte_array[:bytes_read] = data
+            return bytes_read
+        # Nothing peeked ahead, so the response fills the array without an
+        # intermediate bytes object.
+        bytes_read = self._response.readinto(byte_array)
+        self._release()
         return bytes_read
 
 
+def _connector(key_file=None, cert_file=None, timeout=None, verify=False):
+    # Returns a function that opens an httplib connection for a
+    # (scheme, host, port) triple, shared by the default and pooled handlers.
+    def connect(scheme, host, port):
+        kwargs = {}
+        if timeout is not None: kwargs['timeout'] = timeout
+        if scheme == "http":
+            return six.moves.http_client.HTTPConnection(host, port, **kwargs)
+        if scheme == "https":
+            if key_file is not None: kwargs['key_file'] = key_file
+            if cert_file is not None: kwargs['cert_file'] = cert_file
+
+            if not verify:
+                kwargs['context'] = ssl._create_unverified_context()
+            return six.moves.http_client.HTTPSConnection(host, port, **kwargs)
+        raise ValueError("unsupported scheme: %s" % scheme)
+
+    return connect
+
+
 def handler(key_file=None, cert_file=None, timeout=None, verify=False):
     """This class returns an instance of the default HTTP request handler using
     the values you provide.
@@ -1358,19 +1462,7 @@ def handler(key_file=None, cert_file=None, timeout=None, verify=False):
     :type verify: ``Boolean``
     """
 
-    def connect(scheme, host, port):
-        kwargs = {}
-        if timeout is not None: kwargs['timeout'] = timeout
-        if scheme == "http":
-            return six.moves.http_client.HTTPConnection(host, port, **kwargs)
-        if scheme == "https":
-            if key_file is not None: kwargs['key_file'] = key_file
-            if cert_file is not None: kwargs['cert_file'] = cert_file
-
-            if not verify:
-                kwargs['context'] = ssl._create_unverified_context()
-            return six.moves.http_client.HTTPSConnection(host, port, **kwargs)
-        raise ValueError("unsupported scheme: %s" % scheme)
+    connect = _connector(key_file, cert_file, timeout, verify)
 
     def request(url, message, **kwargs):
         scheme, host, port, path = _spliturl(url)
@@ -1406,3 +1498,199 @@ def handler(key_file=None, cert_file=None, timeout=None, verify=False):
         }
 
     return request
+
+
+class ConnectionPool(object):
+    """A thread-safe pool of persistent HTTP connections.
+
+    Idle connections are kept per ``(scheme, host, port)`` key. A connection is
+    checked out for the duration of one request and its response body, and is
+    checked back in once the body has been read. At most *max_size* idle
+    connections are kept per key, and connections that have been idle for
+    longer than *idle_timeout* seconds are closed instead of being reused.
+
+    Only idle connections are bounded: :meth:`checkout` never waits, and opens
+    a new connection whenever no idle one is left, so the number of
+    connections in use grows with the number of concurrent requests. Those
+    beyond *max_size* are closed when they are checked back in.
+
+    :param connect: A function ``connect(scheme, host, port)`` that opens a new
+        ``httplib`` connection.
+    :param max_size: The maximum number of idle connections kept per key.
+    :type max_size: ``integer``
+    :param idle_timeout: The number of seconds an idle connection is kept.
+    :type idle_timeout: ``integer`` or ``float``
+    """
+    def __init__(self, connect, max_size=10, idle_timeout=60):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def checkout(self, key):
+        """Returns an idle connection for *key*, or a new one if none is left.
+
+        :return: A tuple of the connection and a ``Boolean`` that is ``True``
+            when the connection was reused.
+        """
+        expired = []
+        connection = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            now = time.time()
+            while idle:
+                candidate, released = idle.pop()
+                if now - released > self.idle_timeout or candidate.sock is None:
+                    expired.append(candidate)
+                    continue
+                connection = candidate
+                break
+        for stale in expired:
+            stale.close()
+        if connection is not None:
+            return connection, True
+        return self._connect(*key), False
+
+    def checkin(self, key, connection):
+        """Returns *connection* to the pool, closing it if the pool for *key*
+        is already full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((connection, time.time()))
+                return
+        connection.close()
+
+    def clear(self):
+        """Closes every idle connection in the pool."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in six.itervalues(idle):
+            for connection, _ in connections:
+                connection.close()
+
+
+# The most unread body bytes a pooled connection reads to keep it reusable when
+# its response is closed, or collected, before it was read to the end.
+_DRAIN_LIMIT = 64 * 1024
+
+
+class _PooledConnection(object):
+    # Handed to ResponseReader in place of the raw connection: closing it
+    # checks the connection back into the pool if the response was read to
+    # the end and the server agreed to keep it alive, and closes it otherwise.
+    # A short body left unread, as by a caller that only wants the status, is
+    # read to the end first.
+    def __init__(self, pool, key, connection, response):
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        response = self._response
+        if not response.isclosed() and not response.will_close and response.length is not None \
+                and response.length <= _DRAIN_LIMIT:
+            try:
+                response.read()
+            except Exception:
+                pass
+        if response.isclosed() and not response.will_close:
+            self._pool.checkin(self._key, connection)
+        else:
+            connection.close()
+
+
+# Errors raised when a pooled connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (six.moves.http_client.BadStatusLine,
+                            six.moves.http_client.CannotSendRequest,
+                            socket.error)
+
+# Methods that can be sent again without changing their effect.
+_IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "DELETE"])
+
+
+# Whether a request that failed on a reused connection with error e can be
+# sent again on a new one. Any request can be sent again if none of it was
+# written (CannotSendRequest); otherwise the server may have acted on it, so
+# only idempotent requests are. A POST to receivers/simple, for example, may
+# already have indexed its events.
+def _can_resend(method, e):
+    if isinstance(e, socket.timeout) or not isinstance(e, _STALE_CONNECTION_ERRORS):
+        return False
+    if isinstance(e, six.moves.http_client.CannotSendRequest):
+        return True
+    return method.upper() in _IDEMPOTENT_METHODS
+
+
+def pooled_handler(key_file=None, cert_file=None, timeout=None, verify=False, pool_size=10, idle_timeout=60):
+    """This function returns an HTTP request handler that reuses persistent
+    (keep-alive) connections instead of opening one for every request.
+
+    The handler takes the same arguments as :func:`handler`, and its
+    connections are kept in a :class:`ConnectionPool`, available as the
+    ``pool`` attribute of the returned function. A reused connection that turns
+    out to have been closed by the server is replaced by a new one. A ``GET``,
+    ``HEAD`` or ``DELETE`` request is then sent again once; other requests are
+    sent again only if none of the request had been written, because the
+    server may already have acted on them, and raise the error otherwise.
+
+    :param `pool_size`: The maximum number of idle connections kept per
+        ``(scheme, host, port)``. This does not limit the number of
+        connections in use: each concurrent request that finds no idle
+        connection opens a new one.
+    :type pool_size: ``integer``
+    :param `idle_timeout`: The number of seconds an idle connection is kept
+        before it is closed.
+    :type idle_timeout: ``integer`` or ``float``
+    """
+    pool = ConnectionPool(_connector(key_file, cert_file, timeout, verify),
+                          max_size=pool_size, idle_timeout=idle_timeout)
+
+    def send(key, method, path, body, head):
+        connection, reused = pool.checkout(key)
+        while True:
+            try:
+                connection.request(method, path, body, head)
+                if timeout is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, connection.getresponse()
+            except Exception as e:
+                connection.close()
+                if not reused or not _can_resend(method, e):
+                    raise
+                connection, reused = pool._connect(*key), False
+
+    def request(url, message, **kwargs):
+        scheme, host, port, path = _spliturl(url)
+        body = message.get("body", "")
+        head = {
+            "Content-Length": str(len(body)),
+            "Host": host,
+            "User-Agent": "splunk-sdk-python/1.6.13",
+            "Accept": "*/*",
+            "Connection": "Keep-Alive",
+        } # defaults
+        for key, value in message["headers"]:
+            head[key] = value
+        method = message.get("method", "GET")
+
+        pool_key = (scheme, host, int(port))
+        connection, response = send(pool_key, method, path, body, head)
+        pooled = _PooledConnection(pool, pool_key, connection, response)
+        if response.isclosed():
+            pooled.close()
+
+        return {
+            "status": response.status,
+            "reason": response.reason,
+            "headers": response.getheaders(),
+            "body": ResponseReader(response, pooled),
+        }
+
+    request.pool = pool
+    return request
@@ -0,0 +1,115 @@
+# Copyright 2011-2015 Splunk, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"): you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The **splunklib.cache** module provides the cache a
+:class:`splunklib.client.Service` keeps of entity state and collection
+listings when it is created with a ``cache_ttl``.
+
+Each entry is stored under the REST resource it was read from (for example,
+``saved/searches/mysearch``) and expires *ttl* seconds after it was stored.
+A write to a resource drops the entries for that resource, its ancestors and
+its descendants, so that updating a saved search also drops the cached
+listing of saved searches. splunkd sends no ``ETag`` or ``Last-Modified``
+validators with these responses, so an expired entry is fetched again in
+full rather than revalidated.
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = [
+    "EntityCache"
+]
+
+
+class EntityCache(object):
+    """A size-bounded cache with a time to live and least recently used
+    eviction.
+
+    :param ttl: The number of seconds an entry stays valid.
+    :type ttl: ``float``
+    :param max_size: The maximum number of entries kept; the least recently
+        used entry is evicted to make room for a new one.
+    :type max_size: ``integer``
+    """
+    def __init__(self, ttl=60, max_size=1024, clock=time.time):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (resource, expires, value), oldest use first
+        self._lock = threading.Lock() # collection pages may be fetched concurrently
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the value stored under *key*, or ``None`` if there is none
+        or it has expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] <= self.clock():
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, resource, value):
+        """Stores *value* under *key*, recording that it was read from
+        *resource*.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (resource, self.clock() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, resource):
+        """Drops the entries read from *resource*, from the resources that
+        contain it, and from the resources it contains.
+        """
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if _related(entry[0], resource)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        """Drops every entry. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the counters of this cache.
+
+        :return: A ``dict`` with the keys ``hits``, ``misses``, ``evictions``
+            and ``size``.
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self._entries)}
+
+
+# Whether one of the resource paths a and b is, or contains, the other.
+def _related(a, b):
+    if not a or not b or a == b:
+        return True
+    return b.startswith(a + "/") or a.startswith(b + "/")
@@ -60,20 +60,30 @@ attributes, and methods that are specific to each kind of entity. For example::
 
 import contextlib
 import datetime
+import io
 import json
 import logging
 import socket
+from collections import deque
 from datetime import datetime, timedelta
 from time import sleep
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None  # Python 2 without the futures backport fetches one page at a time
+
 from splunklib import six
 from splunklib.six.moves import urllib
 
 from . import data
+from .cache import EntityCache
 from .binding import (AuthenticationError, Context, HTTPError, UrlEncoded,
                       _encode, _make_cookie_header, _NoAuthenticationToken,
                       namespace)
 from .data import record
+from .polling import JOB_STATUS_FIELDS, fetch_concurrently, wait_for_jobs
+from .results import JSONResultsReader
 
 __all__ = [
     "connect",
@@ -205,22 +215,23 @@ def _load_atom(response, match=None):
 
 # Load an array of atom entries from the body of the given response
 def _load_atom_entries(response):
-    r = _load_atom(response)
-    if 'feed' in r:
-        # Need this to handle a random case in the REST API
-        if r.feed.get('totalResults') in [0, '0']:
-            return []
-        entries = r.feed.get('entry', None)
-        if entries is None: return None
-        return entries if isinstance(entries, list) else [entries]
-    # Unlike most other endpoints, the jobs endpoint does not return
-    # its state wrapped in another element, but at the top level.
+    # Entries are loaded one at a time as the body is parsed. Unlike most
+    # other endpoints, the jobs endpoint does not return its state wrapped in
+    # another element, but at the top level, which load_entries handles too.
     # For example, in XML, it returns <entry>...</entry> instead of
     # <feed><entry>...</entry></feed>.
-    else:
-        entries = r.get('entry', None)
-        if entries is None: return None
-        return entries if isinstance(entries, list) else [entries]
+    return list(data.load_entries(response.body))
+
+
+# The REST resource a path refers to, without its namespace, for example
+# "saved/searches/mysearch" for "/servicesNS/nobody/search/saved/searches/mysearch".
+def _resource_path(path):
+    path = urllib.parse.unquote(str(path))
+    if path.startswith('/servicesNS/'):
+        path = path.split('/', 4)[4] if path.count('/') >= 4 else ''
+    elif path.startswith('/services/'):
+        path = path[len('/services/'):]
+    return path.strip('/')
 
 
 # Load the sid from the body of the given response
@@ -228,6 +239,47 @@ def _load_sid(response):
     return _load_atom(response).response.sid
 
 
+# Yield the items of consecutive pages, keeping up to prefetch page requests
+# in flight. fetch(offset, size) returns the items of one page; a page shorter
+# than pagesize ends the iteration, as does reaching count items (None for no
+# limit). The futures wait in a deque in page order, so at most prefetch pages
+# are buffered however out of order they arrive.
+def _iter_pages(fetch, offset, pagesize, count=None, prefetch=4):
+    if ThreadPoolExecutor is None or prefetch < 2:
+        prefetch = 1
+    end = None if count is None else offset + count
+    pending = deque()
+    executor = ThreadPoolExecutor(prefetch) if prefetch > 1 else None
+
+    def submit(start):
+        size = pagesize if end is None else min(pagesize, end - start)
+        if executor is None:
+            pending.append((size, fetch(start, size)))
+        else:
+            pending.append((size, executor.submit(fetch, start, size)))
+
+    try:
+        next_offset = offset
+        while len(pending) < prefetch and (end is None or next_offset < end):
+            submit(next_offset)
+            next_offset += pagesize
+        while pending:
+            size, page = pending.popleft()
+            items = page if executor is None else page.result()
+            for item in items:
+                yield item
+            if len(items) < size:
+                break
+            if end is None or next_offset < end:
+                submit(next_offset)
+                next_offset += pagesize
+    finally:
+        if executor is not None:
+            for size, page in pending:
+                page.cancel()
+            executor.shutdown(wait=False)
+
+
 # Parse the given atom entry record into a generic entity state record
 def _parse_atom_entry(entry):
     title = entry.get('title', None)
@@ -318,6 +370,9 @@ def connect(**kwargs):
     :type username: ``string``
     :param `password`: The password for the Splunk account.
     :type password: ``string``
+    :param `pool_size`: Keep up to this many persistent connections open
+        between requests instead of reconnecting for each one (optional).
+    :type pool_size: ``integer``
     :return: An initialized :class:`Service` connection.
 
     **Example**::
@@ -384,6 +439,17 @@ class Service(_BaseService):
     :param `password`: The password, which is used to authenticate the Splunk
                        instance.
     :type password: ``string``
+    :param `pool_size`: Keep up to this many persistent connections open
+        between requests instead of reconnecting for each one (optional).
+    :type pool_size: ``integer``
+    :param `cache_ttl`: Cache entity state, collection listings and server
+        information for this many seconds (optional). Any POST or DELETE made
+        through this service drops the cached entries it may have changed.
+        The cache is available as :attr:`cache`.
+    :type cache_ttl: ``float``
+    :param `cache_size`: The number of responses the cache keeps, least
+        recently used first out (optional, the default is 1024).
+    :type cache_size: ``integer``
     :return: A :class:`Service` instance.
 
     **Example**::
@@ -401,6 +467,44 @@ class Service(_BaseService):
     def __init__(self, **kwargs):
         super(Service, self).__init__(**kwargs)
         self._splunk_version = None
+        cache_ttl = kwargs.get("cache_ttl")
+        self.cache = EntityCache(cache_ttl, kwargs.get("cache_size", 1024)) if cache_ttl else None
+
+    def _cached(self, path, fetch, query=None):
+        # Returns the response fetch() returns for path, or a copy of it read
+        # from the cache. Only the responses of reads that may be cached go
+        # through here.
+        cache = self.cache
+        if cache is None:
+            return fetch()
+        key = (str(path), tuple(sorted((k, repr(v)) for k, v in six.iteritems(query or {}))),
+               self.namespace.owner, self.namespace.app, self.namespace.sharing)
+        hit = cache.get(key)
+        if hit is None:
+            response = fetch()
+            hit = (response.status, response.reason, response.headers, response.body.read())
+            cache.put(key, _resource_path(path), hit)
+        status, reason, headers, body = hit
+        return record({"status": status, "reason": reason,
+                       "headers": headers, "body": io.BytesIO(body)})
+
+    def _invalidate(self, path_segment):
+        if self.cache is not None:
+            self.cache.invalidate(_resource_path(path_segment))
+
+    def delete(self, path_segment, *args, **kwargs):
+        try:
+            return super(Service, self).delete(path_segment, *args, **kwargs)
+        finally:
+            self._invalidate(path_segment)
+    delete.__doc__ = Context.delete.__doc__
+
+    def post(self, path_segment, *args, **kwargs):
+        try:
+            return super(Service, self).post(path_segment, *args, **kwargs)
+        finally:
+            self._invalidate(path_segment)
+    post.__doc__ = Context.post.__doc__
 
     @property
     def apps(self):
@@ -460,7 +564,7 @@ class Service(_BaseService):
         :return: The system information, as key-value pairs.
         :rtype: ``dict``
         """
-        response = self.get("/services/server/info")
+        response = self._cached("/services/server/info", lambda: self.get("/services/server/info"))
         return _filter_content(_load_atom(response, MATCH_ENTRY_CONTENT))
 
     def input(self, path, kind=None):
@@ -697,10 +801,22 @@ class Endpoint(object):
     This class provides the common functionality of :class:`Collection` and
     :class:`Entity` (essentially HTTP GET and POST methods).
     """
+    # Whether reads of this endpoint may be served from the cache of its
+    # service. Endpoints whose state changes on its own, such as search
+    # jobs, turn this off.
+    _cacheable = True
+
     def __init__(self, service, path):
         self.service = service
         self.path = path if path.endswith('/') else path + '/'
 
+    def _cached_get(self, path_segment="", **query):
+        # self.get, through the cache of the service when there is one
+        fetch = lambda: self.get(path_segment, **query)
+        if not self._cacheable or getattr(self.service, "cache", None) is None:
+            return fetch()
+        return self.service._cached(self.path + path_segment, fetch, query)
+
     def get(self, path_segment="", owner=None, app=None, sharing=None, **query):
         """Performs a GET operation on the path segment relative to this endpoint.
 
@@ -1036,7 +1152,7 @@ class Entity(Endpoint):
         if state is not None:
             self._state = state
         else:
-            self._state = self.read(self.get())
+            self._state = self.read(self._cached_get())
         return self
 
     @property
@@ -1234,10 +1350,10 @@ class ReadOnlyCollection(Endpoint):
                 # have to extract values out.
                 key, ns = key
                 key = UrlEncoded(key, encode_slash=True)
-                response = self.get(key, owner=ns.owner, app=ns.app)
+                response = self._cached_get(key, owner=ns.owner, app=ns.app)
             else:
                 key = UrlEncoded(key, encode_slash=True)
-                response = self.get(key)
+                response = self._cached_get(key)
             entries = self._load_list(response)
             if len(entries) > 1:
                 raise AmbiguousReferenceException("Found multiple entities named '%s'; please specify a namespace." % key)
@@ -1394,19 +1510,26 @@ class ReadOnlyCollection(Endpoint):
         content = _load_atom(response, MATCH_ENTRY_CONTENT)
         return _parse_atom_metadata(content)
 
-    def iter(self, offset=0, count=None, pagesize=None, **kwargs):
+    def iter(self, offset=0, count=None, pagesize=None, prefetch=None, **kwargs):
         """Iterates over the collection.
 
         This method is equivalent to the :meth:`list` method, but
         it returns an iterator and can load a certain number of entities at a
         time from the server.
 
+        With both *pagesize* and *prefetch*, up to *prefetch* pages are
+        requested at once and the entities are still returned in order. Use a
+        connection pool (the ``pool_size`` argument of :func:`connect`) so the
+        concurrent requests reuse their connections.
+
         :param offset: The index of the first entity to return (optional).
         :type offset: ``integer``
         :param count: The maximum number of entities to return (optional).
         :type count: ``integer``
         :param pagesize: The number of entities to load (optional).
         :type pagesize: ``integer``
+        :param prefetch: The number of pages to request concurrently (optional).
+        :type prefetch: ``integer``
         :param kwargs: Additional arguments (optional):
 
             - "search" (``string``): The search query to filter responses.
@@ -1431,11 +1554,17 @@ class ReadOnlyCollection(Endpoint):
                 ...
         """
         assert pagesize is None or pagesize > 0
+        if pagesize is not None and prefetch is not None and prefetch > 1:
+            limit = None if count is None or count == self.null_count else count
+            fetch = lambda start, size: self._load_list(self._cached_get(count=size, offset=start, **kwargs))
+            for item in _iter_pages(fetch, offset, pagesize, limit, prefetch):
+                yield item
+            return
         if count is None:
             count = self.null_count
         fetched = 0
         while count == self.null_count or fetched < count:
-            response = self.get(count=pagesize or count, offset=offset, **kwargs)
+            response = self._cached_get(count=pagesize or count, offset=offset, **kwargs)
             items = self._load_list(response)
             N = len(items)
             fetched += N
@@ -1453,7 +1582,8 @@ class ReadOnlyCollection(Endpoint):
         The entire collection is loaded at once and is returned as a list. This
         function makes a single roundtrip to the server, plus at most two more if
         the ``autologin`` field of :func:`connect` is set to ``True``.
-        There is no caching--every call makes at least one round trip.
+        There is no caching unless the service was created with a
+        ``cache_ttl``; then a repeated call within that time makes no round trip.
 
         :param count: The maximum number of entities to return (optional).
         :type count: ``integer``
@@ -2067,7 +2197,7 @@ class Index(Entity):
         self.post("roll-hot-buckets")
         return self
 
-    def submit(self, event, host=None, source=None, sourcetype=None):
+    def submit(self, event, host=None, source=None, sourcetype=None, compression=None):
         """Submits a single event to the index using ``HTTP POST``.
 
         :param event: The event to submit.
@@ -2078,6 +2208,9 @@ class Index(Entity):
         :type source: ``string``
         :param `sourcetype`: The sourcetype value of the event.
         :type sourcetype: ``string``
+        :param `compression`: Compress large events with this content coding
+            (optional, see :meth:`splunklib.binding.Context.post`).
+        :type compression: "gzip" or "deflate"
 
         :return: The :class:`Index`.
         """
@@ -2090,7 +2223,8 @@ class Index(Entity):
         # is that we are not sending a POST request encoded using
         # x-www-form-urlencoded (as we do not have a key=value body),
         # because we aren't really sending a "form".
-        self.service.post(PATH_RECEIVERS_SIMPLE, body=event, **args)
+        response = self.service.post(PATH_RECEIVERS_SIMPLE, body=event, compression=compression, **args)
+        response.body.read() # to the end, so that a pooled connection is reused
         return self
 
     # kwargs: host, host_regex, host_segment, rename-source, sourcetype
@@ -2629,6 +2763,8 @@ class Inputs(Collection):
 
 class Job(Entity):
     """This class represents a search job."""
+    _cacheable = False
+
     def __init__(self, service, sid, **kwargs):
         path = PATH_JOBS + sid
         Entity.__init__(self, service, path, skip_refresh=True, **kwargs)
@@ -2694,6 +2830,34 @@ class Job(Entity):
         self.post("control", action="finalize")
         return self
 
+    def _status(self):
+        # Only the properties the wait loop needs, instead of the whole entity.
+        response = self.get(output_mode="json", f=JOB_STATUS_FIELDS)
+        if response.status == 204:
+            return None
+        return json.loads(response.body.read())["entry"][0]["content"]
+
+    def wait(self, timeout=None):
+        """Waits for this job to finish.
+
+        Unlike a loop around :meth:`is_done`, each poll fetches only the
+        ``isDone`` and ``dispatchState`` properties, and polls are spaced by
+        an interval that grows from 0.05 to 1 second over the first five
+        seconds (see :func:`splunklib.polling.wait_for_jobs`). The job is
+        refreshed once it is done.
+
+        :param timeout: The number of seconds to wait (optional, the default
+            is to wait until the job is done).
+        :type timeout: ``float``
+        :return: ``True`` if the job is done, ``False`` if *timeout* passed
+            first or the job was cancelled or expired.
+        :rtype: ``boolean``
+        """
+        done = wait_for_jobs(self.service.jobs.status, [self.sid], timeout)
+        if done:
+            self.refresh()
+        return bool(done)
+
     def is_done(self):
         """Indicates whether this job finished running.
 
@@ -2761,6 +2925,10 @@ class Job(Entity):
         Results are not available until the job has finished. If called on
         an unfinished job, the result is an empty event set.
 
+        Large result sets are read several times faster with ``output_mode="json"``
+        or ``output_mode="csv"`` and :class:`splunklib.results.JSONResultsReader` or
+        :class:`splunklib.results.CSVResultsReader` in place of ``ResultsReader``.
+
         This method makes a single roundtrip
         to the server, plus at most two additional round trips if
         the ``autologin`` field of :func:`connect` is set to ``True``.
@@ -2775,6 +2943,44 @@ class Job(Entity):
         query_params['segmentation'] = query_params.get('segmentation', 'none')
         return self.get("results", **query_params).body
 
+    def iter_results(self, pagesize=10000, prefetch=4, **query_params):
+        """Iterates over the results of this finished job, a page at a time.
+
+        Pages of *pagesize* results are fetched with ``output_mode=json``, with
+        up to *prefetch* pages requested at once, and the results are returned
+        as dicts in order. Diagnostic messages are left out; read them with
+        :meth:`results`. Keep *pagesize* at or below the server's
+        ``maxresultrows`` (50,000 by default) and use the ``pool_size`` argument
+        of :func:`connect` so the concurrent requests reuse their connections.
+
+        **Example**::
+
+            import splunklib.client as client
+            service = client.connect(..., pool_size=4)
+            job = service.jobs.create("search * | head 1000000", exec_mode="blocking")
+            for result in job.iter_results(pagesize=50000):
+                print result
+
+        :param pagesize: The number of results in each request.
+        :type pagesize: ``integer``
+        :param prefetch: The number of pages to request concurrently.
+        :type prefetch: ``integer``
+        :param query_params: Additional parameters for :meth:`results`
+            (optional), such as ``offset``, ``count`` or ``f``.
+        :type query_params: ``dict``
+
+        :return: An iterator over the results, as ``dict`` objects.
+        """
+        offset = int(query_params.pop('offset', 0))
+        count = int(query_params.pop('count', 0)) or None
+        query_params['output_mode'] = 'json'
+
+        def fetch(start, size):
+            reader = JSONResultsReader(self.results(offset=start, count=size, **query_params))
+            return [result for result in reader if isinstance(result, dict)]
+
+        return _iter_pages(fetch, offset, pagesize, count, prefetch)
+
     def preview(self, **query_params):
         """Returns a streaming handle to this job's preview search results.
 
@@ -2904,6 +3110,8 @@ class Job(Entity):
 class Jobs(Collection):
     """This class represents a collection of search jobs. Retrieve this
     collection using :meth:`Service.jobs`."""
+    _cacheable = False
+
     def __init__(self, service):
         Collection.__init__(self, service, PATH_JOBS, item=Job)
         # The count value to say list all the contents of this
@@ -2924,6 +3132,54 @@ class Jobs(Collection):
             entities.append(entity)
         return entities
 
+    def status(self, jobs):
+        """Returns the ``isDone`` and ``dispatchState`` properties of the given
+        jobs, fetching only those properties of only those jobs. The jobs are
+        fetched concurrently (see :func:`splunklib.polling.fetch_concurrently`).
+
+        :param jobs: The jobs to get the properties of.
+        :type jobs: ``list`` of :class:`Job` objects or sids
+        :return: A ``dict`` mapping each sid to a ``dict`` of its properties,
+            or to ``None`` while splunkd has no status for the job yet. Jobs
+            splunkd no longer has, because they were cancelled or expired,
+            are left out.
+        """
+        def fetch(job):
+            if not isinstance(job, Job):
+                job = Job(self.service, job)
+            try:
+                return job.sid, job._status(), True
+            except HTTPError as he:
+                if he.status != 404:
+                    raise
+                return job.sid, None, False
+
+        return dict((sid, status) for sid, status, found in fetch_concurrently(fetch, jobs) if found)
+
+    def wait(self, jobs, timeout=None):
+        """Waits for several jobs to finish, polling the state of the jobs not
+        done yet (see :meth:`Job.wait` and :meth:`status`). A job that is
+        cancelled or expires while it is waited for is not waited for any
+        more.
+
+        **Example**::
+
+            import splunklib.client as client
+            s = client.connect(...)
+            jobs = [s.jobs.create(query) for query in queries]
+            s.jobs.wait(jobs)
+
+        :param jobs: The jobs to wait for.
+        :type jobs: ``list`` of :class:`Job` objects or sids
+        :param timeout: The number of seconds to wait (optional, the default
+            is to wait until every job is done).
+        :type timeout: ``float``
+        :return: The sids of the jobs that are done.
+        :rtype: ``set``
+        """
+        sids = [job.sid if isinstance(job, Job) else job for job in jobs]
+        return wait_for_jobs(self.status, sids, timeout)
+
     def create(self, query, **kwargs):
         """ Creates a search using a search query and any additional parameters
         you provide.
@@ -2966,7 +3222,8 @@ class Jobs(Collection):
         Running an export search is more efficient as it streams the results
         directly to you, rather than having to write them out to disk and make
         them available later. As soon as results are ready, you will receive
-        them.
+        them. With ``output_mode="json"`` the events arrive as newline-delimited
+        JSON objects, read by :class:`splunklib.results.JSONResultsReader`.
 
         The ``export`` method makes a single roundtrip to the server (as opposed
         to two for :meth:`create` followed by :meth:`preview`), plus at most two
@@ -3614,6 +3871,8 @@ class KVStoreCollectionData(object):
     Retrieve using :meth:`KVStoreCollection.data`
     """
     JSON_HEADER = [('Content-Type', 'application/json')]
+    # The server's default max_rows_per_query limit (limits.conf [kvstore])
+    MAX_ROWS_PER_QUERY = 50000
 
     def __init__(self, collection):
         self.service = collection.service
@@ -3735,3 +3994,135 @@ class KVStoreCollectionData(object):
         data = json.dumps(documents)
 
         return json.loads(self._post('batch_save', headers=KVStoreCollectionData.JSON_HEADER, body=data).body.read().decode('utf-8'))
+
+    def iter_query(self, pagesize=10000, prefetch=4, max_rows_per_query=MAX_ROWS_PER_QUERY, **query):
+        """Iterates over the documents matched by a query, a page at a time.
+
+        Pages of *pagesize* documents are read with the ``skip`` and ``limit``
+        parameters of :meth:`query`, with up to *prefetch* pages requested at
+        once, and the documents are returned in order. The pages are sorted
+        by ``_key`` unless the query has a ``sort`` of its own, so that they
+        do not overlap.
+
+        A page shorter than requested ends the iteration, and the server
+        returns at most ``max_rows_per_query`` documents whatever the
+        ``limit``, so *pagesize* is capped at *max_rows_per_query*. Pass the
+        server's setting if it is lower than the default of 50,000.
+
+        **Example**::
+
+            import splunklib.client as client
+            service = client.connect(..., pool_size=4)
+            data = service.kvstore['mycollection'].data
+            for document in data.iter_query():
+                print document
+
+        :param pagesize: The number of documents in each request.
+        :type pagesize: ``integer``
+        :param prefetch: The number of pages to request concurrently.
+        :type prefetch: ``integer``
+        :param max_rows_per_query: The server's ``max_rows_per_query`` limit.
+        :type max_rows_per_query: ``integer``
+        :param query: Additional parameters for :meth:`query` (optional), such
+            as ``query``, ``sort``, ``fields``, ``skip`` or ``limit``.
+        :type query: ``dict``
+
+        :return: An iterator over the documents, as ``dict`` objects.
+        """
+        pagesize = min(pagesize, max_rows_per_query)
+        skip = int(query.pop('skip', 0))
+        limit = int(query.pop('limit', 0)) or None
+        if not query.get('sort'):
+            query['sort'] = '_key'
+
+        def fetch(start, size):
+            return self.query(skip=start, limit=size, **query)
+
+        return _iter_pages(fetch, skip, pagesize, limit, prefetch)
+
+    def bulk_save(self, documents, batch_size=1000, max_batch_bytes=50*1024*1024, workers=4):
+        """Inserts or updates every document from an iterable, in batches.
+
+        The documents are read one at a time and sent with :meth:`batch_save`
+        in batches of at most *batch_size* documents and *max_batch_bytes* of
+        JSON, the server's ``max_documents_per_batch_save`` and
+        ``max_size_per_batch_save_mb`` limits by default. Up to *workers*
+        batches are in flight at once; use the ``pool_size`` argument of
+        :func:`connect` so the concurrent requests reuse their connections.
+        The first batch the server rejects stops the load and its error is
+        raised. The batches before it have been saved, and the batches that
+        were already being sent are let finish, so some after it may have
+        been saved too.
+
+        **Example**::
+
+            import csv
+            import splunklib.client as client
+            service = client.connect(..., pool_size=4)
+            data = service.kvstore['mycollection'].data
+            stats = data.bulk_save(csv.DictReader(open('lookup.csv')))
+            print "%(rows)d rows at %(rows_per_sec).0f rows/s" % stats
+
+        :param documents: The documents to save, as dictionaries.
+        :type documents: An iterable of ``dict``
+        :param batch_size: The largest number of documents in one request.
+        :type batch_size: ``integer``
+        :param max_batch_bytes: The largest request body, in bytes.
+        :type max_batch_bytes: ``integer``
+        :param workers: The number of requests to run concurrently.
+        :type workers: ``integer``
+
+        :return: The number of ``rows`` saved in how many ``batches``, the
+            ``seconds`` it took, and the resulting ``rows_per_sec``.
+        :rtype: ``dict``
+        """
+        start = datetime.now()
+        rows = batches = 0
+        if ThreadPoolExecutor is None or workers < 2:
+            for body in _kvstore_batches(documents, batch_size, max_batch_bytes):
+                rows += len(self._batch_save_body(body))
+                batches += 1
+        else:
+            pending = deque()
+            executor = ThreadPoolExecutor(workers)
+            try:
+                for body in _kvstore_batches(documents, batch_size, max_batch_bytes):
+                    if len(pending) >= workers:
+                        rows += len(pending.popleft().result())
+                        batches += 1
+                    pending.append(executor.submit(self._batch_save_body, body))
+                while pending:
+                    rows += len(pending.popleft().result())
+                    batches += 1
+            finally:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=True)
+        seconds = (datetime.now() - start).total_seconds()
+        return record({'rows': rows, 'batches': batches, 'seconds': seconds,
+                       'rows_per_sec': rows / seconds if seconds else 0.0})
+
+    def _batch_save_body(self, body):
+        # batch_save for a body that is already a JSON array of documents;
+        # returns the list of their _key values
+        response = self._post('batch_save', headers=KVStoreCollectionData.JSON_HEADER, body=body)
+        return json.loads(response.body.read().decode('utf-8'))
+
+
+# Group documents into the JSON bodies of batch_save requests of at most
+# batch_size documents and max_bytes bytes. A document larger than max_bytes
+# is sent on its own, for the server to reject.
+def _kvstore_batches(documents, batch_size, max_bytes):
+    batch = []
+    size = 2
+    for document in documents:
+        encoded = json.dumps(document)  # ASCII, so its length is its size in bytes
+        if batch and (len(batch) >= batch_size or size + len(encoded) + 1 > max_bytes):
+            yield '[' + ','.join(batch) + ']'
+            batch = []
+            size = 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        yield '[' + ','.join(batch) + ']'
+
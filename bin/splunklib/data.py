@@ -18,10 +18,10 @@ format, which is the format used by most of the REST API.
 
 from __future__ import absolute_import
 import sys
-from xml.etree.ElementTree import XML
+from xml.etree.ElementTree import XML, iterparse
 from splunklib import six
 
-__all__ = ["load"]
+__all__ = ["load", "load_entries"]
 
 # LNAME refers to element names without namespaces; XNAME is the same
 # name, but with an XML namespace.
@@ -95,27 +95,35 @@ def load(text, match=None):
 # Load the attributes of the given element.
 def load_attrs(element):
     if not hasattrs(element): return None
-    attrs = record()
-    for key, value in six.iteritems(element.attrib): 
-        attrs[key] = value
-    return attrs
+    return Record(element.attrib)
+
+# The loaders below are on the path of every Entity.refresh and Collection.list,
+# so they store into records with dict.__setitem__ (records have no custom
+# __setitem__) and read simple text values inline instead of recursing.
 
 # Parse a <dict> element and return a Python dict
 def load_dict(element, nametable = None):
-    value = record()
-    children = list(element)
-    for child in children:
+    value = Record()
+    setitem = dict.__setitem__
+    for child in element:
         assert iskey(child.tag)
-        name = child.attrib["name"]
-        value[name] = load_value(child, nametable)
+        if len(child) == 0:
+            text = child.text
+            if text is not None:
+                text = text.strip() or None
+            setitem(value, child.attrib["name"], text)
+        else:
+            setitem(value, child.attrib["name"], load_value(child, nametable))
     return value
 
 # Loads the given elements attrs & value into single merged dict.
 def load_elem(element, nametable=None):
-    name = localname(element.tag)
-    attrs = load_attrs(element)
+    tag = element.tag
+    rcurly = tag.find('}')
+    name = tag if rcurly == -1 else tag[rcurly+1:]
     value = load_value(element, nametable)
-    if attrs is None: return name, value
+    if not element.attrib: return name, value
+    attrs = Record(element.attrib)
     if value is None: return name, attrs
     # If value is simple, merge into attrs dict using special key
     if isinstance(value, six.string_types):
@@ -137,10 +145,15 @@ def load_elem(element, nametable=None):
 def load_list(element, nametable=None):
     assert islist(element.tag)
     value = []
-    children = list(element)
-    for child in children:
+    for child in element:
         assert isitem(child.tag)
-        value.append(load_value(child, nametable))
+        if len(child) == 0:
+            text = child.text
+            if text is not None:
+                text = text.strip() or None
+            value.append(text)
+        else:
+            value.append(load_value(child, nametable))
     return value
 
 # Load the given root element.
@@ -153,8 +166,7 @@ def load_root(element, nametable=None):
 
 # Load the children of the given element.
 def load_value(element, nametable=None):
-    children = list(element)
-    count = len(children)
+    count = len(element)
 
     # No children, assume a simple text value
     if count == 0:
@@ -168,25 +180,70 @@ def load_value(element, nametable=None):
 
     # Look for the special case of a single well-known structure
     if count == 1:
-        child = children[0]
+        child = element[0]
         tag = child.tag
         if isdict(tag): return load_dict(child, nametable)
         if islist(tag): return load_list(child, nametable)
 
-    value = record()
-    for child in children:
+    value = Record()
+    for child in element:
         name, item = load_elem(child, nametable)
         # If we have seen this name before, promote the value to a list
         if name in value:
-            current = value[name]
+            current = dict.__getitem__(value, name)
             if not isinstance(current, list): 
-                value[name] = [current]
-            value[name].append(item)
+                current = [current]
+                dict.__setitem__(value, name, current)
+            current.append(item)
         else:
-            value[name] = item
+            dict.__setitem__(value, name, item)
 
     return value
 
+# Content keys that are always loaded, since the client reads its access and
+# field metadata from them.
+METADATA_KEYS = ("eai:acl", "eai:attributes")
+
+def load_entries(stream, fields=None):
+    """This function reads an Atom Feed from a file-like object and yields its
+    entries one at a time, each as the record ``load(text).feed.entry`` would
+    contain. A lone ``<entry>`` document, as returned by the search jobs
+    endpoints, yields that entry, and a feed whose ``totalResults`` is 0
+    yields nothing.
+
+    The feed is parsed incrementally and every entry is discarded once it has
+    been loaded, so memory use does not grow with the size of the feed. If you
+    provide *fields*, only those keys (and the ``eai:acl`` and
+    ``eai:attributes`` metadata) are loaded from the content of each entry.
+
+    :param stream: The XML to load (any object that supports ``.read()``).
+    :param fields: The names of the content keys to load (optional).
+    :type fields: ``list``
+    """
+    keep = None if fields is None else set(fields).union(METADATA_KEYS)
+    for event, element in iterparse(stream):
+        tag = element.tag
+        if tag.endswith("totalResults") and (element.text or "").strip() == "0":
+            return # the REST API can send a stub entry with an empty result
+        if not tag.endswith("entry") or localname(tag) != "entry":
+            continue
+        if keep is not None:
+            _filter_content(element, keep)
+        name, entry = load_elem(element)
+        yield entry
+        element.clear()
+
+# Remove the keys of the <content><dict> of an entry that are not in keep.
+def _filter_content(entry, keep):
+    for content in entry:
+        if localname(content.tag) != "content":
+            continue
+        for dictionary in content:
+            if isdict(dictionary.tag):
+                for key in list(dictionary):
+                    if key.attrib.get("name") not in keep:
+                        dictionary.remove(key)
+
 # A generic utility that enables "dot" access to dicts
 class Record(dict):
     """This generic utility class enables dot access to members of a Python 
@@ -72,43 +72,75 @@ class Event(object):
         self.time = time
         self.unbroken = unbroken
 
-    def write_to(self, stream):
-        """Write an XML representation of self, an ``Event`` object, to the given stream.
+    def to_xml_string(self):
+        """Returns the XML representation of self, an ``Event`` object, as a
+        string, without building an ``ElementTree`` element.
 
-        The ``Event`` object will only be written if its data field is defined,
-        otherwise a ``ValueError`` is raised.
-
-        :param stream: stream to write XML to.
+        The markup is the same as the one :meth:`write_to` writes, except that
+        characters outside ASCII are not yet replaced by character references.
+        A ``ValueError`` is raised if the data field is not defined.
         """
         if self.data is None:
             raise ValueError("Events must have at least the data field set to be written to XML.")
 
-        event = ET.Element("event")
+        parts = ['<event']
         if self.stanza is not None:
-            event.set("stanza", self.stanza)
-        event.set("unbroken", str(int(self.unbroken)))
+            parts.append(' stanza="%s"' % _escape_attrib(self.stanza))
+        parts.append(' unbroken="%d">' % int(self.unbroken))
 
         # if a time isn't set, let Splunk guess by not creating a <time> element
         if self.time is not None:
-            ET.SubElement(event, "time").text = str(self.time)
+            parts.append('<time>%s</time>' % _escape_cdata(str(self.time)))
 
         # add all other subelements to this Event, represented by (tag, text)
-        subelements = [
-            ("source", self.source),
-            ("sourcetype", self.sourceType),
-            ("index", self.index),
-            ("host", self.host),
-            ("data", self.data)
-        ]
-        for node, value in subelements:
+        for node, value in (("source", self.source), ("sourcetype", self.sourceType),
+                            ("index", self.index), ("host", self.host), ("data", self.data)):
             if value is not None:
-                ET.SubElement(event, node).text = value
+                if value:
+                    parts.append('<%s>%s</%s>' % (node, _escape_cdata(value), node))
+                else:
+                    parts.append('<%s />' % node)
 
         if self.done:
-            ET.SubElement(event, "done")
+            parts.append('<done />')
+        parts.append('</event>')
+        return ''.join(parts)
+
+    def write_to(self, stream):
+        """Write an XML representation of self, an ``Event`` object, to the given stream.
 
+        The ``Event`` object will only be written if its data field is defined,
+        otherwise a ``ValueError`` is raised.
+
+        :param stream: stream to write XML to.
+        """
+        xml = self.to_xml_string().encode("ascii", "xmlcharrefreplace")
         if isinstance(stream, TextIOBase):
-            stream.write(ensure_text(ET.tostring(event)))
+            stream.write(ensure_text(xml))
         else:
-            stream.write(ET.tostring(event))
-        stream.flush()
\ No newline at end of file
+            stream.write(xml)
+        stream.flush()
+
+
+# The escaping ElementTree applies to element text and attribute values.
+def _escape_cdata(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def _escape_attrib(text):
+    text = _escape_cdata(text)
+    if "\"" in text:
+        text = text.replace("\"", "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
@@ -13,11 +13,14 @@
 # under the License.
 
 from __future__ import absolute_import
+import json
 import sys
+import threading
 
 from io import TextIOWrapper, TextIOBase
-from splunklib.six import ensure_str
+from splunklib.six import ensure_str, ensure_text
 from .event import ET
+from ..binding import HttpLib
 
 try:
     from splunklib.six.moves import cStringIO as StringIO
@@ -38,28 +41,89 @@ class EventWriter(object):
     ERROR = "ERROR"
     FATAL = "FATAL"
 
-    def __init__(self, output = sys.stdout, error = sys.stderr):
+    def __init__(self, output = sys.stdout, error = sys.stderr, buffer_size = 0, flush_interval = 1.0):
         """
         :param output: Where to write the output; defaults to sys.stdout.
         :param error: Where to write any errors; defaults to sys.stderr.
+        :param buffer_size: Collect up to this many characters of events
+            before writing them out; defaults to 0, which writes and flushes
+            every event as it comes.
+        :param flush_interval: The most seconds a buffered event waits to be
+            written out.
         """
         self._out = output
         self._err = error
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
 
         # has the opening <stream> tag been written yet?
         self.header_written = False
 
+        self._buffer = []
+        self._buffered = 0
+        self._timer = None
+        self._error = None # raised by the next call after a flush on the timer failed
+        self._lock = threading.RLock() # the flush timer runs on its own thread
+
     def write_event(self, event):
         """Writes an ``Event`` object to Splunk.
 
         :param event: An ``Event`` object.
         """
-
+        text = self._format(event)
+        with self._lock:
+            self._raise_error()
+            self._buffer.append(text)
+            self._buffered += len(text)
+            if self._buffered >= self.buffer_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _format(self, event):
+        # The text buffered for one event.
         if not self.header_written:
-            self._out.write("<stream>")
             self.header_written = True
+            return "<stream>" + event.to_xml_string()
+        return event.to_xml_string()
 
-        event.write_to(self._out)
+    def _write(self, text):
+        # Sends the text of the buffered events.
+        xml = text.encode("ascii", "xmlcharrefreplace")
+        self._out.write(ensure_text(xml) if isinstance(self._out, TextIOBase) else ensure_str(xml))
+        self._out.flush()
+
+    def flush(self):
+        """Writes out the buffered events.
+
+        If they cannot be written, the error is raised and the events stay
+        buffered, to be written by the next flush.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._raise_error()
+            if self._buffer:
+                self._write("".join(self._buffer))
+                self._buffer = []
+                self._buffered = 0
+
+    def _flush_on_timer(self):
+        # An error would only reach the stderr of the timer thread, so it is
+        # kept for the next call to write_event, flush or close to raise.
+        with self._lock:
+            try:
+                self.flush()
+            except Exception as e:
+                self._error = e
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
 
     def log(self, severity, message):
         """Logs messages about the state of this modular input to Splunk.
@@ -78,10 +142,104 @@ class EventWriter(object):
 
         :param document: An ``ElementTree`` object.
         """
+        self.flush()
         self._out.write(ensure_str(ET.tostring(document)))
         self._out.flush()
 
     def close(self):
         """Write the closing </stream> tag to make this XML well formed."""
+        self.flush()
         self._out.write("</stream>")
         self._out.flush()
+
+
+class StreamEventWriter(EventWriter):
+    """``StreamEventWriter`` writes the data of events straight to an index
+    through a ``receivers/stream`` socket opened with
+    :meth:`splunklib.client.Index.attach`, instead of to Splunk through
+    stdout. The host, source and sourcetype of the events are the ones given
+    to ``attach``; those set on each ``Event`` are ignored. Log messages and
+    XML documents are still written to *error* and *output*.
+    """
+    def __init__(self, index, output = sys.stdout, error = sys.stderr, buffer_size = 65536,
+                 flush_interval = 1.0, **attach_args):
+        """
+        :param index: The :class:`splunklib.client.Index` to write to.
+        :param attach_args: Arguments for :meth:`splunklib.client.Index.attach`,
+            such as ``host``, ``source`` and ``sourcetype``.
+        """
+        EventWriter.__init__(self, output, error, buffer_size, flush_interval)
+        self.index = index
+        self.attach_args = attach_args
+        self._socket = None
+
+    def _format(self, event):
+        if event.data is None:
+            raise ValueError("Events must have at least the data field set to be written.")
+        return event.data + "\n"
+
+    def _write(self, text):
+        if self._socket is None:
+            self._socket = self.index.attach(**self.attach_args)
+        try:
+            self._socket.sendall(text.encode("utf-8"))
+        except Exception:
+            # the socket is no use anymore; the next write attaches a new one
+            socket, self._socket = self._socket, None
+            socket.close()
+            raise
+
+    def close(self):
+        """Writes out the buffered events and closes the socket."""
+        self.flush()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class HecEventWriter(EventWriter):
+    """``HecEventWriter`` posts events straight to the HTTP Event Collector
+    ``/services/collector/event`` endpoint, a buffer at a time, instead of
+    writing them to Splunk through stdout. Every event is indexed as a
+    complete event, with its own time, host, source, sourcetype and index.
+    Log messages and XML documents are still written to *error* and *output*.
+    """
+    def __init__(self, url, token, output = sys.stdout, error = sys.stderr, buffer_size = 1048576,
+                 flush_interval = 1.0, gzip = False, verify = False, pool_size = 1):
+        """
+        :param url: The scheme, host and port of the HTTP Event Collector,
+            for example ``https://localhost:8088``.
+        :param token: The HTTP Event Collector token.
+        :param gzip: Compress the posted events.
+        :param verify: Verify the certificate of the collector.
+        :param pool_size: The number of connections to keep open.
+        """
+        EventWriter.__init__(self, output, error, buffer_size, flush_interval)
+        self.url = url.rstrip("/") + "/services/collector/event"
+        self.headers = [("Authorization", "Splunk %s" % token), ("Content-Type", "application/json")]
+        self.compression = "gzip" if gzip else None
+        self.http = HttpLib(verify=verify, pool_size=pool_size)
+
+    def _format(self, event):
+        if event.data is None:
+            raise ValueError("Events must have at least the data field set to be written.")
+        payload = {"event": event.data}
+        if event.time is not None:
+            payload["time"] = float(event.time)
+        for key, value in (("host", event.host), ("source", event.source),
+                           ("sourcetype", event.sourceType), ("index", event.index)):
+            if value is not None:
+                payload[key] = value
+        return json.dumps(payload, separators=(",", ":")) + "\n"
+
+    def _write(self, text):
+        # raises HTTPError unless the collector accepted the events
+        response = self.http.post(self.url, list(self.headers), compression=self.compression, body=text)
+        response.body.read()
+
+    def close(self):
+        """Writes out the buffered events."""
+        self.flush()
+        handler = self.http.handler
+        if hasattr(handler, "pool"):
+            handler.pool.clear()
@@ -70,7 +70,10 @@ class Script(six.with_metaclass(ABCMeta, object)):
                 # passed on stdin as XML, and the script will write events on
                 # stdout and log entries on stderr.
                 self._input_definition = InputDefinition.parse(input_stream)
-                self.stream_events(self._input_definition, event_writer)
+                try:
+                    self.stream_events(self._input_definition, event_writer)
+                finally:
+                    event_writer.flush() # keep the events written before a failure
                 event_writer.close()
                 return 0
 
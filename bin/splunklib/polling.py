@@ -0,0 +1,167 @@
+# Copyright 2011-2015 Splunk, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"): you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The **splunklib.polling** module provides the wait loop shared by
+:meth:`splunklib.client.Job.wait`, :meth:`splunklib.client.Jobs.wait` and
+``splunk.search.waitForJob``.
+
+Job state is polled with an eased interval: polls are frequent right after a
+job starts, when short searches finish, and slow down to *max_interval* for
+long-running ones. Each poll asks only for the ``isDone`` and
+``dispatchState`` fields of the jobs still being waited on, and the jobs are
+polled concurrently, so that a poll takes about one round trip however many
+jobs are pending.
+"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+__all__ = [
+    "fetch_concurrently",
+    "get_retry_interval",
+    "retry_intervals",
+    "wait_for_jobs",
+    "JOB_STATUS_FIELDS"
+]
+
+# Defaults match the status polling of splunk.search.SearchJob.
+MIN_INTERVAL = .05
+MAX_INTERVAL = 1
+EASING_DURATION = 5
+
+# The job properties a status poll asks for.
+JOB_STATUS_FIELDS = ["isDone", "dispatchState"]
+
+# The most job statuses fetched at the same time.
+MAX_CONCURRENT_FETCHES = 8
+
+
+def get_retry_interval(elapsed_time, min_interval, max_interval, clamp_time):
+    """Returns a wait time (sec) based on the current time elapsed, as mapped
+    onto a cubic easing function.
+
+    :param elapsed_time: The number of seconds that have elapsed since the
+        first call.
+    :param min_interval: The minimum return value, also returned when
+        *elapsed_time* is 0.
+    :param max_interval: The maximum return value, always returned once
+        *elapsed_time* reaches *clamp_time*.
+    :param clamp_time: The duration over which the interval grows from
+        *min_interval* to *max_interval*.
+    """
+    if elapsed_time >= clamp_time: return float(max_interval)
+    return min(max_interval * pow(elapsed_time/float(clamp_time), 3) + min_interval, max_interval)
+
+
+def retry_intervals(timeout=None, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL,
+                    clamp_time=EASING_DURATION):
+    """Returns an iterator over the wait times (sec) between polls, eased
+    with :func:`get_retry_interval` from the time of the call.
+
+    The iterator stops once *timeout* seconds have passed, and the last wait
+    time is cut short so that it ends at *timeout*.
+
+    :param timeout: The number of seconds to poll for, or ``None`` to poll
+        forever.
+    """
+    start = time.time()
+
+    def intervals():
+        while True:
+            elapsed = time.time() - start
+            if timeout is not None and elapsed >= timeout:
+                return
+            interval = get_retry_interval(elapsed, min_interval, max_interval, clamp_time)
+            yield interval if timeout is None else min(interval, timeout - elapsed)
+
+    return intervals()
+
+
+def fetch_concurrently(fetch, items, max_workers=MAX_CONCURRENT_FETCHES):
+    """Calls *fetch* on each of *items*, on up to *max_workers* threads at a
+    time.
+
+    :return: A ``list`` of what *fetch* returned, in the order of *items*.
+    :raises: The first exception *fetch* raised, once every call is over.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    indexes = iter(range(len(items)))
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                i = next(indexes, None)
+            if i is None:
+                return
+            try:
+                results[i] = fetch(items[i])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=work) for i in range(min(max_workers, len(items)) - 1)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    work()  # the calling thread fetches too, so that a single item takes no thread
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def _is_done(status):
+    if status is None:
+        return False  # splunkd has no status for the job yet
+    done = status.get("isDone")
+    if isinstance(done, str):
+        return done.lower() in ("1", "true")
+    return bool(done)
+
+
+def wait_for_jobs(fetch_status, sids, timeout=None, min_interval=MIN_INTERVAL,
+                  max_interval=MAX_INTERVAL, clamp_time=EASING_DURATION, sleep=time.sleep):
+    """Waits until every job in *sids* is done, or *timeout* seconds have
+    passed.
+
+    *fetch_status* is called with the sids of the jobs that are not done yet
+    and returns a ``dict`` mapping each of them to a ``dict`` of its
+    ``isDone`` and ``dispatchState`` properties, or to ``None`` while splunkd
+    has no status for it yet. A sid left out of that ``dict`` is a job
+    splunkd no longer has, because it was cancelled or expired; it is not
+    waited for any more and is not in the returned set. Polls are spaced by
+    :func:`retry_intervals`.
+
+    :param timeout: The number of seconds to wait, or ``None`` to wait
+        forever.
+    :return: The set of sids that are done.
+    """
+    pending = list(sids)
+    done = set()
+    intervals = retry_intervals(timeout, min_interval, max_interval, clamp_time)
+    while True:
+        statuses = fetch_status(pending)
+        for sid in pending:
+            if _is_done(statuses.get(sid)):
+                done.add(sid)
+        pending = [sid for sid in pending if sid in statuses and sid not in done]
+        interval = next(intervals, None) if pending else None
+        if interval is None:
+            return done
+        sleep(interval)
@@ -12,8 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-"""The **splunklib.results** module provides a streaming XML reader for Splunk
-search results.
+"""The **splunklib.results** module provides streaming XML, JSON and CSV readers
+for Splunk search results.
 
 Splunk search results can be returned in a variety of formats including XML,
 JSON, and CSV. To make it easier to stream search results in XML format, they
@@ -30,10 +30,19 @@ as follows:::
     for item in reader:
         print(item)
     print "Results are a preview: %s" % reader.is_preview
+
+Results requested with ``output_mode=json`` or ``output_mode=csv`` are read the
+same way with :class:`JSONResultsReader` and :class:`CSVResultsReader`, which
+skip the XML parser altogether and are several times faster on large result
+sets.
 """
 
 from __future__ import absolute_import
 
+import csv
+import json
+import re
+
 from io import BytesIO
 
 from splunklib import six
@@ -54,6 +63,8 @@ except:
 
 __all__ = [
     "ResultsReader",
+    "JSONResultsReader",
+    "CSVResultsReader",
     "Message"
 ]
 
@@ -98,17 +109,20 @@ class _ConcatenatedStream(object):
     def read(self, n=None):
         """Read at most *n* characters from this stream.
 
-        If *n* is ``None``, return all available characters.
+        If *n* is ``None``, return all available characters. Otherwise the
+        characters come from one stream, and a stream is only dropped once
+        it is exhausted.
         """
-        response = b""
-        while len(self.streams) > 0 and (n is None or n > 0):
+        if n is None:
+            response = b"".join(stream.read() for stream in self.streams)
+            del self.streams[:]
+            return response
+        while len(self.streams) > 0:
             txt = self.streams[0].read(n)
-            response += txt
-            if n is not None:
-                n -= len(txt)
-            if n is None or n > 0:
-                del self.streams[0]
-        return response
+            if txt:
+                return txt
+            del self.streams[0]
+        return b""
 
 class _XMLDTDFilter(object):
     """Lazily remove all XML DTDs from a stream.
@@ -117,40 +131,72 @@ class _XMLDTDFilter(object):
     removed in their entirety from the stream. No regular expressions
     are used, however, so everything still streams properly.
 
+    The stream is read in blocks of *block_size* bytes and each block is
+    searched with ``bytes.find``. Filtered bytes wait in a ``bytearray``
+    that is appended to and consumed from the front, which CPython does
+    without copying what remains.
+
     **Example**::
 
         from StringIO import StringIO
         s = _XMLDTDFilter("<?xml abcd><element><?xml ...></element>")
         assert s.read() == "<element></element>"
     """
-    def __init__(self, stream):
+    def __init__(self, stream, block_size=65536):
         self.stream = stream
+        self.block_size = block_size
+        self._buffer = bytearray()  # filtered bytes not returned yet
+        self._tail = b""            # a trailing "<" that may open a DTD in the next block
+        self._in_dtd = False        # the last block ended inside a DTD
+        self._eof = False
+
+    def _fill(self):
+        block = self.stream.read(self.block_size)
+        if not block:
+            self._buffer += self._tail
+            self._tail = b""
+            self._eof = True
+            return
+        if self._tail:
+            block = self._tail + block
+            self._tail = b""
+        view = memoryview(block)
+        pos = 0
+        if self._in_dtd:
+            pos = block.find(b">")
+            if pos < 0:
+                return
+            pos += 1
+            self._in_dtd = False
+        while True:
+            start = block.find(b"<?", pos)
+            if start < 0:
+                if block.endswith(b"<") and len(block) > pos:
+                    self._buffer += view[pos:-1]
+                    self._tail = b"<"
+                else:
+                    self._buffer += view[pos:]
+                return
+            self._buffer += view[pos:start]
+            end = block.find(b">", start + 2)
+            if end < 0:
+                self._in_dtd = True
+                return
+            pos = end + 1
 
     def read(self, n=None):
         """Read at most *n* characters from this stream.
 
         If *n* is ``None``, return all available characters.
         """
-        response = b""
-        while n is None or n > 0:
-            c = self.stream.read(1)
-            if c == b"":
-                break
-            elif c == b"<":
-                c += self.stream.read(1)
-                if c == b"<?":
-                    while True:
-                        q = self.stream.read(1)
-                        if q == b">":
-                            break
-                else:
-                    response += c
-                    if n is not None:
-                        n -= len(c)
-            else:
-                response += c
-                if n is not None:
-                    n -= 1
+        while not self._eof and (n is None or len(self._buffer) < n):
+            self._fill()
+        if n is None or n >= len(self._buffer):
+            response = bytes(self._buffer)
+            del self._buffer[:]
+        else:
+            response = bytes(self._buffer[:n])
+            del self._buffer[:n]
         return response
 
 class ResultsReader(object):
@@ -293,3 +339,140 @@ class ResultsReader(object):
 
 
 
+
+
+def _read_lines(stream, size=65536):
+    """Yield the lines of *stream*, line endings included, reading it *size* bytes at a time."""
+    pending = b""
+    while True:
+        data = stream.read(size)
+        if not data:
+            break
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+
+class JSONResultsReader(object):
+    """This class returns dictionaries and Splunk messages from a JSON results
+    stream, as returned with ``output_mode=json``.
+
+    Both the newline-delimited objects streamed by ``search/jobs/export`` and the
+    single document returned by ``search/jobs/{search_id}/results`` are
+    understood. Like :class:`ResultsReader`, ``JSONResultsReader`` is iterable,
+    returns a ``dict`` for results, or a :class:`Message` object for Splunk
+    messages, and has an ``is_preview`` field. Fields with several values are
+    returned as lists.
+
+    :param `stream`: The stream to read from (any object that supports
+        ``.read()``).
+
+    **Example**::
+
+        import results
+        reader = results.JSONResultsReader(service.jobs.export("search * | head 5", output_mode="json"))
+        for result in reader:
+            if isinstance(result, dict):
+                print "Result: %s" % result
+            elif isinstance(result, results.Message):
+                print "Message: %s" % result
+    """
+    def __init__(self, stream):
+        self.is_preview = None
+        self._gen = self._parse_results(stream)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self._gen)
+
+    __next__ = next
+
+    def _parse_results(self, stream):
+        """Parse results and messages out of *stream*."""
+        decode = json.JSONDecoder().decode
+        for line in _read_lines(stream):
+            line = line.strip()
+            if not line:
+                continue
+            document = decode(line.decode('utf-8'))
+            if "preview" in document:
+                self.is_preview = document["preview"]
+            for message in document.get("messages", ()):
+                yield Message(message.get("type"), message.get("text", ""))
+            if "result" in document:
+                yield document["result"]
+            elif "results" in document:
+                for result in document["results"]:
+                    yield result
+
+
+class CSVResultsReader(object):
+    """This class returns dictionaries from a CSV results stream, as returned
+    with ``output_mode=csv``.
+
+    The first row names the fields. As with :class:`ResultsReader`, fields
+    without a value are left out of each ``dict``. The CSV format carries neither
+    messages nor the preview flag, so ``is_preview`` stays ``None``. Fields with
+    several values are returned as lists, decoded from the ``__mv_`` columns
+    that accompany them.
+
+    :param `stream`: The stream to read from (any object that supports
+        ``.read()``).
+
+    **Example**::
+
+        import results
+        for result in results.CSVResultsReader(job.results(output_mode="csv", count=0)):
+            print "Result: %s" % result
+    """
+    def __init__(self, stream):
+        self.is_preview = None
+        self._gen = self._parse_results(stream)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self._gen)
+
+    __next__ = next
+
+    def _parse_results(self, stream):
+        """Parse results out of *stream*."""
+        rows = csv.reader(line.decode('utf-8') for line in _read_lines(stream))
+        fields = next(rows, None)
+        if fields is None:
+            return
+        mv_fields = dict((field, field[len('__mv_'):]) for field in fields if field.startswith('__mv_'))
+        if not mv_fields:
+            for row in rows:
+                yield OrderedDict((field, value) for field, value in zip(fields, row) if value != '')
+            return
+        for row in rows:
+            result = OrderedDict()
+            multivalues = {}
+            for field, value in zip(fields, row):
+                if value == '':
+                    continue
+                if field in mv_fields:
+                    multivalues[mv_fields[field]] = _decode_list(value)
+                else:
+                    result[field] = value
+            for field, values in multivalues.items():
+                if len(values) > 1:
+                    result[field] = values
+                elif values and field not in result:
+                    result[field] = values[0]
+            yield result
+
+
+def _decode_list(mv):
+    """Decode the ``$value$;$value$`` list of a ``__mv_`` column."""
+    return [match.replace('$$', '$') for match in _encoded_value.findall(mv)]
+
+_encoded_value = re.compile(r'\$(?P<item>(?:\$\$|[^$])*)\$(?:;|$)')  # matches a single value in an encoded list
@@ -100,6 +100,20 @@ class EventingCommand(SearchCommand):
 
         # region SCP v2 properties
 
+        pipeline = ConfigurationSetting(doc='''
+            Specifies the number of input chunks read ahead and output chunks written behind on worker threads.
+
+            A value greater than zero pipelines execution: a reader thread reads up to this many chunks from splunkd
+            while the command processes the current one, and a writer thread writes the output of up to this many
+            chunks to splunkd. Chunks are processed and written in order. Zero, the default, reads, processes, and
+            writes each chunk in turn.
+
+            Default: :const:`0`
+
+            Supported by: SCP 2
+
+            ''')
+
         maxinputs = ConfigurationSetting(doc='''
             Specifies the maximum number of events that can be passed to the command for each invocation.
 
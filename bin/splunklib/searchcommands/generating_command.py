@@ -204,7 +204,7 @@ class GeneratingCommand(SearchCommand):
 
         """
         if self._protocol_version == 2:
-            result = self._read_chunk(ifile)
+            result = self._read_chunk(ifile, self._chunk_buffer)
 
             if not result:
                 return
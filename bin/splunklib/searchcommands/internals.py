@@ -16,6 +16,7 @@
 
 from __future__ import absolute_import, division, print_function
 
+from array import array
 from io import TextIOWrapper
 from collections import deque, namedtuple
 from splunklib import six
@@ -24,11 +25,13 @@ try:
 except ImportError:
     from ..ordereddict import OrderedDict
 from splunklib.six.moves import StringIO
-from itertools import chain
-from splunklib.six.moves import map as imap
+from splunklib.six.moves.queue import Queue
+from itertools import chain, repeat
+from splunklib.six.moves import map as imap, zip as izip
 from json import JSONDecoder, JSONEncoder
 from json.encoder import encode_basestring_ascii as json_encode_string
 from splunklib.six.moves import urllib
+from threading import Thread
 
 import csv
 import gzip
@@ -38,6 +41,11 @@ import sys
 
 from . import environment
 
+try:
+    import numpy
+except ImportError:
+    numpy = None  # ColumnBatch.numeric then returns array('d') columns
+
 csv.field_size_limit(10485760)  # The default value is 128KB; upping to 10MB. See SPL-12117 for background on this issue
 
 
@@ -73,6 +81,102 @@ def set_binary_mode(fh):
     return fh
 
 
+class ColumnBatch(object):
+    """ The records of one chunk of input, held as columns.
+
+    A :class:`StreamingCommand` that overrides :meth:`~StreamingCommand.stream_batch` receives each chunk of records
+    it is sent as a :class:`ColumnBatch`. Index a batch by field name to read a column, assign to it to add or replace
+    a column, and delete from it to drop a column. Columns are returned as tuples with one value per record: a string,
+    which is empty when the record has no value, or a list of strings for a multi-value field. Columns may be assigned
+    as lists, tuples, :class:`array.array` or NumPy arrays; numeric arrays are written without looking at each value.
+    Columns that are not assigned are written back exactly as they were read.
+
+    """
+    def __init__(self, fieldnames, rows, decode_list):
+        columns = list(zip(*rows)) if rows else [()] * len(fieldnames)
+        self._length = len(rows)
+        self._sv = OrderedDict()
+        self._mv = {}
+        for fieldname, column in zip(fieldnames, columns):
+            if fieldname.startswith('__mv_'):
+                self._mv.setdefault(fieldname[len('__mv_'):], column)
+            elif fieldname not in self._sv:
+                self._sv[fieldname] = column
+        for fieldname in self._mv:
+            if fieldname not in self._sv:
+                self._sv[fieldname] = ('',) * self._length
+        self._columns = OrderedDict(self._sv)
+        self._decoded = {}
+        for fieldname, mv in list(self._mv.items()):
+            if any(mv):
+                self._columns[fieldname] = self._decoded[fieldname] = tuple(
+                    decode_list(m) if m else v for v, m in zip(self._sv[fieldname], mv))
+            else:
+                del self._mv[fieldname]
+
+    def __contains__(self, fieldname):
+        return fieldname in self._columns
+
+    def __delitem__(self, fieldname):
+        del self._columns[fieldname]
+
+    def __getitem__(self, fieldname):
+        return self._columns[fieldname]
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return self._length
+
+    def __setitem__(self, fieldname, column):
+        if len(column) != self._length:
+            raise ValueError('Column {} has {} values, not {}'.format(fieldname, len(column), self._length))
+        self._columns[fieldname] = column
+
+    @property
+    def fieldnames(self):
+        """ The names of the fields in this batch, in output order.
+
+        """
+        return list(self._columns)
+
+    def keys(self):
+        return self._columns.keys()
+
+    def numeric(self, fieldname, default=float('nan')):
+        """ Returns a column converted to floating point numbers.
+
+        Values that are not numbers, including empty and multi-value ones, are replaced by :code:`default`.
+
+        :return: A NumPy :code:`float64` array, if NumPy is installed; otherwise an :code:`array('d')`, which does not
+            support arithmetic on the whole array.
+
+        """
+        column = self._columns[fieldname]
+        try:
+            values = list(imap(float, column))
+        except (TypeError, ValueError):
+            def to_float(value):
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    return default
+            values = [to_float(value) for value in column]
+        return numpy.array(values, dtype=numpy.float64) if numpy is not None else array('d', values)
+
+    def _raw_column(self, fieldname):
+        # Returns the values and encoded multi-values read for a column that has not been replaced, or None.
+        column = self._columns.get(fieldname)
+        if column is None:
+            return None
+        if column is self._sv.get(fieldname):
+            return column, None
+        if column is self._decoded.get(fieldname):
+            return self._sv[fieldname], self._mv[fieldname]
+        return None
+
+
 class CommandLineParser(object):
     """ Parses the arguments to a search command.
 
@@ -322,6 +426,10 @@ class ConfigurationSettingsType(type):
             type=bool,
             constraint=None,
             supporting_protocols=[1]),
+        'pipeline': specification(
+            type=int,
+            constraint=lambda value: 0 <= value <= six.MAXSIZE,
+            supporting_protocols=[]),  # a setting of the command itself, which is not sent to splunkd
         'required_fields': specification(
             type=(list, set, tuple),
             constraint=None,
@@ -472,6 +580,13 @@ class Recorder(object):
         self._recording.flush()
         return value
 
+    def readinto(self, b):
+        count = self._file.readinto(b)
+        if count:
+            self._recording.write(b[:count])
+            self._recording.flush()
+        return count
+
     def readline(self, size=None):
         value = self._file.readline() if size is None else self._file.readline(size)
         if len(value) > 0:
@@ -489,6 +604,65 @@ class Recorder(object):
         self._recording.flush()
 
 
+class AsyncWriter(object):
+    """ Writes to a file on a writer thread, so that a command can go on while its output is written.
+
+    Writes are collected until the next call to :meth:`flush` and handed to the writer thread together, in order. At
+    most `max_pending` flushes wait to be written; :meth:`flush` blocks when there are more. An error writing the file
+    is raised by the next call to :meth:`write`, :meth:`flush`, or :meth:`close`.
+
+    """
+    def __init__(self, f, max_pending=2):
+        self.file = f
+        self._parts = []
+        self._pending = Queue(max_pending)
+        self._error = None
+        self._thread = Thread(target=self._run, name='AsyncWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def write(self, data):
+        self._raise_error()
+        self._parts.append(data)
+
+    def flush(self):
+        self._raise_error()
+        self._pending.put(self._parts)
+        self._parts = []
+
+    def close(self):
+        """ Waits until everything written has been written to the file. The file is not closed.
+
+        """
+        if self._parts:
+            self.flush()
+        self._pending.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        f = self.file
+        while True:
+            parts = self._pending.get()
+            if parts is None:
+                return
+            if self._error is not None:
+                continue  # dropped; the error is raised in the writing thread
+            try:
+                for part in parts:
+                    f.write(part)
+                f.flush()
+            except Exception as error:
+                self._error = error
+
+
 class RecordWriter(object):
 
     def __init__(self, ofile, maxresultrows=None):
@@ -496,6 +670,7 @@ class RecordWriter(object):
 
         self._ofile = set_binary_mode(ofile)
         self._fieldnames = None
+        self._plan = None
         self._buffer = StringIO()
 
         self._writer = csv.writer(self._buffer, dialect=CsvDialect)
@@ -572,89 +747,166 @@ class RecordWriter(object):
             value_list = imap(lambda fn: (str(fn), str('__mv_') + str(fn)), fieldnames)
             self._writerow(list(chain.from_iterable(value_list)))
 
-        get_value = record.get
-        values = []
+        values = list(imap(record.get, fieldnames))
+        value_types = list(imap(type, values))
+        plan = self._plan
 
-        for fieldname in fieldnames:
-            value = get_value(fieldname, None)
+        if plan is None or plan[0] != value_types:
+            self._plan = plan = RecordWriter._compile_plan(value_types)
 
-            if value is None:
-                values += (None, None)
-                continue
+        _, str_indexes, encode_indexes = plan
 
-            value_t = type(value)
+        for index in str_indexes:
+            values[index] = str(values[index])
 
-            if issubclass(value_t, (list, tuple)):
+        row = [None] * (2 * len(values))
 
-                if len(value) == 0:
-                    values += (None, None)
-                    continue
+        if encode_indexes:
+            encode_value = RecordWriter._encode_value
+            for index in encode_indexes:
+                values[index], row[2 * index + 1] = encode_value(values[index])
 
-                if len(value) > 1:
-                    value_list = value
-                    sv = ''
-                    mv = '$'
+        row[::2] = values
+        self._writerow(row)
+        self._record_count += 1
 
-                    for value in value_list:
+        if self._record_count >= self._maxresultrows:
+            self.flush(partial=True)
 
-                        if value is None:
-                            sv += '\n'
-                            mv += '$;$'
-                            continue
+    @staticmethod
+    def _compile_plan(value_types):
+        # Returns the plan _write_record follows for as long as the values of records have these types: the indexes of
+        # the values to convert with str and of those to encode with _encode_value. Other values are written as they are.
+        str_indexes = []
+        encode_indexes = []
+        for index, value_t in enumerate(value_types):
+            if value_t in RecordWriter._verbatim_types:
+                continue
+            if value_t in RecordWriter._str_types:
+                str_indexes.append(index)
+            else:
+                encode_indexes.append(index)
+        return value_types, str_indexes, encode_indexes
 
-                        value_t = type(value)
+    _verbatim_types = (type(None), bytes) if six.PY2 else (type(None), bytes, six.text_type)
+    _str_types = six.integer_types + (float,)
 
-                        if value_t is not bytes:
+    def write_batch(self, batch):
+        """ Writes the columns of a :class:`ColumnBatch`, or of a mapping from field names to columns of equal length.
 
-                            if value_t is bool:
-                                value = str(value.real)
-                            elif value_t is six.text_type:
-                                value = value
-                            elif isinstance(value, six.integer_types) or value_t is float or value_t is complex:
-                                value = str(value)
-                            elif issubclass(value_t, (dict, list, tuple)):
-                                value = str(''.join(RecordWriter._iterencode_json(value, 0)))
-                            else:
-                                value = repr(value).encode('utf-8', errors='backslashreplace')
+        Columns of a :class:`ColumnBatch` that were not replaced are written as they were read. Numeric
+        :class:`array.array` and NumPy columns are converted to text a column at a time.
 
-                        sv += value + '\n'
-                        mv += value.replace('$', '$$') + '$;$'
+        """
+        self._ensure_validity()
 
-                    values += (sv[:-1], mv[:-2])
-                    continue
+        if isinstance(batch, ColumnBatch):
+            length = len(batch)
+            raw_column = batch._raw_column
+        else:
+            length = len(next(iter(batch.values()))) if batch else 0
+            raw_column = lambda fieldname: None
 
-                value = value[0]
-                value_t = type(value)
+        if length == 0:
+            return  # like a chunk without records, which writes no header either
 
-            if value_t is bool:
-                values += (str(value.real), None)
-                continue
+        fieldnames = self._fieldnames
+        if fieldnames is None:
+            fieldnames = list(batch.keys())
+            self._fieldnames = fieldnames
+            value_list = imap(lambda fn: (str(fn), str('__mv_') + str(fn)), fieldnames)
+            self._writerow(list(chain.from_iterable(value_list)))
 
-            if value_t is bytes:
-                values += (value, None)
-                continue
+        columns = []
+        for fieldname in fieldnames:
+            encoded = raw_column(fieldname)
+            if encoded is None:
+                encoded = self._encode_column(batch[fieldname]) if fieldname in batch else (None, None)
+            sv, mv = encoded
+            if sv is not None and len(sv) != length:
+                raise ValueError('Column {} has {} values, not {}'.format(fieldname, len(sv), length))
+            columns.append(repeat(None, length) if sv is None else sv)
+            columns.append(repeat(None, length) if mv is None else mv)
+
+        self._writer.writerows(izip(*columns))
+        self._record_count += length
 
-            if value_t is six.text_type:
-                if six.PY2:
-                    value = value.encode('utf-8')
-                values += (value, None)
-                continue
+        if self._record_count >= self._maxresultrows:
+            self.flush(partial=True)
 
-            if isinstance(value, six.integer_types) or value_t is float or value_t is complex:
-                values += (str(value), None)
-                continue
+    @staticmethod
+    def _encode_column(column):
+        # Returns the values and encoded multi-values to write for a column, either of which may be None when empty.
+        kind = getattr(getattr(column, 'dtype', None), 'kind', None)
+        if isinstance(column, array) or kind in ('i', 'u', 'f'):
+            return list(imap(str, column.tolist())), None
+        if kind == 'b':
+            return ['1' if value else '0' for value in column.tolist()], None
+        if kind is not None:
+            column = column.tolist()
+        encode_value = RecordWriter._encode_value
+        sv = []
+        mv = []
+        for value in column:
+            if type(value) is six.text_type:
+                sv.append(value)
+                mv.append(None)
+            else:
+                value, values = encode_value(value)
+                sv.append(value)
+                mv.append(values)
+        return sv, mv
 
-            if issubclass(value_t, dict):
-                values += (str(''.join(RecordWriter._iterencode_json(value, 0))), None)
-                continue
+    @staticmethod
+    def _encode_value(value):
+        # Returns the value and encoded multi-value _write_record writes for a value.
+        if value is None:
+            return None, None
+        value_t = type(value)
+        if issubclass(value_t, (list, tuple)):
+            if len(value) == 0:
+                return None, None
+            if len(value) > 1:
+                return RecordWriter._encode_list(value)
+            value = value[0]
+            value_t = type(value)
+        if value_t is bool:
+            return str(value.real), None
+        if value_t is bytes:
+            return value, None
+        if value_t is six.text_type:
+            return value.encode('utf-8') if six.PY2 else value, None
+        if isinstance(value, six.integer_types) or value_t is float or value_t is complex:
+            return str(value), None
+        if issubclass(value_t, dict):
+            return str(''.join(RecordWriter._iterencode_json(value, 0))), None
+        return repr(value), None
 
-            values += (repr(value), None)
+    @staticmethod
+    def _encode_list(value_list):
+        text_type = six.text_type
+        encode_item = RecordWriter._encode_item
+        values = [value if type(value) is text_type else encode_item(value) for value in value_list]
+        return '\n'.join(values), '$' + '$;$'.join([value.replace('$', '$$') for value in values]) + '$'
 
-        self._writerow(values)
-        self._record_count += 1
+    @staticmethod
+    def _encode_item(value):
+        # Returns the text _encode_list writes for an item of a multi-value.
 
-        if self._record_count >= self._maxresultrows:
-            self.flush(partial=True)
+        if value is None:
+            return ''
+
+        value_t = type(value)
+
+        if value_t is bytes:
+            return value
+        if value_t is bool:
+            return str(value.real)
+        if isinstance(value, six.integer_types) or value_t is float or value_t is complex:
+            return str(value)
+        if issubclass(value_t, (dict, list, tuple)):
+            return str(''.join(RecordWriter._iterencode_json(value, 0)))
+        return repr(value).encode('utf-8', errors='backslashreplace')
 
     try:
         # noinspection PyUnresolvedReferences
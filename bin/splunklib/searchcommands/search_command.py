@@ -28,6 +28,7 @@ except ImportError:
     from ..ordereddict import OrderedDict
 from copy import deepcopy
 from splunklib.six.moves import StringIO
+from splunklib.six.moves.queue import Queue
 from itertools import chain, islice
 from splunklib.six.moves import filter as ifilter, map as imap, zip as izip
 from splunklib import six
@@ -40,6 +41,7 @@ try:
 except ImportError:
     # Used for recording, skip on python 2.6
     pass
+from threading import Thread
 from time import time
 from splunklib.six.moves.urllib.parse import unquote
 from splunklib.six.moves.urllib.parse import urlsplit
@@ -56,6 +58,8 @@ import traceback
 # Relative imports
 
 from .internals import (
+    AsyncWriter,
+    ColumnBatch,
     CommandLineParser,
     CsvDialect,
     InputHeader,
@@ -124,6 +128,9 @@ class SearchCommand(object):
         self._default_logging_level = self._logger.level
         self._record_writer = None
         self._records = None
+        self._batches = None
+        self._chunk_buffer = bytearray()
+        self._prefetched = None
 
     def __str__(self):
         text = ' '.join(chain((type(self).name, str(self.options)), [] if self.fieldnames is None else self.fieldnames))
@@ -600,6 +607,7 @@ class SearchCommand(object):
 
                 ifile = self._prepare_protocol_v1(argv, ifile, ofile)
                 self._records = self._records_protocol_v1
+                self._batches = self._batches_protocol_v1
                 self._metadata.action = 'execute'
                 self._execute(ifile, None)
 
@@ -656,7 +664,8 @@ class SearchCommand(object):
         # noinspection PyBroadException
         try:
             debug('Reading metadata')
-            metadata, body = self._read_chunk(ifile)
+            ifile = self._as_binary_stream(ifile)
+            metadata, body = self._read_chunk(ifile, self._chunk_buffer)
 
             action = getattr(metadata, 'action', None)
 
@@ -777,18 +786,65 @@ class SearchCommand(object):
         try:
             debug('Executing under protocol_version=2')
             self._records = self._records_protocol_v2
+            self._batches = self._batches_protocol_v2
             self._metadata.action = 'execute'
+            self._start_pipeline(ifile)
             self._execute(ifile, None)
         except SystemExit:
             self.finish()
+            self._stop_pipeline()
             raise
         except:
             self._report_unexpected_error()
             self.finish()
+            self._stop_pipeline()
             exit(1)
 
+        self._stop_pipeline()
         debug('%s.process completed', class_name)
 
+    def _start_pipeline(self, ifile):
+        # Under a pipeline setting of n, chunks are read up to n ahead on a reader thread and output chunks are written
+        # behind on a writer thread, up to n of them, so that reading and writing overlap with processing
+        depth = getattr(self._configuration, 'pipeline', None)
+
+        if not depth:
+            return
+
+        environment.splunklib_logger.debug('  pipeline=%d', depth)
+        self._prefetched = prefetched = Queue(depth)
+
+        def read_chunks():
+            buffer = bytearray()
+            try:
+                while True:
+                    result = self._read_chunk(ifile, buffer)
+                    prefetched.put((result, None))
+                    if not result or getattr(result[0], 'finished', False):
+                        return
+            except Exception as error:
+                prefetched.put((None, error))
+
+        reader = Thread(target=read_chunks, name='ChunkReader')
+        reader.daemon = True  # it may be blocked reading when the command ends early
+        reader.start()
+        self._record_writer.ofile = AsyncWriter(self._record_writer.ofile, depth)
+
+    def _stop_pipeline(self):
+        ofile = self._record_writer.ofile
+        if isinstance(ofile, AsyncWriter):
+            self._record_writer.ofile = ofile.file
+            ofile.close()
+        self._prefetched = None
+
+    def _next_chunk(self, ifile):
+        if self._prefetched is None:
+            return self._read_chunk(ifile, self._chunk_buffer)
+        result, error = self._prefetched.get()
+        if error is not None:
+            raise error
+        return result
+
     def write_debug(self, message, *args):
         self._record_writer.write_message('DEBUG', message, *args)
 
@@ -850,7 +906,14 @@ class SearchCommand(object):
         self.finish()
 
     @staticmethod
-    def _read_chunk(ifile):
+    def _as_binary_stream(ifile):
+        # Chunk lengths are in bytes, so chunks are read from the binary stream under a text stream like sys.stdin
+        if isinstance(ifile.read(0), bytes):
+            return ifile
+        return getattr(ifile, 'buffer', ifile)
+
+    @staticmethod
+    def _read_chunk(ifile, buffer=None):
         # noinspection PyBroadException
         try:
             header = ifile.readline()
@@ -860,6 +923,9 @@ class SearchCommand(object):
         if not header:
             return None
 
+        if six.PY3 and isinstance(header, bytes):
+            header = header.decode('utf-8')
+
         match = SearchCommand._header.match(header)
 
         if match is None:
@@ -870,7 +936,7 @@ class SearchCommand(object):
         body_length = int(body_length)
 
         try:
-            metadata = ifile.read(metadata_length)
+            metadata = SearchCommand._read_exactly(ifile, metadata_length, buffer)
         except Exception as error:
             raise RuntimeError('Failed to read metadata of length {}: {}'.format(metadata_length, error))
 
@@ -887,12 +953,35 @@ class SearchCommand(object):
         body = ""
         try:
             if body_length > 0:
-                body = ifile.read(body_length)
+                body = SearchCommand._read_exactly(ifile, body_length, buffer)
         except Exception as error:
             raise RuntimeError('Failed to read body of length {}: {}'.format(body_length, error))
 
         return metadata, body
 
+    @staticmethod
+    def _read_exactly(ifile, length, buffer=None):
+        # Reads length bytes from a binary stream into buffer, growing it as needed, and decodes them once. A text
+        # stream is read as before, taking length as a number of characters, and Python 2 reads str as before.
+
+        if buffer is None or six.PY2 or not hasattr(ifile, 'readinto'):
+            value = ifile.read(length)
+            if six.PY3 and isinstance(value, bytes):
+                value = value.decode('utf-8')
+        else:
+            if len(buffer) < length:
+                buffer.extend(bytes(length - len(buffer)))
+            with memoryview(buffer) as view:  # released, so that buffer can grow for the next read
+                count = 0
+                while count < length:
+                    n = ifile.readinto(view[count:length])
+                    if not n:
+                        break
+                    count += n
+                value = str(view[:count], 'utf-8')
+
+        return value
+
     _header = re.compile(r'chunked\s+1.0\s*,\s*(\d+)\s*,\s*(\d+)\s*\n')
 
     def _records_protocol_v1(self, ifile):
@@ -921,10 +1010,34 @@ class SearchCommand(object):
                     record[fieldname] = value
             yield record
 
-    def _records_protocol_v2(self, ifile):
+    def _batches_protocol_v1(self, ifile):
+
+        reader = csv.reader(ifile, dialect=CsvDialect)
+
+        try:
+            fieldnames = next(reader)
+        except StopIteration:
+            return
+
+        yield ColumnBatch(fieldnames, list(reader), self._decode_list)
+
+    def _batches_protocol_v2(self, ifile):
+
+        for body in self._chunks_protocol_v2(ifile):
+            reader = csv.reader(StringIO(body), dialect=CsvDialect)
+
+            try:
+                fieldnames = next(reader)
+            except StopIteration:
+                return
+
+            yield ColumnBatch(fieldnames, list(reader), self._decode_list)
+
+    def _chunks_protocol_v2(self, ifile):
+        # Yields the body of each execute chunk that has one, flushing the output of each chunk before reading the next
 
         while True:
-            result = self._read_chunk(ifile)
+            result = self._next_chunk(ifile)
 
             if not result:
                 return
@@ -939,33 +1052,38 @@ class SearchCommand(object):
             self._record_writer.is_flushed = False
 
             if len(body) > 0:
-                reader = csv.reader(StringIO(body), dialect=CsvDialect)
+                yield body
 
-                try:
-                    fieldnames = next(reader)
-                except StopIteration:
-                    return
+            if finished:
+                return
 
-                mv_fieldnames = dict([(name, name[len('__mv_'):]) for name in fieldnames if name.startswith('__mv_')])
+            self.flush()
 
-                if len(mv_fieldnames) == 0:
-                    for values in reader:
-                        yield OrderedDict(izip(fieldnames, values))
-                else:
-                    for values in reader:
-                        record = OrderedDict()
-                        for fieldname, value in izip(fieldnames, values):
-                            if fieldname.startswith('__mv_'):
-                                if len(value) > 0:
-                                    record[mv_fieldnames[fieldname]] = self._decode_list(value)
-                            elif fieldname not in record:
-                                record[fieldname] = value
-                        yield record
+    def _records_protocol_v2(self, ifile):
 
-            if finished:
+        for body in self._chunks_protocol_v2(ifile):
+            reader = csv.reader(StringIO(body), dialect=CsvDialect)
+
+            try:
+                fieldnames = next(reader)
+            except StopIteration:
                 return
 
-            self.flush()
+            mv_fieldnames = dict([(name, name[len('__mv_'):]) for name in fieldnames if name.startswith('__mv_')])
+
+            if len(mv_fieldnames) == 0:
+                for values in reader:
+                    yield OrderedDict(izip(fieldnames, values))
+            else:
+                for values in reader:
+                    record = OrderedDict()
+                    for fieldname, value in izip(fieldnames, values):
+                        if fieldname.startswith('__mv_'):
+                            if len(value) > 0:
+                                record[mv_fieldnames[fieldname]] = self._decode_list(value)
+                        elif fieldname not in record:
+                            record[fieldname] = value
+                    yield record
 
     def _report_unexpected_error(self):
 
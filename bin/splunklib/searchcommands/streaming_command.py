@@ -51,8 +51,29 @@ class StreamingCommand(SearchCommand):
         """
         raise NotImplementedError('StreamingCommand.stream(self, records)')
 
+    def stream_batch(self, batch):
+        """ Processes a chunk of event records as columns and returns the columns to write to the Splunk stream
+        pipeline.
+
+        Override this method instead of :meth:`stream` to skip the creation of a dictionary for every record. It is
+        called once for each chunk of records with a :class:`~splunklib.searchcommands.internals.ColumnBatch`, which it
+        may change and return, and must return the columns to write: the batch, a mapping from field names to columns
+        of equal length, or :const:`None` to write nothing. Numeric columns can be read with
+        :meth:`~splunklib.searchcommands.internals.ColumnBatch.numeric` and assigned back as arrays.
+
+        """
+        raise NotImplementedError('StreamingCommand.stream_batch(self, batch)')
+
     def _execute(self, ifile, process):
-        SearchCommand._execute(self, ifile, self.stream)
+        if type(self).stream_batch == StreamingCommand.stream_batch:
+            SearchCommand._execute(self, ifile, self.stream)
+            return
+        write_batch = self._record_writer.write_batch
+        for batch in self._batches(ifile):
+            columns = self.stream_batch(batch)
+            if columns is not None:
+                write_batch(columns)
+        self.finish()
 
     # endregion
 
@@ -139,6 +160,20 @@ class StreamingCommand(SearchCommand):
 
             ''')
 
+        pipeline = ConfigurationSetting(doc='''
+            Specifies the number of input chunks read ahead and output chunks written behind on worker threads.
+
+            A value greater than zero pipelines execution: a reader thread reads up to this many chunks from splunkd
+            while the command processes the current one, and a writer thread writes the output of up to this many
+            chunks to splunkd. Chunks are processed and written in order. Zero, the default, reads, processes, and
+            writes each chunk in turn.
+
+            Default: :const:`0`
+
+            Supported by: SCP 2
+
+            ''')
+
         maxinputs = ConfigurationSetting(doc='''
             Specifies the maximum number of events that can be passed to the command for each invocation.
 
@@ -169,8 +204,8 @@ class StreamingCommand(SearchCommand):
             """ Verifies :code:`command` class structure.
 
             """
-            if command.stream == StreamingCommand.stream:
-                raise AttributeError('No StreamingCommand.stream override')
+            if command.stream == StreamingCommand.stream and command.stream_batch == StreamingCommand.stream_batch:
+                raise AttributeError('No StreamingCommand.stream or StreamingCommand.stream_batch override')
             return
 
         # TODO: Stop looking like a dictionary because we don't obey the semantics
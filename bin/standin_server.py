@@ -0,0 +1,58 @@
+#
+# A local stand-in for the HTTP servers the tests talk to, splunkd's REST API
+# and the HTTP Event Collector. A test case derives from StandInServerTestCase
+# and names the StandInHandler subclass that answers its requests; a server is
+# started on a free port for each test and stopped after it.
+#
+
+import gzip
+import threading
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def read_body(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def reply(self, status, body, content_type=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close") # as splunkd answers the SDK's Connection: Close
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class StandInServerTestCase(unittest.TestCase):
+    handler = None # the StandInHandler subclass that answers requests
+    state = {} # server attributes each test starts with, by name, made by calling their factory
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        for name, factory in self.state.items():
+            setattr(self.server, name, factory())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,198 @@
+#
+# Tests for splunklib.aio. splunkd is replaced by a local stand-in server that
+# answers the login, search job, results and receivers/simple endpoints, and
+# counts the connections it accepts.
+#
+
+import asyncio
+import json
+import unittest
+
+from urllib.parse import parse_qs, urlsplit
+
+from splunklib import aio
+from splunklib.binding import AuthenticationError, HTTPError
+from standin_server import StandInHandler, StandInServerTestCase
+
+RESULTS = [{"n": str(i)} for i in range(25)]
+
+class StandInSplunkd(StandInHandler):
+
+    def reply(self, status, body, content_type="application/json", chunked=False):
+        if not chunked:
+            return StandInHandler.reply(self, status, body, content_type)
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(body), 7):
+            piece = body[i:i + 7]
+            self.wfile.write(b"%x;ext=1\r\n%s\r\n" % (len(piece), piece))
+        self.wfile.write(b"0\r\nX-Trailer: 1\r\n\r\n")
+
+    def dropped(self):
+        # Whether the connection is closed without an answer, as an idle one splunkd timed out is
+        if self.server.drops:
+            self.server.drops -= 1
+            self.close_connection = True
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        self.server.requests.append(("GET", url.path, query, self.headers.get("Authorization")))
+        if self.dropped():
+            return
+        if self.headers.get("Authorization") != "Splunk session-key":
+            self.reply(401, "<response><messages><msg type='WARN'>call not properly authenticated</msg></messages></response>",
+                       "text/xml")
+        elif url.path == "/services/search/jobs/1234":
+            self.server.polls += 1
+            done = self.server.polls >= 3
+            entry = {"entry": [{"content": {"isDone": done, "dispatchState": "DONE" if done else "RUNNING"}}]}
+            self.reply(200, json.dumps(entry))
+        elif url.path == "/services/search/jobs/1234/results":
+            offset, count = int(query["offset"][0]), int(query["count"][0])
+            self.reply(200, json.dumps({"preview": False, "results": RESULTS[offset:offset + count]}))
+        elif url.path == "/services/chunked":
+            self.reply(200, "a chunked response body, sent in many small chunks", "text/plain", chunked=True)
+        else:
+            self.reply(404, "<response><messages><msg type='ERROR'>Not Found</msg></messages></response>",
+                       "text/xml")
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        body = self.read_body()
+        self.server.requests.append(("POST", path, body, self.headers.get("Content-Encoding")))
+        if self.dropped():
+            return
+        if path == "/services/auth/login":
+            self.server.logins += 1
+            self.reply(200, "<response><sessionKey>session-key</sessionKey></response>", "text/xml")
+        elif path == "/services/search/jobs":
+            self.reply(201, json.dumps({"sid": "1234"}))
+        elif path == "/services/receivers/simple":
+            self.reply(200, "<response><results><result><index>main</index></result></results></response>",
+                       "text/xml")
+        else:
+            self.reply(404, "<response><messages><msg type='ERROR'>Not Found</msg></messages></response>",
+                       "text/xml")
+
+class TestAsyncService(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"logins": int, "polls": int, "requests": list, "drops": int}
+
+    def run_with_service(self, test, **kwargs):
+        async def main():
+            service = aio.AsyncService(scheme="http", host="127.0.0.1", port=self.server.server_port,
+                                       username="admin", password="changed", autologin=True, **kwargs)
+            try:
+                return await test(service)
+            finally:
+                await service.close()
+        return asyncio.run(main())
+
+    def testHttpLibIsAsync(self):
+        service = aio.AsyncService(scheme="http", host="127.0.0.1", port=self.server.server_port)
+        self.assertIsInstance(service.http, aio.AsyncHttpLib)
+        self.assertTrue(hasattr(service.http.handler, "pool"))
+
+    def testConnectionIsReused(self):
+        async def test(service):
+            await service.login()
+            for i in range(5):
+                response = await service.get("search/jobs/1234")
+                await response.body.read()
+        self.run_with_service(test)
+
+        self.assertEqual(self.server.logins, 1)
+        self.assertEqual(self.server.connections, 1)
+
+    def testChunkedBody(self):
+        async def test(service):
+            await service.login()
+            response = await service.get("chunked")
+            body = await response.body.read()
+            response = await service.get("chunked") # the connection is reused after the trailers
+            blocks = [block async for block in response.body]
+            return body, b"".join(blocks)
+        body, iterated = self.run_with_service(test)
+
+        self.assertEqual(body, b"a chunked response body, sent in many small chunks")
+        self.assertEqual(iterated, body)
+        self.assertEqual(self.server.connections, 1)
+
+    def testGzipBody(self):
+        async def test(service):
+            await service.index("main").submit("event\n" * 1000, sourcetype="st", compression="gzip")
+        self.run_with_service(test)
+
+        method, path, body, encoding = self.server.requests[-1]
+        self.assertEqual(path, "/services/receivers/simple")
+        self.assertEqual(encoding, "gzip")
+        self.assertEqual(body, b"event\n" * 1000)
+
+    def testErrorStatus(self):
+        async def test(service):
+            await service.login()
+            try:
+                await service.get("no/such/endpoint")
+            except HTTPError as he:
+                return he.status, str(he)
+            response = await service.get("search/jobs/1234") # the connection is still usable
+            await response.body.read()
+        status, message = self.run_with_service(test)
+
+        self.assertEqual(status, 404)
+        self.assertIn("Not Found", message)
+        self.assertEqual(self.server.connections, 1)
+
+    def testDroppedGetIsSentAgainOnce(self):
+        async def test(service):
+            await service.login()
+            self.server.drops = 1
+            response = await service.get("search/jobs/1234")
+            await response.body.read()
+            self.server.drops = 2
+            await service.get("search/jobs/1234")
+        self.assertRaises((ConnectionError, asyncio.IncompleteReadError), self.run_with_service, test)
+
+        gets = [path for method, path, query, auth in self.server.requests if method == "GET"]
+        self.assertEqual(gets, ["/services/search/jobs/1234"] * 4)
+
+    def testDroppedPostIsNotSentAgain(self):
+        async def test(service):
+            await service.login()
+            self.server.drops = 1
+            await service.index("main").submit("event\n", sourcetype="st")
+        self.assertRaises((ConnectionError, asyncio.IncompleteReadError), self.run_with_service, test)
+
+        posts = [path for method, path, body, encoding in self.server.requests if method == "POST"]
+        self.assertEqual(posts, ["/services/auth/login", "/services/receivers/simple"])
+
+    def testFailedLogin(self):
+        async def test(service):
+            service.token = "Splunk wrong-key"
+            service.autologin = False
+            await service.get("search/jobs/1234")
+        self.assertRaises(AuthenticationError, self.run_with_service, test)
+
+    def testJobIsWaitedForAndPaged(self):
+        async def test(service):
+            job = await service.jobs.create("search *")
+            done = await job.wait(min_interval=0.01, max_interval=0.01)
+            return job.sid, done, [result async for result in job.results(pagesize=10)]
+        sid, done, results = self.run_with_service(test)
+
+        self.assertEqual(sid, "1234")
+        self.assertTrue(done)
+        self.assertEqual(self.server.polls, 3)
+        self.assertEqual(results, RESULTS)
+        pages = [(query["offset"][0], query["count"][0]) for method, path, query, auth in self.server.requests
+                 if path == "/services/search/jobs/1234/results"]
+        self.assertEqual(pages, [("0", "10"), ("10", "10"), ("20", "10")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#
+# Tests for the keep-alive connection pool of splunklib.binding. splunkd is
+# replaced by a local stand-in server that closes each connection after one
+# response while still announcing it as kept alive, the way an idle keep-alive
+# connection looks once splunkd has timed it out, or by one that keeps its
+# connections alive and counts them.
+#
+
+import unittest
+
+from splunklib import binding, client
+from standin_server import StandInHandler, StandInServerTestCase
+
+class StandInSplunkd(StandInHandler):
+
+    def handle_request(self):
+        self.server.received.append((self.command, self.path, self.read_body()))
+        self.reply(200, b"ok")
+        self.close_connection = True # without Connection: close, so the client keeps it
+
+    do_GET = do_POST = do_DELETE = handle_request
+
+class TestPooledHandler(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"received": list}
+
+    def setUp(self):
+        StandInServerTestCase.setUp(self)
+        self.url += "/services/receivers/simple"
+        self.pooled = binding.pooled_handler(timeout=5)
+
+    def tearDown(self):
+        self.pooled.pool.clear()
+        StandInServerTestCase.tearDown(self)
+
+    def send(self, method, body=""):
+        response = self.pooled(self.url, {"method": method, "headers": [], "body": body})
+        return response["body"].read()
+
+    def testIdempotentRequestIsSentAgain(self):
+        self.assertEqual(self.send("GET"), b"ok")
+        self.assertEqual(self.send("GET"), b"ok") # the pooled connection was closed by the server
+        self.assertEqual([command for command, path, body in self.server.received], ["GET", "GET"])
+
+    def testPostIsNotSentAgain(self):
+        self.assertEqual(self.send("GET"), b"ok")
+        self.assertRaises(Exception, self.send, "POST", "event")
+        self.assertEqual([command for command, path, body in self.server.received], ["GET"])
+
+    def testResendRules(self):
+        http_client = binding.six.moves.http_client
+        self.assertTrue(binding._can_resend("GET", http_client.BadStatusLine("")))
+        self.assertTrue(binding._can_resend("delete", binding.socket.error()))
+        self.assertFalse(binding._can_resend("POST", http_client.BadStatusLine("")))
+        self.assertTrue(binding._can_resend("POST", http_client.CannotSendRequest()))
+        self.assertFalse(binding._can_resend("GET", binding.socket.timeout()))
+        self.assertFalse(binding._can_resend("GET", ValueError()))
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:s="http://dev.splunk.com/ns/rest">
+  <entry>
+    <title>main</title>
+    <link href="/services/data/indexes/main" rel="alternate"/>
+    <content type="text/xml"><s:dict><s:key name="disabled">0</s:key></s:dict></content>
+  </entry>
+</feed>
+"""
+
+class KeptAliveSplunkd(StandInHandler):
+
+    def handle_request(self):
+        self.server.received.append((self.command, self.path.split("?", 1)[0], self.read_body()))
+        if self.command == "GET":
+            self.reply(200, INDEX, "text/xml")
+        else:
+            self.reply(200, "<response><results><result><index>main</index></result></results></response>", "text/xml")
+
+    do_GET = do_POST = handle_request
+
+class TestConnectionReuse(StandInServerTestCase):
+    handler = KeptAliveSplunkd
+    state = {"received": list}
+
+    def testSubmitsShareOneConnection(self):
+        service = client.Service(scheme="http", host="127.0.0.1", port=self.server.server_port,
+                                 token="Splunk session-key", pool_size=2)
+        index = service.indexes["main"]
+        for i in range(5):
+            index.submit("event %d" % i, sourcetype="st")
+        service.http.handler.pool.clear()
+        self.assertEqual([path for command, path, body in self.server.received if command == "POST"],
+                         ["/services/receivers/simple"] * 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def testUnreadResponseReleasesItsConnection(self):
+        pooled = binding.pooled_handler(timeout=5)
+        for i in range(3):
+            response = pooled(self.url + "/services/receivers/simple", {"method": "POST", "headers": [], "body": "x"})
+            self.assertEqual(response["status"], 200)
+            del response # closed unread when it is collected
+        pooled.pool.clear()
+        self.assertEqual(self.server.connections, 1)
+
+if __name__ == '__main__':
+    unittest.main()
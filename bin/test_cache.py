@@ -0,0 +1,126 @@
+#
+# Tests for the entity cache of splunklib.client.Service. splunkd is replaced
+# by a local stand-in server that serves a saved searches listing and counts
+# the requests it receives.
+#
+
+import unittest
+
+from splunklib import client
+from splunklib.cache import EntityCache
+from standin_server import StandInHandler, StandInServerTestCase
+
+FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:s="http://dev.splunk.com/ns/rest"
+      xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+  <title>savedsearches</title>
+  <opensearch:totalResults>1</opensearch:totalResults>
+  <entry>
+    <title>errors</title>
+    <id>https://127.0.0.1/servicesNS/nobody/search/saved/searches/errors</id>
+    <link href="/servicesNS/nobody/search/saved/searches/errors" rel="alternate"/>
+    <content type="text/xml">
+      <s:dict>
+        <s:key name="search">index=main error</s:key>
+        <s:key name="eai:acl">
+          <s:dict>
+            <s:key name="app">search</s:key>
+            <s:key name="owner">nobody</s:key>
+            <s:key name="sharing">app</s:key>
+          </s:dict>
+        </s:key>
+      </s:dict>
+    </content>
+  </entry>
+</feed>"""
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestEntityCache(unittest.TestCase):
+
+    def testEntriesExpire(self):
+        clock = Clock()
+        cache = EntityCache(ttl=10, clock=clock)
+        cache.put("key", "saved/searches", "value")
+        clock.now += 9.9
+        self.assertEqual(cache.get("key"), "value")
+        clock.now += 0.1
+        self.assertEqual(cache.get("key"), None)
+        self.assertEqual(len(cache), 0)
+
+    def testLeastRecentlyUsedIsEvicted(self):
+        cache = EntityCache(ttl=10, max_size=2)
+        cache.put("a", "a", 1)
+        cache.put("b", "b", 2)
+        cache.get("a")
+        cache.put("c", "c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 1, "evictions": 1, "size": 2})
+
+    def testRelatedEntriesAreInvalidated(self):
+        cache = EntityCache(ttl=10)
+        for resource in ("saved", "saved/searches", "saved/searches/errors", "saved/searches/other",
+                         "saved/eventtypes", "server/info"):
+            cache.put(resource, resource, resource)
+        cache.invalidate("saved/searches/errors")
+        self.assertEqual(sorted(key for key in ("saved", "saved/searches", "saved/searches/errors",
+                                                "saved/searches/other", "saved/eventtypes", "server/info")
+                                if cache.get(key) is not None),
+                         ["saved/eventtypes", "saved/searches/other", "server/info"])
+
+class StandInSplunkd(StandInHandler):
+
+    def handle_request(self):
+        self.read_body()
+        self.server.requests.append((self.command, self.path.split("?", 1)[0]))
+        self.reply(200, FEED if self.command == "GET" else b"<response/>", "text/xml")
+
+    do_GET = do_POST = do_DELETE = handle_request
+
+class TestServiceCache(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"requests": list}
+
+    def service(self, **kwargs):
+        return client.Service(scheme="http", host="127.0.0.1", port=self.server.server_port,
+                              token="Splunk session-key", owner="nobody", app="search", **kwargs)
+
+    def gets(self):
+        return len([command for command, path in self.server.requests if command == "GET"])
+
+    def testListingIsCached(self):
+        service = self.service(cache_ttl=60)
+        for i in range(3):
+            searches = service.saved_searches.list()
+            self.assertEqual([search.name for search in searches], ["errors"])
+            self.assertEqual(searches[0]["search"], "index=main error")
+        self.assertEqual(self.gets(), 1)
+        self.assertEqual(service.cache.stats()["hits"], 2)
+
+    def testWritesInvalidate(self):
+        service = self.service(cache_ttl=60)
+        service.saved_searches.list()
+        service.post("saved/searches/errors", search="index=main fatal")
+        service.saved_searches.list()
+        self.assertEqual(self.gets(), 2)
+
+        service.delete("saved/searches/errors")
+        service.saved_searches.list()
+        service.saved_searches.list()
+        self.assertEqual(self.gets(), 3)
+
+    def testCacheIsOffByDefault(self):
+        service = self.service()
+        self.assertEqual(service.cache, None)
+        service.saved_searches.list()
+        service.saved_searches.list()
+        self.assertEqual(self.gets(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#
+# Tests for the Atom feed loading of splunklib.data: load_entries must yield
+# the same records load(text).feed.entry holds, one entry at a time.
+#
+
+import io
+import unittest
+
+from splunklib import data
+
+FEED = u"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:s="http://dev.splunk.com/ns/rest"
+      xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+  <title>savedsearch</title>
+  <opensearch:totalResults>2</opensearch:totalResults>
+  <entry>
+    <title>errors</title>
+    <link href="/servicesNS/nobody/search/saved/searches/errors" rel="alternate"/>
+    <link href="/servicesNS/nobody/search/saved/searches/errors" rel="edit"/>
+    <content type="text/xml">
+      <s:dict>
+        <s:key name="search">index=main error</s:key>
+        <s:key name="empty"></s:key>
+        <s:key name="action.email.to">ops@example.com</s:key>
+        <s:key name="eai:acl">
+          <s:dict>
+            <s:key name="owner">nobody</s:key>
+            <s:key name="perms">
+              <s:dict>
+                <s:key name="read"><s:list><s:item>*</s:item></s:list></s:key>
+                <s:key name="write"><s:list><s:item>admin</s:item><s:item>power</s:item></s:list></s:key>
+              </s:dict>
+            </s:key>
+          </s:dict>
+        </s:key>
+      </s:dict>
+    </content>
+  </entry>
+  <entry>
+    <title>café</title>
+    <link href="/servicesNS/nobody/search/saved/searches/caf%C3%A9" rel="alternate"/>
+    <content type="text/xml"><s:dict><s:key name="search">&lt;&amp;&gt;</s:key></s:dict></content>
+  </entry>
+</feed>
+"""
+
+ENTRIES = [
+    {"title": "errors",
+     "link": [{"href": "/servicesNS/nobody/search/saved/searches/errors", "rel": "alternate"},
+              {"href": "/servicesNS/nobody/search/saved/searches/errors", "rel": "edit"}],
+     "content": {"type": "text/xml", "search": "index=main error", "empty": None,
+                 "action.email.to": "ops@example.com",
+                 "eai:acl": {"owner": "nobody", "perms": {"read": ["*"], "write": ["admin", "power"]}}}},
+    {"title": u"café",
+     "link": {"href": "/servicesNS/nobody/search/saved/searches/caf%C3%A9", "rel": "alternate"},
+     "content": {"type": "text/xml", "search": "<&>"}},
+]
+
+JOB = b"""<?xml version="1.0" encoding="UTF-8"?>
+<entry xmlns="http://www.w3.org/2005/Atom" xmlns:s="http://dev.splunk.com/ns/rest">
+  <title>search *</title>
+  <link href="/services/search/jobs/1234" rel="alternate"/>
+  <content type="text/xml">
+    <s:dict>
+      <s:key name="isDone">1</s:key>
+      <s:key name="messages"><s:dict/></s:key>
+      <s:key name="request"><s:dict><s:key name="search">search *</s:key></s:dict></s:key>
+    </s:dict>
+  </content>
+</entry>
+"""
+
+class TestLoadEntries(unittest.TestCase):
+
+    def testEntriesAreLoadedAsBefore(self):
+        entries = list(data.load_entries(io.BytesIO(FEED.encode("utf-8"))))
+        self.assertEqual(entries, ENTRIES)
+        self.assertEqual(data.load(FEED).feed.entry, ENTRIES)
+
+        self.assertEqual(entries[0].content.search, "index=main error")
+        self.assertEqual(entries[0].content["eai:acl"].perms.write, ["admin", "power"])
+        self.assertEqual(entries[0].content.action.email.to, "ops@example.com")
+
+    def testFieldsAreFiltered(self):
+        entries = list(data.load_entries(io.BytesIO(FEED.encode("utf-8")), fields=["empty"]))
+        self.assertEqual([sorted(entry.content) for entry in entries],
+                         [["eai:acl", "empty", "type"], ["type"]])
+        self.assertEqual(entries[0].content["eai:acl"], ENTRIES[0]["content"]["eai:acl"])
+
+    def testLoneEntry(self):
+        entries = list(data.load_entries(io.BytesIO(JOB)))
+        self.assertEqual(entries, [data.load(JOB.decode("utf-8")).entry])
+        self.assertEqual(entries[0].content, {"type": "text/xml", "isDone": "1", "messages": {},
+                                              "request": {"search": "search *"}})
+
+    def testEmptyFeed(self):
+        empty = FEED.replace("<opensearch:totalResults>2", "<opensearch:totalResults>0")
+        self.assertEqual(list(data.load_entries(io.BytesIO(empty.encode("utf-8")))), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#
+# Tests for the modular input event writers. The receivers/stream socket and
+# the HTTP Event Collector are replaced by stand-ins that record what they
+# receive and can be made to fail.
+#
+
+import io
+import json
+import time
+import unittest
+import xml.etree.ElementTree as ET
+
+from splunklib.binding import HTTPError
+from splunklib.modularinput import Event, EventWriter, HecEventWriter, StreamEventWriter
+from standin_server import StandInHandler, StandInServerTestCase
+
+def element_xml(event):
+    # The markup Event.write_to wrote when it built an ElementTree element.
+    element = ET.Element("event")
+    if event.stanza is not None:
+        element.set("stanza", event.stanza)
+    element.set("unbroken", str(int(event.unbroken)))
+    if event.time is not None:
+        ET.SubElement(element, "time").text = str(event.time)
+    for node, value in (("source", event.source), ("sourcetype", event.sourceType),
+                        ("index", event.index), ("host", event.host), ("data", event.data)):
+        if value is not None:
+            ET.SubElement(element, node).text = value
+    if event.done:
+        ET.SubElement(element, "done")
+    return ET.tostring(element)
+
+class FailingOutput(io.StringIO):
+    failures = 0
+
+    def write(self, text):
+        if self.failures:
+            self.failures -= 1
+            raise IOError("stand-in write failure")
+        return io.StringIO.write(self, text)
+
+class TestEventWriter(unittest.TestCase):
+
+    def testMarkupIsUnchanged(self):
+        events = [
+            Event(data="plain"),
+            Event(data='a < b & "c" > d', stanza='in"put\n\t\r<1>', time="1372187084.000", host="h",
+                  index="main", source="s&s", sourcetype="st", done=False, unbroken=False),
+            Event(data=u"café 日本 \U0001F600", host=""),
+            Event(data="", time=1.5),
+        ]
+        for event in events:
+            stream = io.BytesIO()
+            event.write_to(stream)
+            self.assertEqual(stream.getvalue(), element_xml(event))
+
+    def testEventsAreBuffered(self):
+        output = io.StringIO()
+        writer = EventWriter(output=output, buffer_size=1000, flush_interval=60)
+        writer.write_event(Event(data="one"))
+        writer.write_event(Event(data="two"))
+        self.assertEqual(output.getvalue(), "")
+
+        writer.close()
+        self.assertEqual(output.getvalue(),
+                         '<stream><event unbroken="1"><data>one</data><done /></event>'
+                         '<event unbroken="1"><data>two</data><done /></event></stream>')
+
+    def testBufferIsWrittenWhenFull(self):
+        output = io.StringIO()
+        writer = EventWriter(output=output, buffer_size=100, flush_interval=60)
+        for i in range(5):
+            writer.write_event(Event(data="event %d" % i))
+        self.assertEqual(output.getvalue().count("<event "), 4) # two flushes of two events
+        writer.close()
+        self.assertEqual(output.getvalue().count("<event "), 5)
+
+    def testFailedFlushKeepsEvents(self):
+        output = FailingOutput()
+        output.failures = 1
+        writer = EventWriter(output=output, buffer_size=1000, flush_interval=60)
+        writer.write_event(Event(data="kept"))
+
+        self.assertRaises(IOError, writer.flush)
+        writer.flush()
+        self.assertEqual(output.getvalue(), '<stream><event unbroken="1"><data>kept</data><done /></event>')
+
+    def testFailedTimerFlushIsRaised(self):
+        output = FailingOutput()
+        output.failures = 1
+        writer = EventWriter(output=output, buffer_size=1000, flush_interval=0.01)
+        writer.write_event(Event(data="kept"))
+        time.sleep(0.2)
+
+        self.assertRaises(IOError, writer.write_event, Event(data="refused"))
+        writer.write_event(Event(data="next"))
+        writer.close()
+        self.assertEqual(output.getvalue(),
+                         '<stream><event unbroken="1"><data>kept</data><done /></event>'
+                         '<event unbroken="1"><data>next</data><done /></event></stream>')
+
+class StandInSocket(object):
+
+    def __init__(self, index):
+        self.index = index
+
+    def sendall(self, data):
+        if self.index.failures:
+            self.index.failures -= 1
+            raise IOError("stand-in socket failure")
+        self.index.received.append(data)
+
+    def close(self):
+        self.index.closed += 1
+
+class StandInIndex(object):
+
+    def __init__(self):
+        self.received = []
+        self.attached = []
+        self.failures = 0
+        self.closed = 0
+
+    def attach(self, **kwargs):
+        self.attached.append(kwargs)
+        return StandInSocket(self)
+
+class TestStreamEventWriter(unittest.TestCase):
+
+    def testDataIsSentOnOneSocket(self):
+        index = StandInIndex()
+        writer = StreamEventWriter(index, buffer_size=1000, sourcetype="st")
+        for i in range(3):
+            writer.write_event(Event(data="event %d" % i))
+        writer.close()
+
+        self.assertEqual(index.attached, [{"sourcetype": "st"}])
+        self.assertEqual(index.received, [b"event 0\nevent 1\nevent 2\n"])
+        self.assertEqual(index.closed, 1)
+
+    def testFailedSocketIsReplaced(self):
+        index = StandInIndex()
+        index.failures = 1
+        writer = StreamEventWriter(index, buffer_size=1000)
+        writer.write_event(Event(data="kept"))
+
+        self.assertRaises(IOError, writer.flush)
+        self.assertEqual(index.closed, 1)
+        writer.close()
+        self.assertEqual(len(index.attached), 2)
+        self.assertEqual(index.received, [b"kept\n"])
+
+class StandInCollector(StandInHandler):
+    status = 200
+
+    def do_POST(self):
+        body = self.read_body()
+        if self.status == 200:
+            self.server.received.append(body.decode("utf-8"))
+        reply = '{"text":"Success","code":0}' if self.status == 200 else '{"text":"Invalid token","code":4}'
+        self.reply(self.status, reply, "application/json")
+
+class TestHecEventWriter(StandInServerTestCase):
+    handler = StandInCollector
+    state = {"received": list}
+
+    def setUp(self):
+        StandInCollector.status = 200
+        StandInServerTestCase.setUp(self)
+
+    def testEventsArePostedTogether(self):
+        writer = HecEventWriter(self.url, "token", buffer_size=100000)
+        writer.write_event(Event(data="one", time="1.5", host="h", index="main"))
+        writer.write_event(Event(data="two", sourcetype="st"))
+        writer.close()
+
+        self.assertEqual(len(self.server.received), 1)
+        events = [json.loads(line) for line in self.server.received[0].splitlines()]
+        self.assertEqual(events, [{"event": "one", "time": 1.5, "host": "h", "index": "main"},
+                                  {"event": "two", "sourcetype": "st"}])
+
+    def testRejectedEventsAreKept(self):
+        StandInCollector.status = 403
+        writer = HecEventWriter(self.url, "token", buffer_size=100000)
+        writer.write_event(Event(data="kept"))
+        self.assertRaises(HTTPError, writer.flush)
+
+        StandInCollector.status = 200
+        writer.close()
+        self.assertEqual([json.loads(body) for body in self.server.received], [{"event": "kept"}])
+
+if __name__ == '__main__':
+    unittest.main()
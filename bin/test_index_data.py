@@ -0,0 +1,217 @@
+#
+# Tests for how indexdata sends its batches: the async mode's BackgroundIndexer
+# with a stand-in sink that records, holds back or fails the batches it is given,
+# and the connection context, with a local stand-in for splunkd.
+#
+
+import tempfile
+import threading
+import unittest
+
+from index_data import Actions, BackgroundIndexer
+from index_data_sinks import SimpleSink
+from index_data_spool import Spool
+from standin_server import StandInHandler, StandInServerTestCase
+
+class StandInSink:
+    spool_name = "receivers"
+
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def send(self, lines):
+        self.release.wait(5)
+        if self.fail:
+            raise IOError("splunkd is not answering")
+        self.sent.append(lines)
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+class BrokenSink(StandInSink):
+
+    def __init__(self):
+        StandInSink.__init__(self, fail=True)
+
+    def reset(self): # so that splunk_push_batch itself raises
+        raise OSError("socket already closed")
+
+class FullSpool(Spool):
+
+    def append(self, lines):
+        raise OSError(28, "No space left on device")
+
+def async_actions(sink, workers=1, queue_size=2):
+    actions = Actions()
+    actions.batch_mode = "async"
+    actions.workers, actions.queue_size = workers, queue_size
+    actions.sink = sink
+    return actions
+
+class TestBackgroundIndexer(unittest.TestCase):
+
+    def testBatchesAreSentInOrder(self):
+        sink = StandInSink()
+        indexer = BackgroundIndexer(async_actions(sink))
+        for i in range(20):
+            indexer.put(["event %d" % i])
+        indexer.close()
+        self.assertEqual(sink.sent, [["event %d" % i] for i in range(20)])
+
+    def testFullQueueBlocks(self):
+        sink = StandInSink()
+        sink.release.clear()
+        indexer = BackgroundIndexer(async_actions(sink, queue_size=2))
+        for i in range(3): # one taken by the worker, which is held back, and two queued
+            indexer.put(["event %d" % i])
+        put = threading.Thread(target=indexer.put, args=(["event 3"],))
+        put.start()
+        put.join(0.2)
+        self.assertTrue(put.is_alive())
+
+        sink.release.set()
+        put.join(5)
+        self.assertFalse(put.is_alive())
+        indexer.close()
+        self.assertEqual(len(sink.sent), 4)
+
+    def testCloseDrainsTheQueue(self):
+        sink = StandInSink()
+        sink.release.clear()
+        indexer = BackgroundIndexer(async_actions(sink, workers=3, queue_size=8))
+        for i in range(10):
+            indexer.put(["event %d" % i, "event %d" % i])
+        sink.release.set()
+        indexer.close()
+        self.assertEqual(sorted(sink.sent), sorted(["event %d" % i] * 2 for i in range(10)))
+        self.assertFalse(any(thread.is_alive() for thread in indexer.threads))
+
+    def testFailedBatchesKeepWorkersAlive(self):
+        indexing = async_actions(BrokenSink(), workers=2, queue_size=1)
+        indexing.spool = None
+        indexer = BackgroundIndexer(indexing)
+
+        def index():
+            for i in range(6):
+                indexer.put(["event"] * 3)
+            indexer.close()
+        thread = threading.Thread(target=index, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((indexing.indexed_count, indexing.failed_count), (0, 18))
+
+    def testUnspooledBatchIsFailed(self):
+        with tempfile.TemporaryDirectory() as spool_dir:
+            indexing = async_actions(StandInSink(fail=True))
+            indexing.spool = FullSpool(spool_dir)
+            status = indexing.splunk_push_batch(["event"] * 4)
+            self.assertIn("No space left on device", status)
+            self.assertEqual((indexing.failed_count, indexing.spooled_count), (4, 0))
+            self.assertIn("No space left on device", indexing.splunk_push_batch(["event"])) # backing off
+            indexing.spool.close()
+        self.assertEqual(indexing.failed_count, 5)
+
+INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:s="http://dev.splunk.com/ns/rest">
+  <entry>
+    <title>%(name)s</title>
+    <link href="/services/data/indexes/%(name)s" rel="alternate"/>
+    <content type="text/xml"><s:dict><s:key name="disabled">0</s:key></s:dict></content>
+  </entry>
+</feed>
+"""
+
+class StandInSplunkd(StandInHandler):
+
+    def do_GET(self): # looks up an index
+        path = self.path.split("?", 1)[0]
+        self.server.received.append((self.command, path, self.headers["Authorization"]))
+        self.reply(200, INDEX % {"name": path.rsplit("/", 1)[1]}, "text/xml")
+
+    def do_POST(self): # submits a batch to receivers/simple
+        self.read_body()
+        self.server.received.append((self.command, self.path.split("?", 1)[0], self.headers["Authorization"]))
+        if self.server.failing:
+            self.reply(503, "<response><messages><msg type=\"ERROR\">busy</msg></messages></response>", "text/xml")
+        else:
+            self.reply(200, "<response><results><result><index>main</index></result></results></response>", "text/xml")
+
+class TestConnectionContext(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"received": list, "failing": bool}
+
+    def setUp(self):
+        StandInServerTestCase.setUp(self)
+        self.actions = Actions()
+        self.actions.s_scheme, self.actions.s_host, self.actions.s_port = "http", "127.0.0.1", self.server.server_port
+        self.actions.index, self.actions.token = "main", "Splunk first-session"
+        self.actions.sink = SimpleSink(self.actions)
+
+    def tearDown(self):
+        if self.actions.service is not None:
+            self.actions.service.http.handler.pool.clear()
+        StandInServerTestCase.tearDown(self)
+
+    def push(self, count=1):
+        return [self.actions.splunk_push_batch(["event"]) for i in range(count)]
+
+    def lookups(self):
+        return [(path, token) for command, path, token in self.server.received if command == "GET"]
+
+    def testTargetIsReused(self):
+        self.assertEqual(self.push(5), [True] * 5)
+        self.assertEqual(self.lookups(), [("/services/data/indexes/main", "Splunk first-session")])
+        self.assertEqual(len([command for command, path, token in self.server.received if command == "POST"]), 5)
+        self.assertEqual(self.actions.rest_calls_saved, 4)
+
+    def testTargetIsReloadedAfterRefreshInterval(self):
+        self.push()
+        service = self.actions.service
+        self.actions.target_loaded -= self.actions.refresh_interval + 1
+        self.push()
+        self.assertEqual(len(self.lookups()), 2)
+        self.assertIs(self.actions.service, service) # the same session, only the index is looked up again
+        self.assertEqual(self.actions.rest_calls_saved, 0)
+
+        self.actions.refresh_interval = 0 # kept forever
+        self.actions.target_loaded = 0
+        self.push()
+        self.assertEqual(len(self.lookups()), 2)
+        self.assertEqual(self.actions.rest_calls_saved, 1)
+
+    def testTargetIsReloadedForAnotherSession(self):
+        self.push(2)
+        service = self.actions.service
+        self.actions.token = "Splunk second-session"
+        self.push(2)
+        self.assertEqual(self.lookups(), [("/services/data/indexes/main", "Splunk first-session"),
+                                          ("/services/data/indexes/main", "Splunk second-session")])
+        self.assertIsNot(self.actions.service, service)
+        self.assertEqual([token for command, path, token in self.server.received if command == "POST"][-1],
+                         "Splunk second-session")
+        self.assertEqual(self.actions.rest_calls_saved, 2)
+        service.http.handler.pool.clear()
+
+    def testTargetIsDroppedAfterFailedSend(self):
+        self.actions.spool = None
+        self.push()
+        self.server.failing = True
+        status = self.push()[0]
+        self.assertTrue(status.startswith("Event not indexed."), status)
+        self.assertEqual((self.actions.service, self.actions.session_key, self.actions.target), (None, None, None))
+
+        self.server.failing = False
+        self.assertEqual(self.push(2), [True, True])
+        self.assertEqual(len(self.lookups()), 2)
+        self.assertEqual(self.actions.rest_calls_saved, 2)
+        self.assertEqual((self.actions.indexed_count, self.actions.failed_count), (3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
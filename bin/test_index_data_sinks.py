@@ -0,0 +1,108 @@
+#
+# Tests for the indexdata sinks. The HTTP Event Collector is replaced by a local
+# stand-in server that records every request it receives.
+#
+
+import json
+import os
+import tempfile
+import unittest
+
+from index_data import Actions
+from index_data_sinks import SINKS, Sink
+from standin_server import StandInHandler, StandInServerTestCase
+
+class StandInCollector(StandInHandler):
+    status = 200
+
+    def do_POST(self):
+        body = self.read_body()
+        self.server.received.append((self.path, dict(self.headers), body.decode('utf-8')))
+        reply = '{"text":"Success","code":0}' if self.status == 200 else '{"text":"Invalid token","code":4}'
+        self.reply(self.status, reply, "application/json")
+
+class TestHecSink(StandInServerTestCase):
+    handler = StandInCollector
+    state = {"received": list}
+
+    def setUp(self):
+        StandInCollector.status = 200
+        StandInServerTestCase.setUp(self)
+        self.spool_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        StandInServerTestCase.tearDown(self)
+        self.spool_dir.cleanup()
+
+    def index(self, count, **options):
+        actions = Actions()
+        actions.spool_dir = self.spool_dir.name
+        options.setdefault("hec_token", "00000000-0000-0000-0000-000000000000")
+        actions.configure(dict(options, sink="hec", hec_url=self.url))
+        return list(actions.index_results({"field": str(i)} for i in range(count)))
+
+    def testBatchIsOneCompressedRequest(self):
+        results = self.index(30)
+
+        self.assertEqual(len(self.server.received), 1)
+        path, headers, body = self.server.received[0]
+        self.assertEqual(path, "/services/collector/event")
+        self.assertEqual(headers["Authorization"], "Splunk 00000000-0000-0000-0000-000000000000")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+
+        events = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([event["event"]["field"] for event in events], [str(i) for i in range(30)])
+        for event in events:
+            self.assertEqual(event["index"], "custom_search_index_data_idx")
+            self.assertEqual(event["sourcetype"], "custom_json")
+            self.assertEqual(event["time"], event["event"]["timestamp"])
+        self.assertEqual([result["is_indexed"] for result in results], ["True"] * 30)
+
+    def testSmallBatchIsNotCompressed(self):
+        self.index(1)
+
+        self.assertEqual(len(self.server.received), 1)
+        self.assertNotIn("Content-Encoding", self.server.received[0][1])
+
+    def testBatchLimits(self):
+        self.index(50, batch_size="20", hec_gzip="false")
+
+        self.assertEqual(len(self.server.received), 3)
+        self.assertNotIn("Content-Encoding", self.server.received[0][1])
+        self.assertEqual([len(body.splitlines()) for path, headers, body in self.server.received], [20, 20, 10])
+
+    def testRejectedBatch(self):
+        StandInCollector.status = 403
+        results = self.index(2)
+
+        for result in results:
+            self.assertTrue(result["is_indexed"].startswith("Event not indexed."))
+            self.assertTrue(result["is_indexed"].endswith("Spooled for retry."))
+
+    def testSpooledBatchIsReplayed(self):
+        StandInCollector.status = 403
+        self.index(2)
+        spool = os.path.join(self.spool_dir.name, "hec")
+        self.assertEqual(len([entry for entry in os.listdir(spool) if entry.endswith(".spool")]), 1)
+
+        StandInCollector.status = 200
+        with open(os.path.join(spool, "state.json"), "w") as f:
+            json.dump({"attempts": 0, "next_attempt": 0}, f) # skip the backoff
+        self.index(1)
+
+        bodies = [body for path, headers, body in self.server.received[-2:]]
+        self.assertEqual([json.loads(line)["event"]["field"] for line in bodies[1].splitlines()], ["0", "1"])
+        self.assertEqual([entry for entry in os.listdir(spool) if entry.endswith(".spool")], [])
+
+    def testTokenIsRequired(self):
+        actions = Actions()
+        self.assertRaises(ValueError, actions.configure, {"sink": "hec"})
+
+class TestSink(unittest.TestCase):
+
+    def testSendIsRequired(self):
+        self.assertRaises(TypeError, Sink, Actions())
+        self.assertEqual([name for name, sink in SINKS.items() if sink.__abstractmethods__], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#
+# Tests for the on-disk spool of batches indexdata could not index. Sends go
+# to a stand-in that records the batches it is given.
+#
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from index_data_spool import Spool
+
+class StandInSink:
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, lines):
+        self.sent.append(lines)
+
+class TestSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.path = self.spool_dir.name
+
+    def tearDown(self):
+        self.spool_dir.cleanup()
+
+    def files(self, suffix):
+        return sorted(entry for entry in os.listdir(self.path) if entry.endswith(suffix))
+
+    def records(self, entry):
+        with open(os.path.join(self.path, entry), "rb") as f:
+            return [json.loads(record) for record in f]
+
+    def testSegmentsAreRotated(self):
+        spool = Spool(self.path, max_segment_bytes=30)
+        for i in range(5):
+            spool.append(["batch %d" % i])
+        self.assertEqual(len(self.files(".spool")), 1) # 12 bytes a batch, so three batches a segment
+        self.assertEqual(len(self.files(".open")), 1)
+
+        spool.close()
+        self.assertEqual(self.files(".open"), [])
+        self.assertEqual([self.records(entry) for entry in self.files(".spool")],
+                         [[["batch 0"], ["batch 1"], ["batch 2"]], [["batch 3"], ["batch 4"]]])
+
+    def testBatchesAreSyncedInGroups(self):
+        spool = Spool(self.path, fsync_every=3)
+        with mock.patch("index_data_spool.os.fsync") as fsync:
+            for i in range(7):
+                spool.append(["batch %d" % i])
+            self.assertEqual(fsync.call_count, 2)
+            spool.close()
+            self.assertEqual(fsync.call_count, 3)
+
+    def testReplaySendsBatchesInOrder(self):
+        spool = Spool(self.path, max_segment_bytes=30)
+        for i in range(5):
+            spool.append(["batch %d" % i])
+        sink = StandInSink()
+
+        self.assertEqual(spool.replay(sink.send), 5)
+        self.assertEqual(sink.sent, [["batch %d" % i] for i in range(5)])
+        self.assertEqual(os.listdir(self.path), [])
+
+    def testFailedReplayPutsBatchesBack(self):
+        spool = Spool(self.path, max_segment_bytes=30)
+        for i in range(5):
+            spool.append(["batch %d" % i])
+        sink = StandInSink()
+
+        def send(lines): # the first attempt at the second batch fails
+            if lines == ["batch 1"] and ["batch 1"] not in sink.sent:
+                raise IOError("stand-in send failure")
+            sink.send(lines)
+        self.assertEqual(spool.replay(send), 1)
+        self.assertEqual([self.records(entry) for entry in self.files(".spool")],
+                         [[["batch 1"], ["batch 2"]], [["batch 3"], ["batch 4"]]])
+        self.assertEqual(self.files(".replay"), [])
+        self.assertTrue(spool.backing_off())
+
+        self.assertEqual(spool.replay(sink.send), 0) # not before the backoff is over
+        spool.save_state({"attempts": 1, "next_attempt": 0})
+        self.assertEqual(spool.replay(sink.send), 4)
+        self.assertEqual(sink.sent, [["batch %d" % i] for i in range(5)])
+        self.assertEqual(spool.load_state(), {"attempts": 0, "next_attempt": 0})
+
+    def testReplayStopsAtTheBudget(self):
+        spool = Spool(self.path)
+        for i in range(3):
+            spool.append(["batch %d" % i])
+        sink = StandInSink()
+
+        self.assertEqual(spool.replay(sink.send, budget=-1), 0)
+        self.assertEqual([self.records(entry) for entry in self.files(".spool")],
+                         [[["batch 0"], ["batch 1"], ["batch 2"]]])
+        self.assertFalse(spool.backing_off())
+
+    def testStateIsReadOnlyWhenReplaced(self):
+        spool = Spool(self.path)
+        spool.failed()
+        self.assertTrue(spool.backing_off())
+
+        with mock.patch("index_data_spool.open") as opened:
+            for i in range(10):
+                self.assertTrue(spool.backing_off())
+            self.assertEqual(opened.call_count, 0)
+
+        other = Spool(self.path) # another process, such as index_data_replay.py
+        other.succeeded()
+        os.utime(other.state_file, ns=(0, 0)) # an mtime the first spool has not seen, however coarse the clock
+        self.assertFalse(spool.backing_off())
+
+if __name__ == '__main__':
+    unittest.main()
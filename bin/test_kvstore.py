@@ -0,0 +1,102 @@
+#
+# Tests for the batched KV store reads and writes of splunklib.client. splunkd
+# is replaced by a local stand-in server that keeps the documents of one
+# collection and records the requests it receives.
+#
+
+import json
+import unittest
+
+from urllib.parse import parse_qs, urlsplit
+
+from splunklib import client
+from splunklib.binding import HTTPError
+from standin_server import StandInHandler, StandInServerTestCase
+
+class StandInSplunkd(StandInHandler):
+    max_rows = 50000
+    reject_batch = None # the batch_save request the server answers with an error
+
+    def reply(self, status, body):
+        StandInHandler.reply(self, status, json.dumps(body), "application/json")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+        self.server.queries.append(query)
+        documents = sorted(self.server.documents, key=lambda document: document[query.get("sort", "_key")])
+        skip = int(query.get("skip", 0))
+        limit = min(int(query.get("limit", 0)) or self.max_rows, self.max_rows)
+        self.reply(200, documents[skip:skip + limit])
+
+    def do_POST(self):
+        documents = json.loads(self.read_body())
+        with self.server.lock:
+            self.server.batches.append(len(documents))
+            number = len(self.server.batches)
+        if number == self.reject_batch:
+            self.reply(400, {"messages": [{"type": "ERROR", "text": "Document is not valid"}]})
+        else:
+            self.reply(200, [document["_key"] for document in documents])
+
+class StandInCollection(object):
+    name = "items"
+
+    def __init__(self, service):
+        self.service = service
+
+    def _proper_namespace(self):
+        return "nobody", "search", "app"
+
+class TestKVStoreCollectionData(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"documents": list, "queries": list, "batches": list}
+
+    def setUp(self):
+        StandInSplunkd.max_rows = 50000
+        StandInSplunkd.reject_batch = None
+        StandInServerTestCase.setUp(self)
+        service = client.Service(scheme="http", host="127.0.0.1", port=self.server.server_port,
+                                 token="Splunk session-key", pool_size=4)
+        self.data = client.KVStoreCollectionData(StandInCollection(service))
+
+    def testBatchesAreSplitByCount(self):
+        documents = [{"_key": "%03d" % i} for i in range(25)]
+        stats = self.data.bulk_save(iter(documents), batch_size=10, workers=1)
+        self.assertEqual(self.server.batches, [10, 10, 5])
+        self.assertEqual((stats.rows, stats.batches), (25, 3))
+
+    def testBatchesAreSplitByBytes(self):
+        documents = [{"_key": "%03d" % i, "value": "x" * 80} for i in range(10)]
+        size = len(json.dumps(documents[0]))
+        stats = self.data.bulk_save(documents, batch_size=1000, max_batch_bytes=2 + 3 * (size + 1), workers=4)
+        self.assertEqual(sorted(self.server.batches), [1, 3, 3, 3])
+        self.assertEqual((stats.rows, stats.batches), (10, 4))
+
+    def testRejectedBatchStopsTheLoad(self):
+        StandInSplunkd.reject_batch = 2
+        documents = ({"_key": "%03d" % i} for i in range(100))
+        self.assertRaises(HTTPError, self.data.bulk_save, documents, batch_size=10, workers=1)
+        self.assertEqual(self.server.batches, [10, 10])
+
+    def testPagesAreSortedByKey(self):
+        self.server.documents = [{"_key": "%03d" % i, "n": 99 - i} for i in range(25)]
+        documents = list(self.data.iter_query(pagesize=10, prefetch=2))
+        self.assertEqual([document["_key"] for document in documents], ["%03d" % i for i in range(25)])
+        pages = sorted((int(query["skip"]), query["limit"], query["sort"]) for query in self.server.queries)
+        self.assertEqual(pages[:3], [(0, "10", "_key"), (10, "10", "_key"), (20, "10", "_key")]) # and maybe a page read ahead
+
+        self.server.queries = []
+        documents = list(self.data.iter_query(pagesize=10, sort="n", skip=5, limit=10))
+        self.assertEqual([document["n"] for document in documents], list(range(80, 90)))
+        self.assertEqual([query["sort"] for query in self.server.queries], ["n"])
+
+    def testPagesizeIsCappedAtTheServerLimit(self):
+        StandInSplunkd.max_rows = 10
+        self.server.documents = [{"_key": "%03d" % i} for i in range(25)]
+        documents = list(self.data.iter_query(pagesize=1000, prefetch=1, max_rows_per_query=10))
+        self.assertEqual(len(documents), 25)
+        self.assertEqual(sorted(int(query["skip"]) for query in self.server.queries), [0, 10, 20])
+
+if __name__ == '__main__':
+    unittest.main()
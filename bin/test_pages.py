@@ -0,0 +1,86 @@
+#
+# Tests for the prefetched paging of splunklib.client. splunkd is replaced by
+# a local stand-in server that answers the results of one finished job, and
+# records the pages it is asked for.
+#
+
+import json
+import random
+import time
+import unittest
+
+from urllib.parse import parse_qs, urlsplit
+
+from splunklib import client
+from standin_server import StandInHandler, StandInServerTestCase
+
+RESULTS = [{"n": str(i)} for i in range(95)]
+
+class TestIterPages(unittest.TestCase):
+
+    def pages(self, total, delay=0.0):
+        requested = []
+        def fetch(start, size):
+            requested.append((start, size))
+            time.sleep(random.random() * delay) # pages complete out of order
+            return list(range(start, min(start + size, total)))
+        return fetch, requested
+
+    def testItemsAreInOrder(self):
+        fetch, requested = self.pages(95, delay=0.01)
+        self.assertEqual(list(client._iter_pages(fetch, 0, 10, prefetch=4)), list(range(95)))
+        self.assertEqual(sorted(requested)[:10], [(i, 10) for i in range(0, 100, 10)])
+
+    def testCountAndOffset(self):
+        fetch, requested = self.pages(95)
+        self.assertEqual(list(client._iter_pages(fetch, 5, 10, count=25, prefetch=4)), list(range(5, 30)))
+        self.assertEqual(sorted(requested), [(5, 10), (15, 10), (25, 5)])
+
+    def testOnePageAtATime(self):
+        fetch, requested = self.pages(25)
+        self.assertEqual(list(client._iter_pages(fetch, 0, 10, prefetch=1)), list(range(25)))
+        self.assertEqual(requested, [(0, 10), (10, 10), (20, 10)])
+
+    def testFailedPageIsRaised(self):
+        def fetch(start, size):
+            if start == 20:
+                raise IOError("stand-in page failure")
+            return list(range(start, start + size))
+        items = client._iter_pages(fetch, 0, 10, prefetch=4)
+        self.assertEqual([next(items) for i in range(20)], list(range(20)))
+        self.assertRaises(IOError, next, items)
+
+class StandInSplunkd(StandInHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+        self.server.queries.append(query)
+        offset, count = int(query["offset"]), int(query["count"])
+        body = json.dumps({"preview": False, "messages": [{"type": "INFO", "text": "page"}],
+                           "results": RESULTS[offset:offset + count]})
+        self.reply(200, body, "application/json")
+
+class TestJobIterResults(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"queries": list}
+
+    def setUp(self):
+        StandInServerTestCase.setUp(self)
+        self.service = client.Service(scheme="http", host="127.0.0.1", port=self.server.server_port,
+                                      token="Splunk session-key", pool_size=4)
+
+    def testResultsArePaged(self):
+        job = client.Job(self.service, "1234")
+        self.assertEqual(list(job.iter_results(pagesize=10, prefetch=4)), RESULTS)
+        pages = sorted(int(query["offset"]) for query in self.server.queries)
+        self.assertEqual(pages[:10], list(range(0, 100, 10)))
+        self.assertTrue(all(query["output_mode"] == "json" and query["count"] == "10"
+                            for query in self.server.queries))
+
+    def testCount(self):
+        job = client.Job(self.service, "1234")
+        self.assertEqual(list(job.iter_results(pagesize=10, offset=90, count=20)), RESULTS[90:])
+
+if __name__ == '__main__':
+    unittest.main()
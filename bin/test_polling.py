@@ -0,0 +1,148 @@
+#
+# Tests for the job wait loop of splunklib.polling and the jobs waiting of
+# splunklib.client built on it. splunkd is replaced by a local stand-in server
+# that knows a job that finishes, a job that never does, jobs that are slow to
+# answer and nothing else.
+#
+
+import json
+import threading
+import time
+import unittest
+
+from urllib.parse import parse_qs, urlsplit
+
+from splunklib import client
+from splunklib.polling import fetch_concurrently, retry_intervals, wait_for_jobs
+from standin_server import StandInHandler, StandInServerTestCase
+
+class TestWaitForJobs(unittest.TestCase):
+
+    def testDoneJobsAreNotPolledAgain(self):
+        polled = []
+        def fetch_status(sids):
+            polled.append(list(sids))
+            return dict((sid, {"isDone": "1" if len(polled) >= int(sid) else "0"}) for sid in sids)
+
+        done = wait_for_jobs(fetch_status, ["1", "3"], sleep=lambda interval: None)
+        self.assertEqual(done, set(["1", "3"]))
+        self.assertEqual(polled, [["1", "3"], ["3"], ["3"]])
+
+    def testMissingJobIsNotWaitedFor(self):
+        polled = []
+        def fetch_status(sids):
+            polled.append(list(sids))
+            return {"running": {"isDone": False}} if len(polled) < 3 else {"running": {"isDone": True}}
+
+        done = wait_for_jobs(fetch_status, ["running", "expired"], sleep=lambda interval: None)
+        self.assertEqual(done, set(["running"]))
+        self.assertEqual(polled, [["running", "expired"], ["running"], ["running"]])
+
+    def testTimeout(self):
+        slept = []
+        done = wait_for_jobs(lambda sids: {"1": None}, ["1"], timeout=0, sleep=slept.append)
+        self.assertEqual(done, set())
+        self.assertEqual(slept, [])
+
+    def testIntervalsAreEasedUntilTheTimeout(self):
+        intervals = retry_intervals(timeout=0.3, min_interval=0.01, max_interval=1, clamp_time=5)
+        first = next(intervals)
+        self.assertTrue(0.01 <= first < 0.011)
+        time.sleep(0.2)
+        self.assertTrue(0 < next(intervals) <= 0.1) # cut short at the timeout
+        time.sleep(0.1)
+        self.assertIsNone(next(intervals, None))
+
+        intervals = retry_intervals(min_interval=0.5, max_interval=0.5)
+        self.assertEqual([next(intervals) for i in range(3)], [0.5, 0.5, 0.5])
+
+class TestFetchConcurrently(unittest.TestCase):
+
+    def testItemsAreFetchedTogether(self):
+        barrier = threading.Barrier(5, timeout=5) # broken unless five fetches wait at the same time
+        def fetch(item):
+            barrier.wait()
+            return item * 2
+        self.assertEqual(fetch_concurrently(fetch, range(5), max_workers=5), [0, 2, 4, 6, 8])
+
+    def testWorkersAreBounded(self):
+        active, most = [0], [0]
+        lock = threading.Lock()
+        def fetch(item):
+            with lock:
+                active[0] += 1
+                most[0] = max(most[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return item
+        self.assertEqual(fetch_concurrently(fetch, range(20), max_workers=3), list(range(20)))
+        self.assertLessEqual(most[0], 3)
+
+    def testErrorIsRaised(self):
+        def fetch(item):
+            if item == 3:
+                raise ValueError(item)
+            return item
+        self.assertRaises(ValueError, fetch_concurrently, fetch, range(6))
+        self.assertEqual(fetch_concurrently(fetch, []), [])
+
+class StandInSplunkd(StandInHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        self.server.requests.append((path, parse_qs(url.query)))
+        sid = path.rsplit("/", 1)[-1]
+        if sid.startswith("slow"):
+            with self.server.lock:
+                self.server.active += 1
+                self.server.most_active = max(self.server.most_active, self.server.active)
+            time.sleep(0.1)
+            with self.server.lock:
+                self.server.active -= 1
+            status, body = 200, json.dumps({"entry": [{"content": {"isDone": True, "dispatchState": "DONE"}}]})
+        elif sid == "finishing":
+            self.server.polls += 1
+            content = {"isDone": self.server.polls >= 2, "dispatchState": "RUNNING"}
+            status, body = 200, json.dumps({"entry": [{"content": content}]})
+        elif sid == "running":
+            status, body = 200, json.dumps({"entry": [{"content": {"isDone": False, "dispatchState": "RUNNING"}}]})
+        else:
+            status, body = 404, "<response><messages><msg type='ERROR'>Unknown sid.</msg></messages></response>"
+        self.reply(status, body)
+
+class TestJobsWait(StandInServerTestCase):
+    handler = StandInSplunkd
+    state = {"requests": list, "polls": int, "active": int, "most_active": int}
+
+    def setUp(self):
+        StandInServerTestCase.setUp(self)
+        self.service = client.Service(scheme="http", host="127.0.0.1", port=self.server.server_port,
+                                      token="Splunk session-key")
+
+    def testOnlyWaitedForJobsAreFetched(self):
+        statuses = self.service.jobs.status(["running", "expired"])
+        self.assertEqual(statuses, {"running": {"isDone": False, "dispatchState": "RUNNING"}})
+        self.assertEqual(sorted(path for path, query in self.server.requests),
+                         ["/services/search/jobs/expired", "/services/search/jobs/running"])
+        self.assertEqual([query["f"] for path, query in self.server.requests], [["isDone", "dispatchState"]] * 2)
+
+    def testJobsAreFetchedConcurrently(self):
+        sids = ["slow%d" % i for i in range(4)]
+        self.assertEqual(self.service.jobs.wait(sids), set(sids))
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertGreater(self.server.most_active, 1)
+
+    def testExpiredJobEndsTheWait(self):
+        done = self.service.jobs.wait(["finishing", "expired"])
+        self.assertEqual(done, set(["finishing"]))
+        self.assertEqual(sorted(path for path, query in self.server.requests),
+                         ["/services/search/jobs/expired", "/services/search/jobs/finishing",
+                          "/services/search/jobs/finishing"])
+
+    def testTimeout(self):
+        self.assertEqual(self.service.jobs.wait(["running"], timeout=0.1), set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+#
+# Tests for reading search results: the streams ResultsReader reads through,
+# splunklib.binding.ResponseReader and the declaration filter of
+# splunklib.results, fed through reads of every size, and the JSON and CSV
+# readers.
+#
+
+import io
+import json
+import random
+import re
+import unittest
+
+from splunklib.binding import ResponseReader
+from splunklib.results import CSVResultsReader, JSONResultsReader, Message, _ConcatenatedStream, _XMLDTDFilter
+
+class TrickleStream(object):
+    # Returns at most size bytes a read of a given size, as a socket may, and
+    # everything left when no size is given, as an HTTPResponse does.
+
+    def __init__(self, data, size):
+        self._data = io.BytesIO(data)
+        self._size = size
+
+    def read(self, n=None):
+        return self._data.read(None if n is None or n < 0 else min(n, self._size))
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+def read_all(stream, size):
+    blocks = []
+    while True:
+        block = stream.read(size)
+        if not block:
+            return b"".join(blocks)
+        blocks.append(block)
+
+def filtered(data):
+    # What the filter removes: every <?...> declaration, as the regular expression in its docstring says.
+    return re.sub(br"<\?[^>]*>", b"", data)
+
+TOKENS = [b"<?xml version='1.0' encoding='UTF-8'?>", b"<!DOCTYPE results>", b"<results preview='0'>", b"<",
+          b"?", b">", b"<?", b"<r k='a>b'>", b"text ", b"&lt;?", b"</results>\n", u"wört".encode("utf-8")]
+
+def documents(count, seed=1):
+    generate = random.Random(seed)
+    for i in range(count):
+        yield b"".join(generate.choice(TOKENS) for j in range(generate.randint(0, 40))) + b">"
+
+class TestXMLDTDFilter(unittest.TestCase):
+
+    def testDeclarationsAreRemoved(self):
+        data = b"<?xml version='1.0'?>\n<!DOCTYPE results>\n<results><?xml ...?><r>1</r></results>"
+        self.assertEqual(_XMLDTDFilter(io.BytesIO(data)).read(), b"\n<!DOCTYPE results>\n<results><r>1</r></results>")
+
+    def testDeclarationsSplitAcrossBlocks(self):
+        data = b"<?xml version='1.0'?><!DOCTYPE x><a><?b c?></a><" + b"<?d?>" * 3 + b"<e/>"
+        for block_size in range(1, len(data) + 2):
+            for read_size in (1, 2, 3, 7, None):
+                stream = _XMLDTDFilter(io.BytesIO(data), block_size=block_size)
+                self.assertEqual(read_all(stream, read_size) if read_size else stream.read(), filtered(data),
+                                 (block_size, read_size))
+
+    def testGeneratedDocuments(self):
+        for data in documents(300):
+            for block_size, trickle in ((1, 1), (3, 2), (7, 5), (64, 13), (65536, 65536)):
+                stream = _XMLDTDFilter(TrickleStream(data, trickle), block_size=block_size)
+                self.assertEqual(read_all(stream, 5), filtered(data), (data, block_size, trickle))
+
+    def testReadsAreBounded(self):
+        stream = _XMLDTDFilter(io.BytesIO(b"<?x?>abc<?y?>defg"), block_size=2)
+        self.assertEqual([stream.read(3), stream.read(3), stream.read(3), stream.read(3)], [b"abc", b"def", b"g", b""])
+
+class TestConcatenatedStream(unittest.TestCase):
+
+    def testShortReadsKeepTheStream(self):
+        stream = _ConcatenatedStream(TrickleStream(b"<doc>", 2), TrickleStream(b"abcdef", 4), io.BytesIO(b"</doc>"))
+        self.assertEqual(read_all(stream, 3), b"<doc>abcdef</doc>")
+        stream = _ConcatenatedStream(TrickleStream(b"<doc>", 2), io.BytesIO(b""), io.BytesIO(b"</doc>"))
+        self.assertEqual(stream.read(), b"<doc></doc>")
+        self.assertEqual(stream.read(), b"")
+
+class TestResponseReader(unittest.TestCase):
+
+    DATA = bytes(range(256)) * 3
+
+    def testOddSizedReads(self):
+        for trickle in (1, 2, 5, 1000):
+            for size in (1, 3, 17, 256, None):
+                reader = ResponseReader(TrickleStream(self.DATA, trickle))
+                self.assertEqual(read_all(reader, size) if size else reader.read(), self.DATA, (trickle, size))
+
+    def testPeekThenRead(self):
+        reader = ResponseReader(TrickleStream(self.DATA, 5))
+        self.assertEqual(reader.peek(3), self.DATA[:3])
+        self.assertEqual(reader.peek(8), self.DATA[:8])
+        self.assertEqual(reader.read(2), self.DATA[:2])
+        self.assertEqual(reader.peek(4), self.DATA[2:6])
+        self.assertEqual(reader.read(10), self.DATA[2:8] + self.DATA[8:12])
+        self.assertEqual(read_all(reader, 7), self.DATA[12:])
+        self.assertTrue(reader.empty)
+
+    def testReadintoShortBuffers(self):
+        for trickle in (1, 4, 1000):
+            reader = ResponseReader(TrickleStream(self.DATA, trickle))
+            reader.peek(6)
+            data = bytearray()
+            buffer = bytearray(5)
+            while True:
+                count = reader.readinto(buffer)
+                if not count:
+                    break
+                data += buffer[:count]
+            self.assertEqual(bytes(data), self.DATA, trickle)
+
+    def testBufferedReader(self):
+        reader = io.BufferedReader(ResponseReader(TrickleStream(self.DATA, 7)), buffer_size=16)
+        self.assertEqual(reader.read(20), self.DATA[:20])
+        self.assertEqual(reader.read(), self.DATA[20:])
+
+def json_lines(*documents):
+    return b"".join(json.dumps(document).encode("utf-8") + b"\n" for document in documents)
+
+class TestJSONResultsReader(unittest.TestCase):
+
+    def testExport(self):
+        # search/jobs/export streams one object a result, previews first.
+        data = json_lines(
+            {"preview": True, "offset": 0, "result": {"host": "a", "count": "1"}},
+            {"preview": False, "messages": [{"type": "INFO", "text": "Your timerange was substituted"}]},
+            {"preview": False, "offset": 0, "result": {"host": "a", "user": ["root", u"wört"]}},
+            {"preview": False, "offset": 1, "lastrow": True, "result": {"host": "b"}})
+        reader = JSONResultsReader(TrickleStream(data, 7))
+        self.assertEqual(next(reader), {"host": "a", "count": "1"})
+        self.assertTrue(reader.is_preview)
+        self.assertEqual(next(reader), Message("INFO", "Your timerange was substituted"))
+        self.assertFalse(reader.is_preview)
+        self.assertEqual(list(reader), [{"host": "a", "user": ["root", u"wört"]}, {"host": "b"}])
+
+    def testResults(self):
+        # search/jobs/{search_id}/results returns one document, messages first.
+        data = json_lines({
+            "preview": True, "init_offset": 0, "fields": [{"name": "host"}, {"name": "user"}],
+            "messages": [{"type": "DEBUG", "text": "base lispy: [ AND ]"}, {"type": "WARN", "text": "slow"}],
+            "results": [{"host": "a", "user": ["root", "admin"]}, {"host": "b", "user": "root"}]})
+        reader = JSONResultsReader(io.BytesIO(data))
+        self.assertEqual(list(reader), [
+            Message("DEBUG", "base lispy: [ AND ]"), Message("WARN", "slow"),
+            {"host": "a", "user": ["root", "admin"]}, {"host": "b", "user": "root"}])
+        self.assertTrue(reader.is_preview)
+
+    def testEmptyResults(self):
+        reader = JSONResultsReader(io.BytesIO(json_lines({"preview": False, "init_offset": 0, "messages": [],
+                                                          "results": []})))
+        self.assertEqual(list(reader), [])
+        self.assertFalse(reader.is_preview)
+        reader = JSONResultsReader(io.BytesIO(b""))
+        self.assertEqual(list(reader), [])
+        self.assertIsNone(reader.is_preview)
+
+class TestCSVResultsReader(unittest.TestCase):
+
+    def testResults(self):
+        data = (u'host,count,"text"\r\n'
+                u'a,1,"one, two"\r\n'
+                u'b,,"line\r\nbreak ""quoted"""\r\n'
+                u',,wört\r\n').encode("utf-8")
+        reader = CSVResultsReader(TrickleStream(data, 3))
+        self.assertEqual(list(reader), [{"host": "a", "count": "1", "text": "one, two"},
+                                        {"host": "b", "text": u'line\r\nbreak "quoted"'}, {"text": u"wört"}])
+        self.assertIsNone(reader.is_preview)
+
+    def testMultivalueFields(self):
+        data = (b'host,user,__mv_user,tag,__mv_tag\r\n'
+                b'a,"root\nadmin","$root$;$admin$",x,\r\n'
+                b'b,"$1\n$$","$$$1$;$$$$$$$",,"$y$"\r\n'
+                b'c,,,,\r\n')
+        results = list(CSVResultsReader(io.BytesIO(data)))
+        self.assertEqual(results, [{"host": "a", "user": ["root", "admin"], "tag": "x"},
+                                   {"host": "b", "user": ["$1", "$$"], "tag": "y"}, {"host": "c"}])
+        self.assertEqual(list(results[0]), ["host", "user", "tag"])
+
+    def testEmptyResults(self):
+        self.assertEqual(list(CSVResultsReader(io.BytesIO(b""))), [])
+        self.assertEqual(list(CSVResultsReader(io.BytesIO(b"host,count\r\n"))), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,323 @@
+#
+# Tests for the chunked (protocol v2) search command loop of
+# splunklib.searchcommands. Commands are run on in-memory chunks, the way
+# splunkd sends them, and their output chunks are compared.
+#
+
+import io
+import json
+import re
+import tempfile
+import unittest
+
+from array import array
+from collections import OrderedDict
+
+from splunklib.searchcommands import Configuration, StreamingCommand
+from splunklib.searchcommands.internals import AsyncWriter, ColumnBatch, RecordWriter, RecordWriterV2
+from splunklib.searchcommands.search_command import SearchCommand
+
+SEARCHINFO = {
+    "args": [], "raw_args": [], "earliest_time": "0", "latest_time": "0", "search": "| test",
+    "dispatch_dir": tempfile.gettempdir(), "session_key": "session-key", "splunkd_uri": "https://127.0.0.1:8089",
+    "app": "search", "owner": "admin", "sid": "1234", "splunk_version": "8.2.0", "username": "admin",
+    "command": "test", "maxresultrows": 50000}
+
+# Fields with commas, quotes, line breaks and multiple values, as splunkd writes them.
+HEADER = "_raw,x,__mv_x,tag,__mv_tag\r\n"
+
+def row(i):
+    if i % 5 == 0:
+        return '"event %d, ""quoted""",%d,,"a\nb$c","$a$;$b$$c$"\r\n' % (i, i)
+    return "event %d,%d,,%s,\r\n" % (i, i, "a" if i % 3 else "b")
+
+def chunk(metadata, body=""):
+    metadata, body = json.dumps(metadata).encode("utf-8"), body.encode("utf-8")
+    return b"chunked 1.0,%d,%d\n" % (len(metadata), len(body)) + metadata + body
+
+def chunks(bodies):
+    data = chunk({"action": "getinfo", "preview": False, "searchinfo": SEARCHINFO})
+    for i, body in enumerate(bodies):
+        data += chunk({"action": "execute", "finished": i == len(bodies) - 1}, body)
+    return data
+
+def records(count, start=0):
+    return HEADER + "".join(row(i) for i in range(start, start + count))
+
+def run(command_class, data):
+    output = io.BytesIO()
+    command_class().process(["test.py"], io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline=""), output)
+    return output.getvalue()
+
+def read_chunks(output):
+    # The (metadata, body) of each chunk the command wrote.
+    read = []
+    while output:
+        header = re.match(br"\n?chunked 1\.0,(\d+),(\d+)\n", output)
+        start = header.end()
+        metadata_length, body_length = int(header.group(1)), int(header.group(2))
+        metadata = json.loads(output[start:start + metadata_length].decode("utf-8"))
+        body = output[start + metadata_length:start + metadata_length + body_length].decode("utf-8")
+        read.append((metadata, body))
+        output = output[start + metadata_length + body_length:]
+    return read
+
+@Configuration()
+class PassRecords(StreamingCommand):
+    def stream(self, records):
+        return records
+
+@Configuration()
+class PassBatch(StreamingCommand):
+    def stream_batch(self, batch):
+        return batch
+
+@Configuration()
+class DoubleRecords(StreamingCommand):
+    def stream(self, records):
+        for record in records:
+            record["y"] = float(record["x"]) * 2 if record["x"] else None
+            yield record
+
+@Configuration()
+class DoubleBatch(StreamingCommand):
+    def stream_batch(self, batch):
+        batch["y"] = array("d", [value * 2 for value in batch.numeric("x")])
+        return batch
+
+@Configuration()
+class ReplaceBatch(StreamingCommand):
+    def stream_batch(self, batch):
+        del batch["_raw"]
+        batch["tag"] = [u"tag ☃" if value == "b" else value for value in batch["tag"]]
+        return batch
+
+@Configuration(pipeline=2)
+class PipelinedDoubleRecords(StreamingCommand):
+    stream = DoubleRecords.stream
+
+@Configuration(pipeline=1)
+class PipelinedDoubleBatch(StreamingCommand):
+    stream_batch = DoubleBatch.stream_batch
+
+@Configuration()
+class FailingRecords(StreamingCommand):
+    def stream(self, records):
+        for record in records:
+            if record["x"] == "25":
+                raise ValueError("no 25")
+            yield record
+
+@Configuration(pipeline=2)
+class PipelinedFailingRecords(StreamingCommand):
+    stream = FailingRecords.stream
+
+class TestColumnBatch(unittest.TestCase):
+
+    def batch(self):
+        rows = [("1", "a", "", "r1"), ("", "x\ny", "$x$;$y$", "r2"), ("2.5", "b", "", "r3")]
+        return ColumnBatch(["n", "tag", "__mv_tag", "_raw"], rows, lambda mv: mv.strip("$").split("$;$"))
+
+    def testColumns(self):
+        batch = self.batch()
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.fieldnames, ["n", "tag", "_raw"])
+        self.assertEqual(batch["tag"], ("a", ["x", "y"], "b"))
+        self.assertEqual(batch["_raw"], ("r1", "r2", "r3"))
+        self.assertEqual(list(batch.numeric("n", default=0.0)), [1.0, 0.0, 2.5])
+
+    def testAssignment(self):
+        batch = self.batch()
+        self.assertRaises(ValueError, batch.__setitem__, "y", [1, 2])
+        batch["y"] = [1, 2, 3]
+        del batch["_raw"]
+        self.assertEqual(batch.fieldnames, ["n", "tag", "y"])
+        self.assertNotIn("_raw", batch)
+
+    def testEmptyBatch(self):
+        batch = ColumnBatch(["a", "b"], [], None)
+        self.assertEqual((len(batch), batch["a"], batch.fieldnames), (0, (), ["a", "b"]))
+
+class TestStreamBatch(unittest.TestCase):
+
+    def testPassThroughIsUnchanged(self):
+        data = chunks([records(20), records(7, start=20), HEADER])
+        self.assertEqual(run(PassBatch, data), run(PassRecords, data))
+
+    def testNumericColumnMatchesRecords(self):
+        data = chunks([records(20), records(13, start=20)])
+        output = run(DoubleBatch, data)
+        self.assertEqual(output, run(DoubleRecords, data))
+        self.assertIn("\r\nevent 3,,3,,b,,6.0,\r\n", read_chunks(output)[1][1])
+
+    def testReplacedColumns(self):
+        output = read_chunks(run(ReplaceBatch, chunks([records(6)])))
+        self.assertEqual(output[1][1].split("\r\n")[:5],
+                         ["x,__mv_x,tag,__mv_tag", '0,,"a\nb$c",$a$;$b$$c$', "1,,a,", "2,,a,", u"3,,tag ☃,"])
+
+class TestRecordWriter(unittest.TestCase):
+
+    RECORDS = [
+        OrderedDict([("_raw", "event 0"), ("n", 1), ("x", 1.5), ("tag", None)]),
+        OrderedDict([("_raw", "event 1"), ("n", 2), ("x", 2.25), ("tag", "a$b")]),
+        OrderedDict([("_raw", "event 2"), ("n", 2 ** 70), ("x", float("nan")), ("tag", ["a", "b$", None, 2.5])]),
+        OrderedDict([("_raw", b"bytes"), ("n", True), ("x", False), ("tag", ("t", "u"))]),
+        OrderedDict([("_raw", "event 4"), ("n", 3), ("x", {"k": [1]}), ("tag", [])]),
+        OrderedDict([("_raw", 'quoted "x", y'), ("n", 4), ("x", 0.1), ("tag", ["only"])]),
+        OrderedDict([("_raw", "event 6"), ("n", 5), ("x", 7.0)]),
+    ]
+
+    # What RecordWriterV2 wrote for RECORDS before it encoded records from a plan.
+    OUTPUT = (
+        b'chunked 1.0,18,192\n{"finished":false}_raw,__mv__raw,n,__mv_n,x,__mv_x,tag,__mv_tag\r\n'
+        b'event 0,,1,,1.5,,,\r\nevent 1,,2,,2.25,,a$b,\r\n'
+        b'event 2,,1180591620717411303424,,nan,,"a\nb$\n\n2.5",$a$;$b$$$;$$;$2.5$\r\n'
+        b'b\'bytes\',,1,,0,,"t\nu",$t$;$u$\r\n'
+        b'chunked 1.0,17,131\n{"finished":true}_raw,__mv__raw,n,__mv_n,x,__mv_x,tag,__mv_tag\r\n'
+        b'event 4,,3,,"{""k"":[1]}",,,\r\n"quoted ""x"", y",,4,,0.1,,only,\r\nevent 6,,5,,7.0,,,\r\n')
+
+    def testOutputIsUnchanged(self):
+        output = io.BytesIO()
+        writer = RecordWriterV2(output, maxresultrows=4)
+        for record in self.RECORDS:
+            writer.write_record(record)
+        writer.flush(finished=True)
+        self.assertEqual(output.getvalue(), self.OUTPUT)
+
+        output = io.BytesIO()
+        writer = RecordWriterV2(output, maxresultrows=4)
+        writer.write_records(iter(self.RECORDS))
+        writer.flush(finished=True)
+        self.assertEqual(output.getvalue(), self.OUTPUT)
+
+    def testPlan(self):
+        value_types = [str, int, float, type(None), list, bool, bytes, dict]
+        self.assertEqual(RecordWriter._compile_plan(value_types), (value_types, [1, 2], [4, 5, 7]))
+
+    def testPlanFollowsTypeChanges(self):
+        output = io.BytesIO()
+        writer = RecordWriterV2(output)
+        writer.write_record({"a": 1, "b": "x"})
+        plan = writer._plan
+        writer.write_record({"a": 2, "b": "y"})
+        self.assertIs(writer._plan, plan)
+        writer.write_record({"a": [3, 4], "b": None})
+        self.assertEqual(writer._plan[1:], ([], [0]))
+        writer.flush(finished=True)
+        self.assertTrue(output.getvalue().endswith(b"a,__mv_a,b,__mv_b\r\n1,,x,\r\n2,,y,\r\n\"3\n4\",$3$;$4$,,\r\n"))
+
+    def testBatchMatchesRecords(self):
+        records = [OrderedDict([("s", u"wört"), ("n", 1.5), ("mv", ["a", "b$"])]),
+                   OrderedDict([("s", None), ("n", 2.0), ("mv", "c")]),
+                   OrderedDict([("s", u"x, \"y\""), ("n", -0.25), ("mv", None)])]
+        by_record, by_column = io.BytesIO(), io.BytesIO()
+
+        writer = RecordWriterV2(by_record)
+        writer.write_records(records)
+        writer.flush(finished=True)
+        writer = RecordWriterV2(by_column)
+        writer.write_batch(OrderedDict([("s", [record["s"] for record in records]),
+                                        ("n", array("d", [record["n"] for record in records])),
+                                        ("mv", tuple(record["mv"] for record in records))]))
+        writer.flush(finished=True)
+        self.assertEqual(by_column.getvalue(), by_record.getvalue())
+
+class FailingFile(object):
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        if data == b"bad":
+            raise IOError("bad write")
+        self.written.append(data)
+
+    def flush(self):
+        pass
+
+class TestPipeline(unittest.TestCase):
+
+    def testOutputMatchesSerial(self):
+        data = chunks([records(20, start=20 * i) for i in range(12)] + [HEADER])
+        self.assertEqual(run(PipelinedDoubleRecords, data), run(DoubleRecords, data))
+        self.assertEqual(run(PipelinedDoubleBatch, data), run(DoubleBatch, data))
+
+    def testErrorMatchesSerial(self):
+        data = chunks([records(20, start=20 * i) for i in range(4)])
+        output = []
+        for command_class in FailingRecords, PipelinedFailingRecords:
+            ofile = io.BytesIO()
+            with self.assertRaises(SystemExit):
+                command_class().process(["test.py"], io.TextIOWrapper(io.BytesIO(data), encoding="utf-8"), ofile)
+            output.append(ofile.getvalue())
+        self.assertEqual(output[1], output[0])
+        self.assertEqual(len(read_chunks(output[1])), 3)
+
+    def testSettingIsNotSent(self):
+        getinfo = read_chunks(run(PipelinedDoubleRecords, chunks([records(3)])))[0][0]
+        self.assertEqual(getinfo["type"], "streaming")
+        self.assertNotIn("pipeline", getinfo)
+
+    def testWriterKeepsOrder(self):
+        f = FailingFile()
+        writer = AsyncWriter(f, max_pending=1)
+        for i in range(100):
+            writer.write(b"%d," % i)
+            if i % 7 == 0:
+                writer.flush()
+        writer.close()
+        self.assertEqual(b"".join(f.written), b"".join(b"%d," % i for i in range(100)))
+
+    def testWriterRaisesWriteErrors(self):
+        writer = AsyncWriter(FailingFile())
+        writer.write(b"bad")
+        self.assertRaises(IOError, writer.close)
+
+class TrickleStream(io.RawIOBase):
+    # A binary stream that returns at most size bytes a read, as a pipe may.
+
+    def __init__(self, data, size):
+        self._data = io.BytesIO(data)
+        self._size = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._data.read(min(len(b), self._size))
+        b[:len(data)] = data
+        return len(data)
+
+class TestChunkReader(unittest.TestCase):
+
+    def testMultibyteChunks(self):
+        body = u"_raw,text\r\n" + u"".join(u'event %d,"wört 日本 €\r\n%d"\r\n' % (i, i) for i in range(10))
+        data = chunks([body, body.replace(u"event", u"évènement")])
+
+        output = read_chunks(run(PassRecords, data))
+        self.assertEqual([metadata.get("finished", False) for metadata, body in output], [False, False, True])
+        self.assertEqual(output[1][1], u"_raw,__mv__raw,text,__mv_text\r\n" + u"".join(
+            u'event %d,,"wört 日本 €\r\n%d",\r\n' % (i, i) for i in range(10)))
+        self.assertIn(u'évènement 9,,"wört 日本 €\r\n9",\r\n', output[2][1])
+
+    def testCharactersSplitAcrossReads(self):
+        data = chunk({"action": "execute"}, u"a\r\n日本語\r\n") + chunk({"action": "execute", "finished": True})
+        ifile = io.BufferedReader(TrickleStream(data, 2), buffer_size=2)
+        buffer = bytearray()
+
+        metadata, body = SearchCommand._read_chunk(ifile, buffer)
+        self.assertEqual((metadata.action, body), ("execute", u"a\r\n日本語\r\n"))
+        metadata, body = SearchCommand._read_chunk(ifile, buffer)
+        self.assertEqual((metadata.finished, body), (True, ""))
+        self.assertEqual(SearchCommand._read_chunk(ifile, buffer), None)
+
+    def testBinaryStream(self):
+        binary = io.BytesIO(b"")
+        text = io.TextIOWrapper(binary)
+        self.assertIs(SearchCommand._as_binary_stream(text), binary)
+        self.assertIs(SearchCommand._as_binary_stream(binary), binary)
+        strings = io.StringIO(u"")
+        self.assertIs(SearchCommand._as_binary_stream(strings), strings)
+
+if __name__ == '__main__':
+    unittest.main()